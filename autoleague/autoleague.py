@@ -1,26 +1,32 @@
+import shlex
 import sys
 from pathlib import Path
-from typing import List
+from typing import List, TYPE_CHECKING
 
-from bot_summary import create_bot_summary
-from bots import load_all_bots, defmt_bot_name, print_details, unzip_all_bots, load_retired_bots, save_retired_bots, \
-    load_all_unretired_bots
-from csv_conversion import convert_to_csvs
+from bots import defmt_bot_name, print_details, unzip_all_bots, save_retired_bots
+from league_state import LeagueState, league_version
 from leaguesettings import LeagueSettings
 from match import MatchDetails
-from match_maker import TicketSystem, MatchMaker, make_timestamp
-from match_runner import run_match
-from overlay import make_summary, make_overlay
+from match_maker import TicketSystem, MatchMaker, make_timestamp, next_timestamp
 from paths import LeagueDir
 from prompt import prompt_yes_no
 from ranking_system import RankingSystem
-from replays import ReplayPreference
 from settings import PersistentSettings
+from storage import league_lock, LeagueLocked
+
+# Modules depending on rlbot, numpy, or other slow to import packages are imported by the commands that need
+# them, so simple commands start quickly. See startup_benchmark.py.
+if TYPE_CHECKING:
+    from match_index import IndexedMatch
 
 
 def main():
     RankingSystem.setup()
-    parse_args(sys.argv[1:])
+    try:
+        parse_args(sys.argv[1:])
+    except LeagueLocked as e:
+        print(e)
+        return 1
     return 0
 
 
@@ -33,6 +39,7 @@ Usage:
     autoleague bot list [showRetired]              Print list of all known bots
     autoleague bot test <bot_id>                   Run test match using a specific bot
     autoleague bot details <bot_id>                Print details about the given bot
+    autoleague bot stats <bot_id>                  Print the career stats of the given bot
     autoleague bot unzip                           Unzip all bots in the bot directory
     autoleague bot summary                         Create json file with bot descriptions
     autoleague ticket get <bot_id>                 Get the number of tickets owned by <bot_id>
@@ -46,16 +53,50 @@ Usage:
     autoleague match prepare                       Run a standard 3v3 soccer match, but confirm match before starting
     autoleague match undo                          Undo the last match
     autoleague match list [n]                      Show the latest matches
+    autoleague match query [filters]               Show matches by bot, teammate, opponent, map, time, or margin
+    autoleague match plan <k>                      Show k matches that can be played at the same time (nothing is saved)
+    autoleague match coordinate <count> [addr]     Hand out <count> matches to workers on other machines
+    autoleague match work <url> <token> [name]     Run matches handed out by the coordinator at <url>
     autoleague summary [n]                         Create a summary of the last [n] matches
     autoleague retirement list                     Print all bots in retirement
     autoleague retirement retire <bot>             Retire a bot, removing it from play and the leaderboard
     autoleague retirement unretire <bot>           Unretire a bot
     autoleague retirement retireall                Retire all bots
-    autoleague csvs generate                       Generate csv files with league data
-    autoleague help                                Print this message"""
+    autoleague season list                         Print the time stamps at which seasons started
+    autoleague season start [time]                 Start a new season now or at the given time (YYYYMMDDHHMMSS)
+    autoleague csvs generate [full]                Generate csv files with league data (only new data unless [full])
+    autoleague overlay serve [port]                Serve the overlays and push updates to them (default port 8765)
+    autoleague stats timing [n]                    Show time spent in each phase of the last [n] matches
+    autoleague stats winmatrix [png]               Write the win and win rate matrices to the stats directory
+    autoleague stats pair <bot_a> <bot_b>          Show how bot a does with and against bot b
+    autoleague stats mmr <granularity> [npy]       Write the MMR of all bots per match/day/week/season as csv (or npy)
+    autoleague stats ratinggrid [processes]        Score rating parameters by replaying all matches with each of them
+    autoleague stats matchmaking [n] [processes]   Compare matchmaking parameters by simulating [n] sessions
+    autoleague shell                               Run commands in a shell that keeps the league in memory
+    autoleague help                                Print this message
+
+Profiling:
+    autoleague --profile <command>                 Run the command with cProfile and write a report to profiles/
+    autoleague --profile-memory <command>          Like --profile, but also trace memory allocations
+    autoleague --profile-matchmaking [memory]      Profile making the next match without running or saving it"""
 
     if len(args) == 0 or args[0] == "help":
         print(help_msg)
+    elif args[0] in ["--profile", "--profile-memory"] and len(args) >= 2:
+        from profiling import profile_call
+        ld = require_league_dir()
+        name = "_".join(arg for arg in args[1:3] if arg.isalnum())
+        profile_call(ld, name, parse_args, args[1:], memory=args[0] == "--profile-memory")
+    elif args[0] == "--profile-matchmaking" and args[1:] in [[], ["memory"]]:
+        from profiling import profile_call
+        import numpy.random  # Matchmaking imports numpy lazily. Importing it here keeps it out of the profile.
+        ld = require_league_dir()
+        state = LeagueState.shared(ld)
+        bots = state.unretired_bots()
+        rank_sys = state.rankings()
+        ticket_sys = state.tickets()
+        profile_call(ld, "make_next", MatchMaker.make_next, bots, rank_sys, ticket_sys, memory=len(args) == 2)
+        print("The match was not started and nothing was saved")
     elif args[0] == "setup":
         parse_subcommand_setup(args)
     elif args[0] == "bot":
@@ -68,20 +109,74 @@ Usage:
         parse_subcommand_match(args)
     elif args[0] == "retirement":
         parse_subcommand_retirement(args)
+    elif args[0] == "season":
+        parse_subcommand_season(args)
     elif args[0] == "summary" and (1 <= len(args) <= 2):
 
         count = int(args[1]) if len(args) == 2 else 0
         ld = require_league_dir()
-        make_summary(ld, count)
-        print(f"Created summary of the last {count} matches")
-    elif args[0] == "csvs" and len(args) == 2 and args[1] == "generate":
+        from overlay import make_summary
+        with league_lock(ld):
+            make_summary(ld, count)
+            print(f"Created summary of the last {count} matches")
+    elif args[0] == "csvs" and 2 <= len(args) <= 3 and args[1] == "generate" and args[2:] in [[], ["full"]]:
+        full = len(args) == 3
+        from csv_conversion import convert_to_csvs
         ld = require_league_dir()
-        convert_to_csvs(ld)
+        convert_to_csvs(ld, full)
         print("Generated CSV files with league data")
+    elif args[0] == "overlay" and 2 <= len(args) <= 3 and args[1] == "serve":
+        from overlay_server import serve_overlays, DEFAULT_PORT
+        port = int(args[2]) if len(args) == 3 else DEFAULT_PORT
+        serve_overlays(port)
+    elif args[0] == "stats":
+        parse_subcommand_stats(args)
+    elif args[0] == "shell" and len(args) == 1:
+        run_shell()
     else:
         print(help_msg)
 
 
+def run_shell():
+    """
+    Read commands from stdin and run them in this process, so the league state loaded by one command is reused by
+    the next. Commands are written without the `autoleague` prefix. Commands can also be piped in, e.g. by scripts.
+    """
+    interactive = sys.stdin.isatty()
+    if interactive:
+        print("AutoLeague shell. Type 'help' for commands, 'reload' to reload the league, and 'exit' to quit.")
+    while True:
+        try:
+            line = input("autoleague> " if interactive else "")
+        except EOFError:
+            break
+        except KeyboardInterrupt:
+            print()
+            continue
+
+        args = shlex.split(line)
+        if len(args) == 0:
+            continue
+        elif args[0] in ["exit", "quit"]:
+            break
+        elif args[0] == "reload":
+            LeagueState.shared(require_league_dir()).invalidate()
+            print("The league will be reloaded from disk")
+        elif args[0] == "shell":
+            print("Already in the shell")
+        else:
+            try:
+                parse_args(args)
+            except KeyboardInterrupt:
+                print("Interrupted")
+            except SystemExit:
+                pass
+            except LeagueLocked as e:
+                print(e)
+            except Exception as e:
+                print(f"Error: {e!r}")
+
+
 def parse_subcommand_setup(args: List[str]):
     assert args[0] == "setup"
     help_msg = """Usage:
@@ -125,10 +220,12 @@ def parse_subcommand_bot(args: List[str]):
     autoleague bot list [showRetired]         Print list of all known bots
     autoleague bot test <bot_id>              Run test match using a specific bot
     autoleague bot details <bot_id>           Print details about the given bot
+    autoleague bot stats <bot_id>             Print the career stats of the given bot
     autoleague bot unzip                      Unzip all bots in the bot directory
     autoleague bot summary                    Create json file with bot descriptions"""
 
     ld = require_league_dir()
+    state = LeagueState.shared(ld)
 
     if len(args) == 1 or args[1] == "help":
         print(help_msg)
@@ -137,10 +234,10 @@ def parse_subcommand_bot(args: List[str]):
 
         show_retired = len(args) == 3 and bool(args[2])
 
-        bot_configs = load_all_bots(ld)
-        rank_sys = RankingSystem.load(ld)
-        ticket_sys = TicketSystem.load(ld)
-        retired = load_retired_bots(ld)
+        bot_configs = state.bots()
+        rank_sys = state.rankings()
+        ticket_sys = state.tickets()
+        retired = state.retired()
 
         bot_ids = list(
             set(bot_configs.keys())
@@ -160,20 +257,22 @@ def parse_subcommand_bot(args: List[str]):
     elif args[1] == "test" and len(args) == 3:
 
         # Load
-        bots = load_all_bots(ld)
+        bots = state.bots()
         bot = args[2]
         if bot not in bots:
             print(f"Could not find the config file of '{bot}'")
             return
 
         # Run
+        from match_runner import run_match
+        from replays import ReplayPreference
         match = MatchMaker.make_test_match(bot)
         run_match(ld, match, bots, ReplayPreference.NONE)
         print(f"Test of '{bot}' complete")
 
     elif args[1] == "details" and len(args) == 3:
 
-        bots = load_all_bots(ld)
+        bots = state.bots()
         bot = args[2]
 
         if bot not in bots:
@@ -182,13 +281,20 @@ def parse_subcommand_bot(args: List[str]):
 
         print_details(bots[bot])
 
+    elif args[1] == "stats" and len(args) == 3:
+
+        from stats import print_career_stats
+        print_career_stats(ld, args[2])
+
     elif args[1] == "unzip" and len(args) == 2:
 
-        print("Unzipping all bots:")
-        unzip_all_bots(ld)
+        with league_lock(ld):
+            print("Unzipping all bots:")
+            unzip_all_bots(ld)
 
     elif args[1] == "summary" and len(args) == 2:
 
+        from bot_summary import create_bot_summary
         create_bot_summary(ld)
         print("Bot summary created")
 
@@ -207,6 +313,7 @@ def parse_subcommand_ticket(args: List[str]):
     autoleague ticket gameCatchupBoost <boost>    Set the extra ticket increase factor when a bot has played fewer games"""
 
     ld = require_league_dir()
+    state = LeagueState.shared(ld)
 
     if len(args) == 1 or args[1] == "help":
         print(help_msg)
@@ -214,7 +321,7 @@ def parse_subcommand_ticket(args: List[str]):
     elif args[1] == "get" and len(args) == 3:
 
         bot = args[2]
-        ticket_sys = TicketSystem.load(ld)
+        ticket_sys = state.tickets()
         tickets = ticket_sys.get(bot)
         if tickets:
             print(f"{bot} has {tickets} tickets")
@@ -223,20 +330,21 @@ def parse_subcommand_ticket(args: List[str]):
 
     elif args[1] == "set" and len(args) == 4:
 
-        bot = args[2]
-        tickets = int(args[3])
-        ticket_sys = TicketSystem.load(ld)
-        ticket_sys.set(bot, tickets)
-        ticket_sys.save(ld, make_timestamp())
-        print(f"Successfully set the number of tickets of {bot} to {tickets}")
+        with league_lock(ld):
+            bot = args[2]
+            tickets = int(args[3])
+            ticket_sys = state.tickets()
+            ticket_sys.set(bot, tickets)
+            ticket_sys.save(ld, make_timestamp())
+            print(f"Successfully set the number of tickets of {bot} to {tickets}")
 
     elif args[1] == "list" and (len(args) == 2 or len(args) == 3):
 
         show_retired = len(args) == 3 and bool(args[2])
-        retired = show_retired or load_retired_bots(ld)
+        retired = show_retired or state.retired()
 
-        bots = load_all_bots(ld)
-        ticket_sys = TicketSystem.load(ld)
+        bots = state.bots()
+        ticket_sys = state.tickets()
         ticket_sys.ensure(bots)
 
         tickets = list(ticket_sys.tickets.items())
@@ -252,42 +360,45 @@ def parse_subcommand_ticket(args: List[str]):
 
     elif args[1] == "newBotTickets" and len(args) == 3:
 
-        tickets = float(args[2])
-        if tickets < 1:
-            print("The number of tickets given to new bots must be 1.0 or greater")
-        else:
-            # The number-of-tickets-given-to-new-bots setting is stored in LeagueSettings
-            league_settings = LeagueSettings.load(ld)
-            league_settings.new_bot_ticket_count = tickets
-            league_settings.save(ld)
+        with league_lock(ld):
+            tickets = float(args[2])
+            if tickets < 1:
+                print("The number of tickets given to new bots must be 1.0 or greater")
+            else:
+                # The number-of-tickets-given-to-new-bots setting is stored in LeagueSettings
+                league_settings = LeagueSettings.load(ld)
+                league_settings.new_bot_ticket_count = tickets
+                league_settings.save(ld)
 
-            print(f"Updated number of tickets given to new bots to {tickets}")
+                print(f"Updated number of tickets given to new bots to {tickets}")
 
     elif args[1] == "ticketIncreaseRate" and len(args) == 3:
 
-        rate = float(args[2])
-        if rate < 1.0:
-            print(f"The ticket increase rate must be 1.0 or greater")
-        else:
-            # The ticket-increase-rate setting is stored in LeagueSettings
-            league_settings = LeagueSettings.load(ld)
-            league_settings.ticket_increase_rate = rate
-            league_settings.save(ld)
+        with league_lock(ld):
+            rate = float(args[2])
+            if rate < 1.0:
+                print(f"The ticket increase rate must be 1.0 or greater")
+            else:
+                # The ticket-increase-rate setting is stored in LeagueSettings
+                league_settings = LeagueSettings.load(ld)
+                league_settings.ticket_increase_rate = rate
+                league_settings.save(ld)
 
-            print(f"Updated ticket increase rate to {rate}")
+                print(f"Updated ticket increase rate to {rate}")
 
     elif args[1] == "gameCatchupBoost" and len(args) == 3:
 
-        rate = float(args[2])
-        if rate < 0.0:
-            print(f"The game catchup boost must be 0.0 or greater")
-        else:
-            # The ticket-increase-rate setting is stored in LeagueSettings
-            league_settings = LeagueSettings.load(ld)
-            league_settings.game_catchup_boost = rate
-            league_settings.save(ld)
-
-            print(f"Updated game catchup boost to {rate}")
+        with league_lock(ld):
+            rate = float(args[2])
+            if rate < 0.0:
+                print(f"The game catchup boost must be 0.0 or greater")
+            else:
+                # The ticket-increase-rate setting is stored in LeagueSettings
+                league_settings = LeagueSettings.load(ld)
+                league_settings.game_catchup_boost = rate
+                league_settings.save(ld)
+
+                print(f"Updated game catchup boost to {rate}")
     else:
         print(help_msg)
 
@@ -298,6 +409,7 @@ def parse_subcommand_rank(args: List[str]):
         autoleague rank list [showRetired]  Print list of the current leaderboard"""
 
     ld = require_league_dir()
+    state = LeagueState.shared(ld)
 
     if len(args) == 1 or args[1] == "help":
         print(help_msg)
@@ -305,11 +417,11 @@ def parse_subcommand_rank(args: List[str]):
     elif args[1] == "list" and (len(args) == 2 or len(args) == 3):
 
         show_retired = len(args) == 3 and bool(args[2])
-        exclude = [] if show_retired else load_retired_bots(ld)
+        exclude = [] if show_retired else state.retired()
 
-        bots = load_all_bots(ld)
+        bots = state.bots()
 
-        rank_sys = RankingSystem.load(ld)
+        rank_sys = state.rankings()
         rank_sys.ensure_all(list(bots.keys()))
         rank_sys.print_ranks_and_mmr(exclude)
 
@@ -323,50 +435,113 @@ def parse_subcommand_match(args: List[str]):
     autoleague match run                        Run a standard 3v3 soccer match
     autoleague match prepare                    Run a standard 3v3 soccer match, but confirm match before starting
     autoleague match undo                       Undo the last match
-    autoleague match list [n]                   Show the latest matches"""
+    autoleague match list [n]                   Show the latest matches
+    autoleague match query [filters]            Show matches matching all filters:
+        --bot <bot_id>                          Matches of the bot
+        --teammate <bot_id>                     ... with the given teammate (requires --bot)
+        --opponent <bot_id>                     ... against the given opponent (requires --bot)
+        --map <map>                             Matches on the map
+        --since <time>                          Matches at or after the time (prefix of YYYYMMDDHHMMSS)
+        --until <time>                          Matches at or before the time (prefix of YYYYMMDDHHMMSS)
+        --min-margin <n>                        Matches won by at least n goals (by the bot if given)
+        --max-margin <n>                        Matches won by at most n goals, e.g. -1 for losses of the bot
+    autoleague match plan <k>                   Show k matches without common bots, which can be played at the same
+                                                time. Nothing is saved.
+    autoleague match coordinate <count> [addr]  Hand out <count> matches to workers on other machines, which run
+                                                them and report the results. Listens on [addr], which is a host,
+                                                port, or host:port (default localhost:8766). Use the address of
+                                                this machine in the network for workers on other machines.
+    autoleague match work <url> <token> [name]  Run matches handed out by the coordinator at <url>. The token is
+                                                printed by the coordinator."""
 
     ld = require_league_dir()
+    state = LeagueState.shared(ld)
 
     if len(args) == 1 or args[1] == "help":
         print(help_msg)
 
     elif (args[1] == "run" or args[1] == "prepare") and len(args) == 2:
 
-        # Load
-        bots = load_all_unretired_bots(ld)
-        rank_sys = RankingSystem.load(ld)
-        ticket_sys = TicketSystem.load(ld)
+        from bot_registry import BotRegistry
+        from match_index import MatchIndex
+        from match_runner import run_match
+        from overlay import make_overlay, update_summary
+        from replays import ReplayPreference
+        from stats import PairIndex, CareerStats
+        from timing import MatchTimer
+
+        # The lock is only held while loading and saving, so other commands can run while the match is played
+        timer = MatchTimer()
+        with league_lock(ld):
+            # Load
+            timer.begin("matchmaking")
+            bots = state.unretired_bots()
+            rank_sys = state.rankings()
+            ticket_sys = state.tickets()
+            match = MatchMaker.make_next(bots, rank_sys, ticket_sys)
+            version = league_version(ld)
 
         # Run
-        match = MatchMaker.make_next(bots, rank_sys, ticket_sys)
+        timer.begin("overlay")
         make_overlay(ld, match, bots)
+        timer.end()
         # Ask before starting?
         if args[1] == "run" or prompt_yes_no("Start match?", default="yes"):
-            result, replay = run_match(ld, match, bots, ReplayPreference.SAVE)
-            rank_sys.update(match, result)
-            match.result = result
-            match.replay_id = replay.replay_id
-
-            # Save
-            match.save(ld)
-            rank_sys.save(ld, match.time_stamp)
-            ticket_sys.save(ld, match.time_stamp)
-
-            # Print new ranks
-            rank_sys.print_ranks_and_mmr()
-
-            # Make summary
-            league_settings = LeagueSettings.load(ld)
-            make_summary(ld, league_settings.last_summary + 1)
-            print(f"Created summary of the last {league_settings.last_summary + 1} matches.")
+            result, replay = run_match(ld, match, bots, ReplayPreference.SAVE, timer)
+            timer.begin("persistence")
+            try:
+                with league_lock(ld):
+                    if league_version(ld) != version:
+                        # Another command changed the league while the match was played, e.g. `ticket set` or
+                        # `match undo`. The match is applied to the current rankings and tickets instead.
+                        print("The league changed while the match was played. Applying the result to the "
+                              "current rankings and tickets.")
+                        rank_sys = state.rankings()
+                        ticket_sys = state.tickets()
+                        ticket_sys.ensure(bots.keys())
+                        ticket_sys.choose(match.blue + match.orange, bots.keys())
+                        # The files of the match must be newer than the files saved meanwhile
+                        latest = max([path.name[:14] for folder in [ld.matches, ld.rankings, ld.tickets]
+                                      for path in folder.glob("*.json")], default="")
+                        match.time_stamp = next_timestamp(latest) if latest else match.time_stamp
+                        match.name = "_".join([match.time_stamp] + match.blue + ["vs"] + match.orange)
+                    rank_sys.update(match, result)
+                    match.result = result
+                    match.replay_id = replay.replay_id
+
+                    # Save
+                    match.save(ld)
+                    rank_sys.save(ld, match.time_stamp)
+                    ticket_sys.save(ld, match.time_stamp)
+                    BotRegistry.ensure(ld, match.blue + match.orange)
+                    PairIndex.add_saved_match(ld, match)
+                    CareerStats.add_saved_match(ld, match)
+                    MatchIndex.add_saved_match(ld, match)
+
+                    # Print new ranks
+                    rank_sys.print_ranks_and_mmr()
+
+                    # Make summary
+                    timer.begin("summary")
+                    update_summary(ld, match, rank_sys, ticket_sys, bots)
+                    print(f"Created summary of the last {LeagueSettings.load(ld).last_summary} matches.")
+            except LeagueLocked:
+                print(f"The match {match.name} ended {result.blue_goals}-{result.orange_goals}, but it could "
+                      f"not be saved.")
+                raise
+
+            timer.save(ld, match.name)
         else:
             print("Match cancelled.")
 
     elif args[1] == "undo" and len(args) == 2:
 
+        from match_index import MatchIndex
+        from overlay import SummaryState
+        from stats import PairIndex, CareerStats
+
         # Undo latest match
-        ld = require_league_dir()
-        latest_matches = MatchDetails.latest(ld, 1)
+        latest_matches = state.latest_matches(1)
         if len(latest_matches) == 0:
             print("No matches to undo")
         else:
@@ -375,18 +550,58 @@ def parse_subcommand_match(args: List[str]):
             # Prompt user
             print(f"Latest match was {latest_match.name}")
             if prompt_yes_no("Are you sure you want to undo the latest match?"):
-
-                # Undo latest update to all systems
-                RankingSystem.undo(ld)
-                TicketSystem.undo(ld)
-                MatchDetails.undo(ld)
-
-                # New latest match
-                new_latest_match = MatchDetails.latest(ld, 1)
-                if new_latest_match:
-                    print(f"Reverted to {new_latest_match[0].name}")
-                else:
-                    print("Reverted to beginning of league (no matches left)")
+                with league_lock(ld):
+                    # The lock isn't held while prompting, so another match may have been saved meanwhile
+                    current_matches = state.latest_matches(1)
+                    if not current_matches or current_matches[0].name != latest_match.name:
+                        print("The latest match changed in the meantime, so nothing was undone")
+                        return
+
+                    # Undo latest update to all systems
+                    RankingSystem.undo(ld)
+                    TicketSystem.undo(ld)
+                    MatchDetails.undo(ld)
+                    SummaryState.invalidate(ld)
+                    PairIndex.invalidate(ld)
+                    CareerStats.invalidate(ld)
+                    MatchIndex.invalidate(ld)
+
+                    # New latest match
+                    new_latest_match = state.latest_matches(1)
+                    if new_latest_match:
+                        print(f"Reverted to {new_latest_match[0].name}")
+                    else:
+                        print("Reverted to beginning of league (no matches left)")
+
+    elif args[1] == "plan" and len(args) == 3:
+
+        bots = state.unretired_bots()
+        matches = MatchMaker.make_batch(bots, state.rankings(), state.tickets(), int(args[2]))
+        print(f"{len(matches)} matches that can be played at the same time:")
+        for match in matches:
+            print(f"{', '.join(match.blue)}  VS  {', '.join(match.orange)}")
+
+    elif args[1] == "coordinate" and 3 <= len(args) <= 4:
+
+        from distributed import run_coordinator, DEFAULT_PORT, DEFAULT_HOST
+        host, port = DEFAULT_HOST, DEFAULT_PORT
+        if len(args) == 4:
+            if ":" in args[3]:
+                host, port = args[3].rsplit(":", 1)
+            elif args[3].isdigit():
+                port = args[3]
+            else:
+                host = args[3]
+        run_coordinator(ld, int(args[2]), int(port), host)
+
+    elif args[1] == "work" and 4 <= len(args) <= 5:
+
+        import socket
+        from distributed import Worker, run_real_match
+        from bots import load_all_bots
+        name = args[4] if len(args) == 5 else socket.gethostname()
+        played = Worker(args[2], args[3], name, run_real_match(ld, load_all_bots(ld))).run_forever()
+        print(f"All matches are played. This worker played {played} of them.")
 
     elif args[1] == "list" and len(args) <= 3:
 
@@ -395,19 +610,54 @@ def parse_subcommand_match(args: List[str]):
             count = int(args[2])
 
         # Show list of latest n matches played
-        latest_matches = MatchDetails.latest(ld, count)
+        from match_index import MatchIndex
+        index = MatchIndex.current(ld)
+        latest_matches = [index.match(i) for i in range(max(len(index) - count, 0), len(index))]
         if len(latest_matches) == 0:
             print("No matches have been played yet.")
         else:
             print(f"Match history (latest {len(latest_matches)} matches):")
-            for match in latest_matches:
-                print(
-                    f"{match.time_stamp}: {', '.join(match.blue) + ' ':.<46} {match.result.blue_goals} VS {match.result.orange_goals} {' ' + ', '.join(match.orange):.>46}")
+            print_matches(latest_matches)
+
+    elif args[1] == "query" and len(args) % 2 == 0:
+
+        filters = {
+            "--bot": "bot",
+            "--teammate": "teammate",
+            "--opponent": "opponent",
+            "--map": "map",
+            "--since": "since",
+            "--until": "until",
+            "--min-margin": "min_margin",
+            "--max-margin": "max_margin",
+        }
+        options = dict(zip(args[2::2], args[3::2]))
+        if not all(option in filters for option in options):
+            print(help_msg)
+            return
+        if ("--teammate" in options or "--opponent" in options) and "--bot" not in options:
+            print("The --teammate and --opponent filters require --bot")
+            return
+        query = {filters[option]: value for option, value in options.items()}
+        for margin in ["min_margin", "max_margin"]:
+            if margin in query:
+                query[margin] = int(query[margin])
+
+        from match_index import MatchIndex
+        matches = MatchIndex.current(ld).query(**query)
+        print(f"Found {len(matches)} matches:")
+        print_matches(matches)
 
     else:
         print(help_msg)
 
 
+def print_matches(matches: List['IndexedMatch']):
+    for match in matches:
+        print(
+            f"{match.time_stamp}: {', '.join(match.blue) + ' ':.<46} {match.blue_goals} VS {match.orange_goals} {' ' + ', '.join(match.orange):.>46}")
+
+
 def parse_subcommand_retirement(args: List[str]):
     assert args[0] == "retirement"
     help_msg = """Usage:
@@ -417,13 +667,14 @@ def parse_subcommand_retirement(args: List[str]):
         autoleague retirement retireall             Retire all bots"""
 
     ld = require_league_dir()
+    state = LeagueState.shared(ld)
 
     if len(args) == 1 or args[1] == "help":
         print(help_msg)
 
     elif args[1] == "list" and len(args) == 2:
 
-        retired = load_retired_bots(ld)
+        retired = state.retired()
 
         if len(retired) == 0:
             print("There are no bots in retirement")
@@ -434,39 +685,147 @@ def parse_subcommand_retirement(args: List[str]):
 
     elif args[1] == "retire" and len(args) == 3:
 
-        bot = args[2]
-        retired = load_retired_bots(ld)
+        with league_lock(ld):
+            bot = args[2]
+            retired = state.retired()
 
-        retired.add(bot)
-        save_retired_bots(ld, retired)
+            retired.add(bot)
+            save_retired_bots(ld, retired)
 
-        print(f"Retired {bot}")
+            print(f"Retired {bot}")
 
     elif args[1] == "unretire" and len(args) == 3:
 
-        bot = args[2]
-        retired = load_retired_bots(ld)
+        with league_lock(ld):
+            bot = args[2]
+            retired = state.retired()
 
-        try:
-            retired.remove(bot)
-            save_retired_bots(ld, retired)
-            print(f"Unretired {bot}")
-        except KeyError:
-            print(f"The bot {bot} is not in retirement")
+            try:
+                retired.remove(bot)
+                save_retired_bots(ld, retired)
+                print(f"Unretired {bot}")
+            except KeyError:
+                print(f"The bot {bot} is not in retirement")
 
     elif args[1] == "retireall" and len(args) == 2:
 
-        bot_configs = load_all_bots(ld)
-        rank_sys = RankingSystem.load(ld)
-        ticket_sys = TicketSystem.load(ld)
-        retired = load_retired_bots(ld)
+        with league_lock(ld):
+            bot_configs = state.bots()
+            rank_sys = state.rankings()
+            ticket_sys = state.tickets()
+            retired = state.retired()
+
+            all_bots = set(bot_configs.keys()).union(set(rank_sys.ratings.keys())).union(set(ticket_sys.tickets.keys())).union(retired)
+
+            save_retired_bots(ld, all_bots)
 
-        all_bots = set(bot_configs.keys()).union(set(rank_sys.ratings.keys())).union(set(ticket_sys.tickets.keys())).union(retired)
+            count = len(all_bots) - len(retired)
+            print(f"Retired {count} bots")
+
+    else:
+        print(help_msg)
+
+
+def parse_subcommand_season(args: List[str]):
+    assert args[0] == "season"
+    help_msg = """Usage:
+        autoleague season list                      Print the time stamps at which seasons started
+        autoleague season start [time]              Start a new season now or at the given time (a prefix of
+                                                    YYYYMMDDHHMMSS). `stats mmr season` groups matches by season."""
+
+    ld = require_league_dir()
+
+    if len(args) == 1 or args[1] == "help":
+        print(help_msg)
+
+    elif args[1] == "list" and len(args) == 2:
+
+        season_starts = LeagueSettings.load(ld).season_starts
+        if len(season_starts) == 0:
+            print("No season has been started")
+        else:
+            print("Seasons started at:")
+            for time in sorted(season_starts):
+                print(time)
+
+    elif args[1] == "start" and 2 <= len(args) <= 3:
+
+        time = args[2].ljust(14, "0") if len(args) == 3 else make_timestamp()
+        if len(time) != 14 or not time.isdigit():
+            print(f"Invalid time '{args[2]}'. The time must be a prefix of YYYYMMDDHHMMSS.")
+            return
+        with league_lock(ld):
+            league_settings = LeagueSettings.load(ld)
+            if time in league_settings.season_starts:
+                print(f"A season already starts at {time}")
+            else:
+                league_settings.season_starts = sorted(league_settings.season_starts + [time])
+                league_settings.save(ld)
+                print(f"Started a season at {time}")
+
+    else:
+        print(help_msg)
+
+
+def parse_subcommand_stats(args: List[str]):
+    assert args[0] == "stats"
+    help_msg = """Usage:
+    autoleague stats timing [n]                 Show time spent in each phase of the last [n] matches
+    autoleague stats winmatrix [png]            Write the win and win rate matrices to the stats directory
+    autoleague stats pair <bot_a> <bot_b>       Show how bot a does with and against bot b
+    autoleague stats mmr <granularity> [npy]    Write the MMR of all bots per match/day/week/season as csv (or npy)
+    autoleague stats ratinggrid [processes]     Replay all matches with each set of rating parameters in a grid and
+                                                show the parameters that best predict the winner (by log-loss)
+    autoleague stats matchmaking [n] [processes]
+                                                Simulate [n] sessions (default 4) with each set of ticket and
+                                                matchmaking parameters in a grid and compare how evenly bots play,
+                                                the match quality, and the MMR gap within matches"""
+
+    from stats import write_win_matrices, print_pair_stats, write_mmr_series, GRANULARITIES
+    from timing import print_timing_stats
+
+    ld = require_league_dir()
+
+    if len(args) == 1 or args[1] == "help":
+        print(help_msg)
+
+    elif args[1] == "timing" and len(args) <= 3:
+
+        count = int(args[2]) if len(args) == 3 else 0
+        print_timing_stats(ld, count)
+
+    elif args[1] == "winmatrix" and args[2:] in [[], ["png"]]:
+
+        write_win_matrices(ld, png=len(args) == 3)
+        print(f"Wrote win matrices to '{ld.stats}'")
+
+    elif args[1] == "pair" and len(args) == 4:
+
+        print_pair_stats(ld, args[2], args[3])
+
+    elif args[1] == "mmr" and 3 <= len(args) <= 4 and args[3:] in [[], ["csv"], ["npy"]]:
+
+        granularity = args[2]
+        if granularity not in GRANULARITIES:
+            print(f"Invalid granularity '{granularity}'. Valid granularities are match, day, week, and season.")
+            return
+        if granularity == "season" and not LeagueSettings.load(ld).season_starts:
+            print("No season has been started, so all matches are in one period. See `autoleague season start`.")
+        path = write_mmr_series(ld, granularity, args[3] if len(args) == 4 else "csv")
+        print(f"Wrote MMR series to '{path}'")
+
+    elif args[1] == "ratinggrid" and len(args) <= 3:
+
+        from rating_grid import print_rating_grid
+        if len(args) == 3:
+            print_rating_grid(ld, int(args[2]))
+        else:
+            print_rating_grid(ld)
 
-        save_retired_bots(ld, all_bots)
+    elif args[1] == "matchmaking" and len(args) <= 4:
 
-        count = len(all_bots) - len(retired)
-        print(f"Retired {count} bots")
+        from matchmaking_tuner import run_tuner
+        run_tuner(ld, *[int(arg) for arg in args[2:]])
 
     else:
         print(help_msg)
@@ -0,0 +1,86 @@
+import json
+from typing import Dict, Iterable, List, TYPE_CHECKING
+
+from bots import BotID
+from paths import LeagueDir
+from ranking_system import RankingSystem
+from storage import atomic_write
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class BotRegistry:
+    """
+    Assigns each bot a stable, dense integer id, so data about bots can be kept in arrays indexed by id, e.g. by
+    `RankingSystem.arrays` and `TicketSystem.arrays`. Ids are assigned in the order bots are registered and never
+    change or get reused, not even when a bot retires. The registry is saved as `bot_registry.json` in the league
+    directory. Bots are only registered by `ensure`, which saves the registry, so an id is the same in every process.
+    """
+    def __init__(self):
+        # The bot of each id
+        self.bots: List[BotID] = []
+        self._ids: Dict[BotID, int] = {}
+
+    def __len__(self):
+        return len(self.bots)
+
+    def __contains__(self, bot: BotID) -> bool:
+        return bot in self._ids
+
+    def id(self, bot: BotID) -> int:
+        """
+        Returns the id of the given bot. Raises KeyError if the bot is not registered.
+        """
+        return self._ids[bot]
+
+    def ids(self, bots: Iterable[BotID]) -> 'np.ndarray':
+        """
+        Returns the ids of the given bots as an array. Raises KeyError if any of them is not registered.
+        """
+        import numpy as np
+        return np.array([self._ids[bot] for bot in bots], dtype=np.int64)
+
+    def bot(self, id: int) -> BotID:
+        return self.bots[id]
+
+    def register(self, bots: Iterable[BotID]) -> bool:
+        """
+        Register the given bots in memory. Returns true if any of them were new.
+        """
+        count = len(self.bots)
+        for bot in bots:
+            if bot not in self._ids:
+                self._ids[bot] = len(self.bots)
+                self.bots.append(bot)
+        return len(self.bots) > count
+
+    def save(self, ld: LeagueDir):
+        with atomic_write(ld.bot_registry, 'w') as f:
+            json.dump(self.bots, f)
+
+    @staticmethod
+    def load(ld: LeagueDir) -> 'BotRegistry':
+        """
+        Loads the registry or returns an empty registry if there is none.
+        """
+        registry = BotRegistry()
+        if ld.bot_registry.exists():
+            with open(ld.bot_registry) as f:
+                registry.register(json.load(f))
+        return registry
+
+    @staticmethod
+    def ensure(ld: LeagueDir, bots: Iterable[BotID] = ()) -> 'BotRegistry':
+        """
+        Loads the registry and registers the given bots. The registry is saved, if bots were added, so their ids
+        stay the same. A league without a registry starts with all rated bots in alphabetical order.
+        """
+        registry = BotRegistry.load(ld)
+        changed = not ld.bot_registry.exists()
+        if changed:
+            registry.register(sorted(RankingSystem.load(ld).ratings.keys()))
+        changed |= registry.register(bots)
+        if changed:
+            registry.save(ld)
+        return registry
@@ -3,6 +3,8 @@ import json
 from bots import load_all_bots, defmt_bot_name
 from paths import LeagueDir
 from ranking_system import RankingSystem
+from stats import CareerStats
+from storage import atomic_write
 
 
 def create_bot_summary(ld: LeagueDir):
@@ -13,22 +15,24 @@ def create_bot_summary(ld: LeagueDir):
     bots = load_all_bots(ld)
     rankings = RankingSystem.load(ld).ensure_all(list(bots.keys()))
     rank_list = rankings.as_sorted_list()
+    career = CareerStats.current(ld)
 
     def bot_data(bot_id):
-        config = bots[bot_id]
+        details = bots.details(bot_id)
         rank, mmr = [(i + 1, mrr) for i, (id, mrr, sigma) in enumerate(rank_list) if id == bot_id][0]
         return {
-            "name": config.name,
-            "developer": config.base_agent_config.get("Details", "developer"),
-            "description": config.base_agent_config.get("Details", "description"),
-            "fun_fact": config.base_agent_config.get("Details", "fun_fact"),
-            "github": config.base_agent_config.get("Details", "github"),
-            "language": config.base_agent_config.get("Details", "language"),
+            "name": bots.name(bot_id),
+            "developer": details["developer"],
+            "description": details["description"],
+            "fun_fact": details["fun_fact"],
+            "github": details["github"],
+            "language": details["language"],
             "rank": rank,
             "mmr": mmr,
+            "stats": career.get(bot_id),
         }
 
     bot_summary = {defmt_bot_name(bot_id): bot_data(bot_id) for bot_id in bots.keys()}
 
-    with open(ld.bot_summary, 'w') as f:
+    with atomic_write(ld.bot_summary, 'w') as f:
         json.dump(bot_summary, f, indent=4)
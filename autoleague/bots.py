@@ -1,13 +1,20 @@
+import glob
+import hashlib
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from configparser import NoSectionError, MissingSectionHeaderError, NoOptionError, ParsingError
 from pathlib import Path
-from typing import Dict, Mapping, List, Set
+from typing import Dict, Mapping, List, Set, Iterable, Iterator, Optional, Tuple, TYPE_CHECKING
 from zipfile import ZipFile
 
-from rlbot.parsing.bot_config_bundle import BotConfigBundle, get_bot_config_bundle
-from rlbot.parsing.directory_scanner import scan_directory_for_bot_configs
-
 from paths import PackageFiles, LeagueDir
+from storage import atomic_write
+
+# rlbot is slow to import, so it is only imported when configs are actually parsed
+if TYPE_CHECKING:
+    from rlbot.parsing.bot_config_bundle import BotConfigBundle
 
 BotID = str
 
@@ -23,31 +30,28 @@ def defmt_bot_name(name: BotID) -> str:
     return name.replace("_", " ")
 
 
-def load_all_unretired_bots(ld: LeagueDir) -> Mapping[BotID, BotConfigBundle]:
+def load_all_unretired_bots(ld: LeagueDir) -> 'BotConfigs':
     bots = load_all_bots(ld)
     retired = load_retired_bots(ld)
-    bots = {bot_id: config for bot_id, config in bots.items() if bot_id not in retired}
-    return bots
+    return bots.without(retired)
 
 
-def load_all_bots(ld: LeagueDir) -> Mapping[BotID, BotConfigBundle]:
-    bots = {
-        fmt_bot_name(bot_config.name): bot_config
-        for bot_config in scan_directory_for_bot_configs(ld.bots)
-    }
+def load_all_bots(ld: LeagueDir) -> 'BotConfigs':
+    psyonix_paths = [PackageFiles.psyonix_allstar, PackageFiles.psyonix_pro, PackageFiles.psyonix_rookie]
+    config_paths = [Path(path) for path in glob.iglob(os.path.join(ld.bots, '**/*.cfg'), recursive=True)]
 
-    # Psyonix bots
-    psyonix_allstar = get_bot_config_bundle(PackageFiles.psyonix_allstar)
-    psyonix_pro = get_bot_config_bundle(PackageFiles.psyonix_pro)
-    psyonix_rookie = get_bot_config_bundle(PackageFiles.psyonix_rookie)
+    index = BotIndex.load(ld)
+    if index.refresh(config_paths + psyonix_paths):
+        index.save(ld)
 
-    psyonix_allstar_name = fmt_bot_name(psyonix_allstar.name)
-    psyonix_pro_name = fmt_bot_name(psyonix_pro.name)
-    psyonix_rookie_name = fmt_bot_name(psyonix_rookie.name)
+    bots = BotConfigs(index)
+    for path in config_paths:
+        bots.add(path)
 
-    bots[psyonix_allstar_name] = psyonix_allstar
-    bots[psyonix_pro_name] = psyonix_pro
-    bots[psyonix_rookie_name] = psyonix_rookie
+    # Psyonix bots
+    psyonix_allstar_name = bots.add(PackageFiles.psyonix_allstar)
+    psyonix_pro_name = bots.add(PackageFiles.psyonix_pro)
+    psyonix_rookie_name = bots.add(PackageFiles.psyonix_rookie)
 
     # Psyonix bots have skill values
     psyonix_bot_skill[psyonix_allstar_name] = 1.0
@@ -57,14 +61,168 @@ def load_all_bots(ld: LeagueDir) -> Mapping[BotID, BotConfigBundle]:
     return bots
 
 
-def logo(config: BotConfigBundle) -> Path:
+class BotIndex:
+    """
+    A persistent index of bot config files. Each entry is keyed by the path of the config file and stores the
+    modification time of the file when it was parsed together with the parsed details. Configs are only parsed
+    again when their modification time changes, so unchanged bots are never re-parsed. The logo file is stored by
+    name only and looked up when needed, since a logo can be added or removed without changing the config.
+    The index is saved as `bot_index.json` in the league directory.
+    """
+
+    # The fields of the [Details] section stored in the index
+    detail_keys = ["developer", "description", "fun_fact", "github", "language"]
+
+    def __init__(self):
+        # Maps config paths to their entry. The name of an entry is None, if the file is not a valid bot config.
+        self.entries: Dict[str, dict] = {}
+
+    def refresh(self, config_paths: Iterable[Path]) -> bool:
+        """
+        Revalidate the index against the given config files. New and modified configs are parsed and configs
+        that are no longer in the list are forgotten. Returns true if the index was changed.
+        """
+        changed = False
+        seen = set()
+        for path in config_paths:
+            key = str(path)
+            seen.add(key)
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                continue
+            entry = self.entries.get(key)
+            # Entries of bots saved with a resolved logo path are parsed again
+            if entry is None or entry["mtime"] != mtime or (entry["name"] is not None and "logo_file" not in entry):
+                self.entries[key] = BotIndex.parse_entry(path, mtime)
+                changed = True
+
+        for key in list(self.entries.keys()):
+            if key not in seen:
+                del self.entries[key]
+                changed = True
+
+        return changed
+
+    @staticmethod
+    def parse_entry(path: Path, mtime: float) -> dict:
+        """
+        Parse the given config file and create an index entry for it.
+        """
+        from rlbot.agents.base_agent import BOT_CONFIG_MODULE_HEADER, LOGO_FILE_KEY
+        from rlbot.parsing.bot_config_bundle import get_bot_config_bundle
+        try:
+            config = get_bot_config_bundle(path)
+        except (NoSectionError, MissingSectionHeaderError, NoOptionError, AttributeError, ParsingError, FileNotFoundError):
+            # Not a bot config, e.g. an appearance config
+            return {"mtime": mtime, "name": None}
+        # Like BotConfigBundle.get_logo_file, but without checking that the logo exists
+        logo_name = config.base_agent_config.get(BOT_CONFIG_MODULE_HEADER, LOGO_FILE_KEY) or "logo.png"
+        return {
+            "mtime": mtime,
+            "name": config.name,
+            "details": {key: config.base_agent_config.get("Details", key) for key in BotIndex.detail_keys},
+            "logo_file": os.path.join(config.config_directory, logo_name),
+        }
+
+    def save(self, ld: LeagueDir):
+        with atomic_write(ld.bot_index, 'w') as f:
+            json.dump(self.entries, f, sort_keys=True)
+
+    @staticmethod
+    def load(ld: LeagueDir) -> 'BotIndex':
+        index = BotIndex()
+        if ld.bot_index.exists():
+            try:
+                with open(ld.bot_index) as f:
+                    index.entries = json.load(f)
+            except json.JSONDecodeError:
+                # A broken index is simply rebuilt
+                pass
+        return index
+
+
+class BotConfigs(Mapping[BotID, 'BotConfigBundle']):
+    """
+    Maps bot ids to their BotConfigBundle. The set of bots and their details are known from the BotIndex,
+    so a config is only parsed when its bundle is accessed.
+    """
+
+    def __init__(self, index: BotIndex):
+        self._index = index
+        self._paths: Dict[BotID, str] = {}
+        self._bundles: Dict[BotID, 'BotConfigBundle'] = {}
+
+    def add(self, path: Path) -> Optional[BotID]:
+        """
+        Add the bot with the given config file, if it is a valid bot config. Returns the id of the bot.
+        """
+        entry = self._index.entries.get(str(path))
+        if entry is None or entry["name"] is None:
+            return None
+        bot_id = fmt_bot_name(entry["name"])
+        self._paths[bot_id] = str(path)
+        return bot_id
+
+    def without(self, excluded: Iterable[BotID]) -> 'BotConfigs':
+        """
+        Returns a copy of this mapping without the given bots.
+        """
+        excluded = set(excluded)
+        bots = BotConfigs(self._index)
+        bots._paths = {bot_id: path for bot_id, path in self._paths.items() if bot_id not in excluded}
+        bots._bundles = {bot_id: bundle for bot_id, bundle in self._bundles.items() if bot_id not in excluded}
+        return bots
+
+    def name(self, bot_id: BotID) -> str:
+        """
+        Returns the name of the given bot as written in its config.
+        """
+        return self._index.entries[self._paths[bot_id]]["name"]
+
+    def details(self, bot_id: BotID) -> Dict[str, Optional[str]]:
+        """
+        Returns the [Details] section of the given bot's config without parsing the config.
+        """
+        return self._index.entries[self._paths[bot_id]]["details"]
+
+    def config_path(self, bot_id: BotID) -> str:
+        """
+        Returns the path to the given bot's config file.
+        """
+        return self._paths[bot_id]
+
+    def logo_path(self, bot_id: BotID) -> Optional[str]:
+        """
+        Returns the path to the given bot's logo without parsing the config, or None if it has no logo.
+        """
+        logo_file = self._index.entries[self._paths[bot_id]]["logo_file"]
+        return os.path.realpath(logo_file) if os.path.exists(logo_file) else None
+
+    def __getitem__(self, bot_id: BotID) -> 'BotConfigBundle':
+        from rlbot.parsing.bot_config_bundle import get_bot_config_bundle
+        if bot_id not in self._bundles:
+            self._bundles[bot_id] = get_bot_config_bundle(self._paths[bot_id])
+        return self._bundles[bot_id]
+
+    def __contains__(self, bot_id) -> bool:
+        return bot_id in self._paths
+
+    def __iter__(self) -> Iterator[BotID]:
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+
+def logo(config: 'BotConfigBundle') -> Path:
     """
     Returns the path to the given bot or None if it does not exists.
     """
     return config.get_logo_file()
 
 
-def print_details(config: BotConfigBundle):
+def print_details(config: 'BotConfigBundle'):
     """
     Print all details about a bot
     """
@@ -90,19 +248,105 @@ def print_details(config: BotConfigBundle):
 
 def unzip_all_bots(ld: LeagueDir):
     """
-    Unzip all zip files in the bot directory
+    Unzip all zip files in the bot directory. Archives that have not changed since they were last extracted
+    are skipped, and the remaining archives are extracted concurrently. Zip files found inside the extracted
+    folders are extracted afterwards.
+    """
+    unzip_index = load_unzip_index(ld)
+    extracted_count = 0
+    skipped_count = 0
+
+    pending = find_zip_files(ld.bots)
+    with ThreadPoolExecutor() as executor:
+        while len(pending) > 0:
+            # Zip files inside the target folder of another zip file are postponed to the next round,
+            # since the folder may be overwritten in this round
+            targets = [unzip_target_dir(path) for path in pending]
+            postponed = [path for path in pending if any(target in path.parents for target in targets)]
+            current = [path for path in pending if path not in postponed]
+
+            results = executor.map(lambda path: unzip_if_changed(path, unzip_index.get(str(path))), current)
+
+            new_folders = []
+            for path, (entry, extracted, byte_count, seconds) in zip(current, results):
+                unzip_index[str(path)] = entry
+                if extracted:
+                    extracted_count += 1
+                    new_folders.append(unzip_target_dir(path))
+                    print(f"Extracted {path} ({byte_count} bytes in {seconds:.2f}s)")
+                else:
+                    skipped_count += 1
+
+            pending = postponed + [path for folder in new_folders for path in find_zip_files(folder)
+                                   if path not in postponed]
+
+    save_unzip_index(ld, unzip_index)
+    print(f"Extracted {extracted_count} archives, skipped {skipped_count} unchanged archives")
+
+
+def find_zip_files(folder: Path) -> List[Path]:
+    """
+    Returns the paths of all zip files in the given folder and its sub folders.
+    """
+    return [Path(root) / file for root, dirs, files in os.walk(folder) for file in files if ".zip" in file]
+
+
+def unzip_target_dir(path: Path) -> Path:
+    """
+    Returns the folder the given zip file is extracted to.
     """
-    for root, dirs, files in os.walk(ld.bots, topdown=True):
-        dirs[:] = [d for d in dirs]
-        for file in files:
-            if ".zip" in file:
-                path = os.path.join(root, file)
-                with ZipFile(path, "r") as zipObj:
-                    # Extract all the contents of zip file in current directory
-                    print(f"Extracting {path}")
-                    folder_name = os.path.splitext(os.path.basename(path))[0]
-                    target_dir = os.path.join(root, folder_name)
-                    zipObj.extractall(path=target_dir)
+    return path.parent / os.path.splitext(path.name)[0]
+
+
+def unzip_if_changed(path: Path, entry: Optional[dict]) -> Tuple[dict, bool, int, float]:
+    """
+    Extract the given zip file unless the unzip index entry shows that it has been extracted already.
+    The archive is compared by modification time and size first and by its hash only when those differ.
+    Returns the new index entry, whether the archive was extracted, the number of bytes extracted,
+    and the time it took.
+    """
+    start = time.monotonic()
+    stat = os.stat(path)
+    target_dir = unzip_target_dir(path)
+    if entry is not None and target_dir.exists():
+        if entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            return entry, False, 0, 0.0
+        sha1 = hash_file(path)
+        if entry["sha1"] == sha1:
+            return {"mtime": stat.st_mtime, "size": stat.st_size, "sha1": sha1}, False, 0, 0.0
+    else:
+        sha1 = hash_file(path)
+
+    with ZipFile(path, "r") as zipObj:
+        # Extract all the contents of zip file in current directory
+        zipObj.extractall(path=target_dir)
+        byte_count = sum(info.file_size for info in zipObj.infolist())
+
+    return {"mtime": stat.st_mtime, "size": stat.st_size, "sha1": sha1}, True, byte_count, time.monotonic() - start
+
+
+def hash_file(path: Path) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def load_unzip_index(ld: LeagueDir) -> Dict[str, dict]:
+    """
+    Loads the index of extracted zip files. It maps the path of each archive to its modification time, size,
+    and hash at the time it was extracted.
+    """
+    if not ld.unzip_index.exists():
+        return dict()
+    with open(ld.unzip_index, 'r') as unzip_index_file:
+        return json.load(unzip_index_file)
+
+
+def save_unzip_index(ld: LeagueDir, unzip_index: Dict[str, dict]):
+    with atomic_write(ld.unzip_index, 'w') as unzip_index_file:
+        json.dump(unzip_index, unzip_index_file, sort_keys=True)
 
 
 def load_retired_bots(ld: LeagueDir) -> Set[BotID]:
@@ -116,5 +360,5 @@ def load_retired_bots(ld: LeagueDir) -> Set[BotID]:
 
 
 def save_retired_bots(ld: LeagueDir, retired: Set[BotID]):
-    with open(ld.retirement, 'w') as retirement_file:
+    with atomic_write(ld.retirement, 'w') as retirement_file:
         json.dump(list(retired), retirement_file)
@@ -1,31 +1,167 @@
 import csv
-
+import json
 from pathlib import Path
+from typing import Dict, List, Optional
 
 from trueskill import Rating
 
-from bots import load_all_bots, load_retired_bots
+from bots import load_all_bots, load_retired_bots, BotID
 from leaguesettings import LeagueSettings
 from match import MatchDetails
 from match_maker import TicketSystem
 from paths import LeagueDir
 from ranking_system import RankingSystem
 from settings import PersistentSettings
-
-
-def convert_to_csvs(ld: LeagueDir):
+from storage import atomic_write
+
+
+class CsvExportState:
+    """
+    Remembers how far the csv files have been exported, so the next export only has to append rows for
+    newer matches, ratings, and tickets. The state is saved as `export_state.json` in the csv directory.
+    """
+    def __init__(self):
+        # Time stamp of the newest exported match, rankings, or tickets file (the watermark)
+        self.last_time = "00000000000000"
+        # The last exported mu and ticket count of each bot
+        self.last_mu: Dict[BotID, float] = {}
+        self.last_tickets: Dict[BotID, float] = {}
+
+    def save(self, ld: LeagueDir):
+        with atomic_write(ld.csv_export_state, 'w') as f:
+            json.dump(self.__dict__, f, sort_keys=True)
+
+    @staticmethod
+    def load(ld: LeagueDir) -> Optional['CsvExportState']:
+        """
+        Loads the saved state or returns None if there is none, e.g. because the csv files were made before
+        exports were incremental. Then it is unknown what the files contain, so they must be regenerated.
+        """
+        if not ld.csv_export_state.exists():
+            return None
+        state = CsvExportState()
+        try:
+            with open(ld.csv_export_state) as f:
+                state.__dict__.update(json.load(f))
+        except json.JSONDecodeError:
+            return None
+        return state
+
+    def is_valid(self, ld: LeagueDir) -> bool:
+        """
+        Returns true if the exported csv files are still consistent with the league, i.e. the files exist
+        and the newest exported rankings have not been undone.
+        """
+        csvs = [ld.csv_bots, ld.csv_matches, ld.csv_tickets, ld.csv_ratings, ld.csv_scores]
+        if not all(path.exists() for path in csvs):
+            return False
+        return self.last_time == CsvExportState().last_time or \
+            (ld.rankings / f"{self.last_time}_rankings.json").exists() or \
+            (ld.tickets / f"{self.last_time}_tickets.json").exists()
+
+
+def convert_to_csvs(ld: LeagueDir, full: bool = False):
+    """
+    Export the league data to csv files. Only rows for matches, ratings, and tickets newer than the
+    last export are appended, unless `full` is true or the previous export is no longer consistent with
+    the league (e.g. because a match was undone), in which case all files are regenerated.
+    """
 
     league_settings = LeagueSettings.load(ld)
     RankingSystem.setup()
 
-    times = ["00000000000000"] + [path.name[:14] for path in list(ld.rankings.iterdir())]
-    rankings = RankingSystem.all(ld)
-    tickets = TicketSystem.all(ld, league_settings)
-    bots = sorted(rankings[-1].ratings.keys())
-    matches = MatchDetails.all(ld)
+    state = CsvExportState.load(ld)
+    if full or state is None or not state.is_valid(ld):
+        state = CsvExportState()
+        write_readme(ld)
+        write_headers(ld)
+
+    # Only the files after the watermark are read. A match is saved before its rankings and tickets, and
+    # exporting doesn't lock the league, so we stop before the newest match if it is only partially saved.
+    # Otherwise the watermark would pass its rankings or tickets before they are written.
+    rankings = sorted(ld.rankings.glob("*.json"))
+    tickets = sorted(ld.tickets.glob("*.json"))
+    matches = sorted(ld.matches.glob("*.json"))
+    end_time = "99999999999999"
+    if matches:
+        newest = matches[-1].name[:14]
+        if not (ld.rankings / f"{newest}_rankings.json").exists() or \
+                not (ld.tickets / f"{newest}_tickets.json").exists():
+            end_time = newest
+    new_rankings = [path for path in rankings if state.last_time < path.name[:14] < end_time]
+    new_tickets = [path for path in tickets if state.last_time < path.name[:14] < end_time]
+    new_matches = [path for path in matches if state.last_time < path.name[:14] < end_time]
+
+    write_bots(ld, sorted(RankingSystem.load(ld).ratings.keys()))
+
+    # Tickets
+    with open(ld.csv_tickets, 'a', newline="") as tickets_csv:
+        tickets_writer = csv.writer(tickets_csv)
+        for path in new_tickets:
+            time = path.name[:14]
+            ticket = TicketSystem.read(path, league_settings)
+            # Only bots of this file and earlier files, so the rows don't depend on when the export runs
+            for bot in sorted(ticket.tickets.keys() | state.last_tickets.keys()):
+                default_tickets = 8.0 if 20210219110000 <= int(time) <= 20230122120000 else 4.0
+                current_count = float(ticket.tickets.get(bot, ticket.new_bot_ticket_count))
+                if (bot not in state.last_tickets and current_count != default_tickets) or (
+                        bot in state.last_tickets and current_count != state.last_tickets[bot]):
+                    tickets_writer.writerow([time, bot, current_count])
+                    state.last_tickets[bot] = current_count
+
+    # Rankings
+    with open(ld.csv_ratings, 'a', newline="") as ratings_csv:
+        ratings_writer = csv.writer(ratings_csv)
+        default_rating = Rating()
+        for path in new_rankings:
+            time = path.name[:14]
+            ranking = RankingSystem.read(path)
+            for bot in sorted(ranking.ratings.keys() | state.last_mu.keys()):
+                rating = ranking.ratings.get(bot, default_rating)
+                if (bot not in state.last_mu and rating.mu != default_rating.mu) or (
+                        bot in state.last_mu and rating.mu != state.last_mu[bot]):
+                    ratings_writer.writerow([time, bot, round(rating.mu - rating.sigma), rating.mu, rating.sigma])
+                    state.last_mu[bot] = rating.mu
+
+    # Matches
+    with open(ld.csv_matches, 'a', newline="") as matches_csv:
+        with open(ld.csv_scores, 'a', newline="") as scores_csv:
+            matches_writer = csv.writer(matches_csv)
+            scores_writer = csv.writer(scores_csv)
+            for path in new_matches:
+                match = MatchDetails.read(path)
+                matches_writer.writerow([
+                    match.time_stamp,
+                    match.blue[0],
+                    match.blue[1],
+                    match.blue[2],
+                    match.orange[0],
+                    match.orange[1],
+                    match.orange[2],
+                    match.map,
+                    match.replay_id,
+                    match.result.blue_goals,
+                    match.result.orange_goals,
+                ])
+                for bot, stats in match.result.player_scores.items():
+                    scores_writer.writerow([
+                        match.time_stamp,
+                        bot,
+                        stats.points,
+                        stats.goals,
+                        stats.shots,
+                        stats.saves,
+                        stats.assists,
+                        stats.demolitions,
+                        stats.own_goals,
+                    ])
+
+    state.last_time = max([state.last_time] + [path.name[:14] for path in new_rankings + new_tickets + new_matches])
+    state.save(ld)
 
-    # Readme
-    with open(ld.csvs_readme, 'w', encoding='utf8') as readme:
+
+def write_readme(ld: LeagueDir):
+    with atomic_write(ld.csvs_readme, 'w', encoding='utf8') as readme:
         readme.write("""# League Play Stats
 
 During league play various stats have been recorded.
@@ -105,8 +241,49 @@ Columns:
 - sigma
         """)
 
-    # Bots
-    with open(ld.csv_bots, 'w', newline="", encoding='utf8') as bots_csv:
+
+def write_headers(ld: LeagueDir):
+    """
+    Create the csv files of the incrementally exported tables with just their header.
+    """
+    headers = {
+        ld.csv_tickets: ["time", "bot", "count"],
+        ld.csv_ratings: ["time", "bot", "mmr", "mu", "sigma"],
+        ld.csv_matches: [
+            "time",
+            "blue_bot_1",
+            "blue_bot_2",
+            "blue_bot_3",
+            "orange_bot_1",
+            "orange_bot_2",
+            "orange_bot_3",
+            "map",
+            "replay_id",
+            "blue_goals",
+            "orange_goals"
+        ],
+        ld.csv_scores: [
+            "time",
+            "bot",
+            "points",
+            "goals",
+            "shots",
+            "saves",
+            "assists",
+            "demolitions",
+            "own_goals",
+        ],
+    }
+    for path, header in headers.items():
+        with atomic_write(path, 'w', newline="") as f:
+            csv.writer(f).writerow(header)
+
+
+def write_bots(ld: LeagueDir, bots: List[BotID]):
+    """
+    Write the bots table. It is small, so it is always regenerated.
+    """
+    with atomic_write(ld.csv_bots, 'w', newline="", encoding='utf8') as bots_csv:
         bots_writer = csv.writer(bots_csv)
         # Header
         bots_writer.writerow(["bot", "status", "developer", "language", "description", "fun_fact", "github"])
@@ -115,113 +292,21 @@ Columns:
         for bot in bots:
             status = "retired" if bot in retirement else "active"
             if bot in bot_configs:
-                config = bot_configs[bot]
+                details = bot_configs.details(bot)
                 bots_writer.writerow([
                     bot,
                     status,
-                    config.base_agent_config.get("Details", "developer"),
-                    config.base_agent_config.get("Details", "language"),
-                    config.base_agent_config.get("Details", "description"),
-                    config.base_agent_config.get("Details", "fun_fact"),
-                    config.base_agent_config.get("Details", "github")
+                    details["developer"],
+                    details["language"],
+                    details["description"],
+                    details["fun_fact"],
+                    details["github"]
                 ])
             else:
                 bots_writer.writerow([bot, status, "", "", "", "", ""])
 
-    # Tickets
-    with open(ld.csv_tickets, 'w', newline="") as tickets_csv:
-        tickets_writer = csv.writer(tickets_csv)
-        # Header
-        tickets_writer.writerow(["time", "bot", "count"])
-        last_count = {}
-        z = zip(times, tickets)
-        next(z)
-        for time, ticket in z:
-            for bot in bots:
-                default_tickets = 8.0 if 20210219110000 <= int(time) <= 20230122120000 else 4.0
-                current_count = float(ticket.get_ensured(bot))
-                if (bot not in last_count and current_count != default_tickets) or (
-                        bot in last_count and current_count != last_count[bot]):
-                    tickets_writer.writerow([time, bot, current_count])
-                    last_count[bot] = current_count
-
-    # Rankings
-    with open(ld.csv_ratings, 'w', newline="") as ratings_csv:
-        ratings_writer = csv.writer(ratings_csv)
-        # Header
-        ratings_writer.writerow(["time", "bot", "mmr", "mu", "sigma"])
-        default_rating = Rating()
-        last_mu = {}
-        z = zip(times, rankings)
-        next(z)
-        for time, ranking in z:
-            for bot in bots:
-                current_mu = ranking.get(bot).mu
-                if (bot not in last_mu and current_mu != default_rating.mu) or (
-                        bot in last_mu and current_mu != last_mu[bot]):
-                    ratings_writer.writerow(
-                        [time, bot, ranking.get_mmr(bot), ranking.get(bot).mu, ranking.get(bot).sigma])
-                    last_mu[bot] = current_mu
-
-    # Matches
-    with open(ld.csv_matches, 'w', newline="") as matches_csv:
-        with open(ld.csv_scores, 'w', newline="") as scores_csv:
-            matches_writer = csv.writer(matches_csv)
-            scores_writer = csv.writer(scores_csv)
-            # Header
-            matches_writer.writerow([
-                "time",
-                "blue_bot_1",
-                "blue_bot_2",
-                "blue_bot_3",
-                "orange_bot_1",
-                "orange_bot_2",
-                "orange_bot_3",
-                "map",
-                "replay_id",
-                "blue_goals",
-                "orange_goals"
-            ])
-            scores_writer.writerow([
-                "time",
-                "bot",
-                "points",
-                "goals",
-                "shots",
-                "saves",
-                "assists",
-                "demolitions",
-                "own_goals",
-            ])
-            for match in matches:
-                matches_writer.writerow([
-                    match.time_stamp,
-                    match.blue[0],
-                    match.blue[1],
-                    match.blue[2],
-                    match.orange[0],
-                    match.orange[1],
-                    match.orange[2],
-                    match.map,
-                    match.replay_id,
-                    match.result.blue_goals,
-                    match.result.orange_goals,
-                ])
-                for bot, stats in match.result.player_scores.items():
-                    scores_writer.writerow([
-                        match.time_stamp,
-                        bot,
-                        stats.points,
-                        stats.goals,
-                        stats.shots,
-                        stats.saves,
-                        stats.assists,
-                        stats.demolitions,
-                        stats.own_goals,
-                    ])
-
 
 if __name__ == '__main__':
     settings = PersistentSettings.load()
     ld = LeagueDir(Path(settings.league_dir_raw))
-    convert_to_csvs(ld)
+    convert_to_csvs(ld, full=True)
@@ -0,0 +1,389 @@
+import copy
+import hmac
+import http.client
+import json
+import os
+import secrets
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple, Mapping, TYPE_CHECKING
+
+from bots import BotID, load_all_unretired_bots
+from match import MatchDetails, MatchResult, MatchDetailsEncoder, as_match_details
+from match_maker import MatchMaker, TicketSystem, next_timestamp
+from paths import LeagueDir
+from ranking_system import RankingSystem
+from storage import atomic_write
+from timing import MatchTimer
+
+if TYPE_CHECKING:
+    from rlbot.parsing.bot_config_bundle import BotConfigBundle
+
+DEFAULT_PORT = 8766
+# Workers on other machines need the coordinator to listen on the address of this machine in the network instead
+DEFAULT_HOST = "localhost"
+
+# The header with the token of the league, which workers must send with every request
+TOKEN_HEADER = "X-Autoleague-Token"
+
+# Seconds a worker has to report the result of a match. Afterwards the match is abandoned and its bots are free.
+MATCH_TIMEOUT = 60 * 60
+
+# Seconds a worker waits before asking for a match again, when none was available
+POLL_INTERVAL = 5
+
+# When the coordinator can't be reached, e.g. while it restarts, workers retry after RETRY_DELAY seconds, doubling
+# the delay up to RETRY_MAX_DELAY seconds, and give up after RETRY_TIMEOUT seconds
+RETRY_DELAY = 1
+RETRY_MAX_DELAY = 60
+RETRY_TIMEOUT = 15 * 60
+
+
+def match_to_json(match: MatchDetails) -> dict:
+    return json.loads(json.dumps(match, cls=MatchDetailsEncoder))
+
+
+def match_from_json(json_obj: dict) -> MatchDetails:
+    return json.loads(json.dumps(json_obj), object_hook=as_match_details)
+
+
+def coordinator_token(ld: LeagueDir) -> str:
+    """
+    Returns the secret token workers use to authenticate with the coordinator of the league. It is made the first
+    time and stays the same, so workers can reconnect when the coordinator is restarted.
+    """
+    if not ld.coordinator_token.exists():
+        with atomic_write(ld.coordinator_token, 'w') as f:
+            f.write(secrets.token_urlsafe(24))
+        os.chmod(ld.coordinator_token, 0o600)
+    return ld.coordinator_token.read_text().strip()
+
+
+class Coordinator:
+    """
+    Plans matches and hands them out to workers, which run them on their own machine. Each match is made from the
+    bots that are not playing in another match, so no bot plays two matches at once. Results are saved in the order
+    they arrive, and the match is time stamped when its result is saved, so the league's matches, rankings, and
+    tickets stay in the same order as the rating updates. The coordinator is the only writer of the league while
+    it runs, so it holds the league lock and keeps the league in memory. Retiring bots during a run has no effect.
+    The bots of a failed or abandoned match keep the tickets they lost when the match was made.
+
+    Protocol (json over HTTP, workers always initiate, every request has the token of the league in TOKEN_HEADER,
+    otherwise the response is 403):
+        POST /claim   {"worker": name}                        -> 200 {"match": match}, 204 if no match is
+                                                                 available right now, 410 when all are played
+        POST /result  {"worker": name, "match": match with result and replay id, "durations": {phase: s}}
+                                                              -> 200, 409 if the match is unknown or abandoned,
+                                                                 503 if it could not be saved (retry later)
+        POST /fail    {"worker": name, "name": match name}    -> 200, the match is abandoned
+        GET  /status                                          -> 200 {"running": {name: worker}, "completed": n}
+    """
+    def __init__(self, ld: LeagueDir, match_count: int, token: str):
+        self.ld = ld
+        self.match_count = match_count
+        self.token = token
+        self.completed = 0
+        self.bots = load_all_unretired_bots(ld)
+        self.rank_sys = RankingSystem.load(ld)
+        self.ticket_sys = TicketSystem.load(ld)
+        # Matches being played by name, with the worker playing it and the time it was handed out
+        self.running: Dict[str, Tuple[MatchDetails, str, float]] = {}
+        latest = MatchDetails.latest(ld, 1)
+        self.last_time_stamp = latest[0].time_stamp if latest else ""
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def busy_bots(self):
+        return {bot for match, _, _ in self.running.values() for bot in match.blue + match.orange}
+
+    def claim(self, worker: str) -> Tuple[int, Optional[dict]]:
+        with self.lock:
+            self.abandon_expired()
+            if self.completed + len(self.running) >= self.match_count:
+                return (410 if len(self.running) == 0 else 204), None
+            idle = self.bots.without(self.busy_bots())
+            if len(idle) < 6:
+                return 204, None
+            match = MatchMaker.make_next(idle, self.rank_sys, self.ticket_sys)
+            self.running[match.name] = (match, worker, time.monotonic())
+            print(f"Match '{match.name}' handed to '{worker}'")
+            return 200, {"match": match_to_json(match)}
+
+    def abandon_expired(self):
+        for name, (_, worker, start) in list(self.running.items()):
+            if time.monotonic() - start > MATCH_TIMEOUT:
+                print(f"Match '{name}' abandoned, since '{worker}' did not report a result in time")
+                del self.running[name]
+
+    def fail(self, worker: str, name: str) -> int:
+        with self.lock:
+            if name in self.running:
+                print(f"Match '{name}' failed on '{worker}'")
+                del self.running[name]
+            return 200
+
+    def result(self, worker: str, finished: MatchDetails, durations: Dict[str, float]) -> int:
+        with self.lock:
+            if finished.name not in self.running:
+                return 409
+            match, _, _ = self.running[finished.name]
+            # If saving fails, the match keeps running, so the worker can report the result again
+            saved = self.save(match, finished.result, finished.replay_id, durations)
+            del self.running[finished.name]
+            self.completed += 1
+            print(f"Match '{saved.name}' finished on '{worker}' ({self.completed}/{self.match_count})")
+            if self.completed >= self.match_count and len(self.running) == 0:
+                self.done.set()
+            return 200
+
+    def save(self, match: MatchDetails, result: MatchResult, replay_id: Optional[str],
+             durations: Dict[str, float]) -> MatchDetails:
+        """
+        Save the finished match like `match run` does and return the saved match. The match is time stamped now, as
+        files are ordered by time. If the match, rankings, or tickets can't be written, nothing is changed and the
+        OSError is raised.
+        """
+        from bot_registry import BotRegistry
+        from match_index import MatchIndex
+        from overlay import update_summary
+        from stats import PairIndex, CareerStats
+
+        timer = MatchTimer()
+        timer.durations = dict(durations)
+        timer.begin("persistence")
+
+        match = copy.deepcopy(match)
+        match.time_stamp = next_timestamp(self.last_time_stamp)
+        match.name = "_".join([match.time_stamp] + match.blue + ["vs"] + match.orange)
+        match.result = result
+        match.replay_id = replay_id
+        rank_sys = copy.deepcopy(self.rank_sys)
+        rank_sys.update(match, result)
+
+        paths = [self.ld.matches / f"{match.name}.json", self.ld.rankings / f"{match.time_stamp}_rankings.json",
+                 self.ld.tickets / f"{match.time_stamp}_tickets.json"]
+        try:
+            match.save(self.ld)
+            rank_sys.save(self.ld, match.time_stamp)
+            self.ticket_sys.save(self.ld, match.time_stamp)
+        except OSError:
+            # Remove what was saved, so the league stays consistent until the match is saved again
+            for path in paths:
+                if path.exists():
+                    path.unlink()
+            raise
+        self.rank_sys = rank_sys
+        self.last_time_stamp = match.time_stamp
+
+        # The match is saved. The bot registry, caches, and summary can be updated later.
+        try:
+            BotRegistry.ensure(self.ld, match.blue + match.orange)
+            PairIndex.add_saved_match(self.ld, match)
+            CareerStats.add_saved_match(self.ld, match)
+            MatchIndex.add_saved_match(self.ld, match)
+
+            timer.begin("summary")
+            update_summary(self.ld, match, self.rank_sys, self.ticket_sys, self.bots)
+            timer.save(self.ld, match.name)
+        except OSError as e:
+            print(f"Match '{match.name}' was saved, but the bot registry, caches, and summary could not be updated: {e!r}")
+        return match
+
+    def status(self) -> dict:
+        with self.lock:
+            return {"running": {name: worker for name, (_, worker, _) in self.running.items()},
+                    "completed": self.completed}
+
+    def start(self, port: int = DEFAULT_PORT, host: str = DEFAULT_HOST) -> int:
+        """
+        Start serving workers on the given host in a background thread. Returns the port, which is useful if the
+        given port is 0.
+        """
+        self.server = ThreadingHTTPServer((host, port), make_handler(self))
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        if self.match_count == 0:
+            self.done.set()
+        return self.server.server_address[1]
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_handler(coordinator: Coordinator):
+    class CoordinatorHandler(BaseHTTPRequestHandler):
+        def authorized(self) -> bool:
+            token = self.headers.get(TOKEN_HEADER, "")
+            if hmac.compare_digest(token.encode("utf-8"), coordinator.token.encode("utf-8")):
+                return True
+            self.respond(403)
+            return False
+
+        def do_GET(self):
+            if not self.authorized():
+                return
+            if self.path == "/status":
+                self.respond(200, coordinator.status())
+            else:
+                self.respond(404)
+
+        def do_POST(self):
+            if not self.authorized():
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if self.path == "/claim":
+                    self.respond(*coordinator.claim(body["worker"]))
+                elif self.path == "/result":
+                    match = match_from_json(body["match"])
+                    if not isinstance(match, MatchDetails) or not isinstance(match.result, MatchResult):
+                        # E.g. the result is missing. It would be rejected again if the worker retried.
+                        self.respond(400)
+                    else:
+                        self.respond(coordinator.result(body["worker"], match, body.get("durations", {})))
+                elif self.path == "/fail":
+                    self.respond(coordinator.fail(body["worker"], body["name"]))
+                else:
+                    self.respond(404)
+            except (ValueError, KeyError, TypeError):
+                self.respond(400)
+            except OSError as e:
+                print(f"Could not save the result of a match: {e!r}")
+                self.respond(503)
+
+        def respond(self, status: int, data: Optional[dict] = None):
+            content = json.dumps(data).encode("utf-8") if data is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    return CoordinatorHandler
+
+
+def run_coordinator(ld: LeagueDir, match_count: int, port: int = DEFAULT_PORT, host: str = DEFAULT_HOST):
+    """
+    Coordinate workers until the given number of matches have been played.
+    """
+    from storage import league_lock
+    with league_lock(ld):
+        token = coordinator_token(ld)
+        coordinator = Coordinator(ld, match_count, token)
+        port = coordinator.start(port, host)
+        print(f"Coordinating {match_count} matches on {host}:{port}. Start workers with "
+              f"'autoleague match work http://{host}:{port} {token}'")
+        try:
+            coordinator.done.wait()
+            # Keep answering a little longer, so waiting workers learn that all matches are played
+            time.sleep(2 * POLL_INTERVAL)
+        finally:
+            coordinator.stop()
+
+
+# A function that runs the given match and returns the result and replay id. Phases are timed with the timer.
+RunMatch = Callable[[MatchDetails, MatchTimer], Tuple[MatchResult, Optional[str]]]
+
+
+class Worker:
+    """
+    Repeatedly claims a match from the coordinator, runs it, and reports the result, until all matches are played.
+    """
+    def __init__(self, url: str, token: str, name: str, run: RunMatch, poll_interval: float = POLL_INTERVAL):
+        self.url = url.rstrip("/")
+        self.token = token
+        self.name = name
+        self.run = run
+        self.poll_interval = poll_interval
+
+    def post(self, path: str, data: dict) -> Tuple[int, Optional[dict]]:
+        """
+        Post the data to the coordinator and return the status and response. If the coordinator can't be reached
+        or fails to handle the request, the request is retried with backoff. The error is raised if it persists
+        for RETRY_TIMEOUT seconds.
+        """
+        request = urllib.request.Request(
+            f"{self.url}{path}",
+            data=json.dumps(data).encode("utf-8"),
+            headers={"Content-Type": "application/json", TOKEN_HEADER: self.token},
+            method="POST",
+        )
+        delay = RETRY_DELAY
+        deadline = time.monotonic() + RETRY_TIMEOUT
+        while True:
+            try:
+                with urllib.request.urlopen(request) as response:
+                    content = response.read()
+                    return response.status, json.loads(content) if content else None
+            except urllib.error.HTTPError as e:
+                if e.code < 500:
+                    return e.code, None
+                error = e
+            except (OSError, http.client.HTTPException) as e:
+                # E.g. URLError, ConnectionResetError, or RemoteDisconnected
+                error = e
+            if time.monotonic() + delay > deadline:
+                raise error
+            print(f"Could not reach the coordinator ({error!r}). Retrying in {delay} s ...")
+            time.sleep(delay)
+            delay = min(2 * delay, RETRY_MAX_DELAY)
+
+    def run_forever(self) -> int:
+        """
+        Play matches until the coordinator has no more matches. Returns the number of matches played.
+        """
+        played = 0
+        while True:
+            status, data = self.post("/claim", {"worker": self.name})
+            if status == 410:
+                return played
+            if status == 403:
+                raise PermissionError("The coordinator rejected the token")
+            if status != 200:
+                time.sleep(self.poll_interval)
+                continue
+
+            match = match_from_json(data["match"])
+            timer = MatchTimer()
+            try:
+                result, replay_id = self.run(match, timer)
+            except Exception as e:
+                print(f"Match '{match.name}' failed: {e!r}")
+                self.post("/fail", {"worker": self.name, "name": match.name})
+                continue
+            timer.end()
+            match.result = result
+            match.replay_id = replay_id
+            # The result is reported (and retried) before the next match is claimed
+            try:
+                status, _ = self.post("/result", {"worker": self.name, "match": match_to_json(match),
+                                                  "durations": timer.durations})
+            except Exception:
+                print(f"The result of '{match.name}' ({result.blue_goals}-{result.orange_goals}) could not be "
+                      f"reported to the coordinator")
+                raise
+            if status == 200:
+                played += 1
+            else:
+                print(f"The coordinator rejected the result of '{match.name}' (status {status})")
+
+
+def run_real_match(ld: LeagueDir, bots: Mapping[BotID, 'BotConfigBundle']) -> RunMatch:
+    """
+    Returns a RunMatch function that runs matches in Rocket League on this machine.
+    """
+    def run(match: MatchDetails, timer: MatchTimer) -> Tuple[MatchResult, Optional[str]]:
+        from match_runner import run_match
+        from replays import ReplayPreference
+        result, replay = run_match(ld, match, bots, ReplayPreference.SAVE, timer)
+        return result, replay.replay_id
+
+    return run
@@ -0,0 +1,247 @@
+"""
+Benchmarks the hot paths of autoleague on synthetic leagues of several sizes. Each benchmark runs in a fresh
+process, and its wall time, peak RSS, and file operations (files opened for reading and writing and directory
+listings) are recorded. The synthetic leagues are generated once and kept in the work directory, together with the
+results of the latest run and the baseline they are compared to. Exits with status 1 if any benchmark regressed.
+
+Usage:
+    python league_benchmark.py <work_dir> [<bots>x<matches> ...] [--repetitions <n>] [--save-baseline]
+
+Example:
+    python league_benchmark.py ~/autoleague_bench 30x1000 60x10000 120x100000
+"""
+
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where peak RSS is not measured
+    resource = None
+
+DEFAULT_SIZES = ["30x1000", "60x10000"]
+
+# A benchmark has regressed if its wall time grew by more than this fraction and WALL_SLACK_MS,
+# its peak RSS by more than this fraction, or if it does more file operations than before.
+WALL_TOLERANCE = 0.25
+WALL_SLACK_MS = 5
+RSS_TOLERANCE = 0.2
+
+AUTOLEAGUE_DIR = Path(__file__).absolute().parent
+
+
+def benchmarks() -> Dict[str, Tuple[Callable, Callable]]:
+    """
+    Returns the benchmarks by name. Each benchmark is a setup function, which is given the league directory and
+    returns the arguments for the benchmarked function, and the function itself. Only the function is measured.
+    """
+    from bot_summary import create_bot_summary
+    from bots import load_all_bots, load_all_unretired_bots
+    from csv_conversion import convert_to_csvs
+    from leaguesettings import LeagueSettings
+    from match import MatchDetails
+    from match_maker import MatchMaker, TicketSystem
+    from overlay import make_summary, make_overlay
+    from ranking_system import RankingSystem
+
+    def session(ld):
+        return ld, LeagueSettings.load(ld).last_summary
+
+    return {
+        "load_all_bots": (lambda ld: (ld,), load_all_bots),
+        "RankingSystem.load": (lambda ld: (ld,), RankingSystem.load),
+        "RankingSystem.all": (lambda ld: (ld,), RankingSystem.all),
+        "RankingSystem.latest": (session, RankingSystem.latest),
+        "TicketSystem.load": (lambda ld: (ld,), TicketSystem.load),
+        "MatchDetails.all": (lambda ld: (ld,), MatchDetails.all),
+        "MatchDetails.latest": (session, MatchDetails.latest),
+        "MatchMaker.make_next": (lambda ld: (load_all_unretired_bots(ld), RankingSystem.load(ld),
+                                             TicketSystem.load(ld)), MatchMaker.make_next),
+        "make_summary": (session, make_summary),
+        "make_overlay": (lambda ld: (ld, MatchDetails.latest(ld, 1)[0], load_all_bots(ld)), make_overlay),
+        "create_bot_summary": (lambda ld: (ld,), create_bot_summary),
+        "convert_to_csvs": (lambda ld: (ld, True), convert_to_csvs),
+    }
+
+
+class FileOps:
+    """
+    Counts file operations using an audit hook.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.counts = {"reads": 0, "writes": 0, "listings": 0}
+
+    def __call__(self, event: str, args: tuple):
+        if not self.enabled:
+            return
+        if event == "open":
+            _, mode, flags = args
+            if mode is not None:
+                writing = any(c in mode for c in "wax+")
+            else:
+                writing = bool(flags & (os.O_WRONLY | os.O_RDWR))
+            self.counts["writes" if writing else "reads"] += 1
+        elif event in ["os.scandir", "os.listdir"]:
+            self.counts["listings"] += 1
+
+
+def peak_rss_kib() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux KiB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def measure_in_process(league_dir: Path, name: str) -> dict:
+    """
+    Run a single benchmark in this process and return its measurements.
+    """
+    import overlay
+    from paths import LeagueDir, PackageFiles
+    from ranking_system import RankingSystem
+
+    with tempfile.TemporaryDirectory() as overlay_dir:
+        # The overlay must not show the synthetic league
+        PackageFiles.overlay_current_match = Path(overlay_dir) / "current_match.json"
+        PackageFiles.overlay_summary = Path(overlay_dir) / "summary.json"
+        PackageFiles.overlay_logos = Path(overlay_dir) / "logos"
+        PackageFiles.overlay_logo_index = Path(overlay_dir) / "logos" / "index.json"
+        overlay.publish = lambda *args, **kwargs: False
+
+        RankingSystem.setup()
+        ld = LeagueDir(league_dir)
+        setup, func = benchmarks()[name]
+        args = setup(ld)
+
+        file_ops = FileOps()
+        sys.addaudithook(file_ops)
+        with contextlib.redirect_stdout(io.StringIO()):
+            file_ops.enabled = True
+            start = time.perf_counter()
+            func(*args)
+            wall_ms = (time.perf_counter() - start) * 1000
+            file_ops.enabled = False
+        return {"wall_ms": wall_ms, "peak_rss_kib": peak_rss_kib(), **file_ops.counts}
+
+
+def measure(league_dir: Path, name: str) -> dict:
+    """
+    Run a single benchmark in a fresh process and return its measurements.
+    """
+    result = subprocess.run([sys.executable, str(Path(__file__).absolute()), "--measure", str(league_dir), name],
+                            capture_output=True, text=True, stdin=subprocess.DEVNULL, cwd=str(AUTOLEAGUE_DIR))
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark '{name}' failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def ensure_league(work_dir: Path, size: str) -> Path:
+    """
+    Returns the synthetic league of the given size, generating it if it does not exist yet.
+    """
+    bots, matches = [int(n) for n in size.split("x")]
+    league_dir = work_dir / f"league_{size}"
+    if not (league_dir / "league_settings.json").exists():
+        from paths import LeagueDir
+        from synthetic_league import generate_league
+        print(f"Generating synthetic league with {bots} bots and {matches} matches ...")
+        league_dir.mkdir(parents=True, exist_ok=True)
+        generate_league(LeagueDir(league_dir), bots, matches)
+        # Fill the caches in the league, e.g. the bot index and the match index, so every run measures the same state
+        for name in benchmarks():
+            measure(league_dir, name)
+    return league_dir
+
+
+def regressions(result: dict, baseline: dict) -> List[str]:
+    """
+    Returns descriptions of the measurements which regressed compared to the baseline.
+    """
+    regressed = []
+    if result["wall_ms"] > baseline["wall_ms"] * (1 + WALL_TOLERANCE) + WALL_SLACK_MS:
+        regressed.append("wall time")
+    if result["peak_rss_kib"] and baseline["peak_rss_kib"] and \
+            result["peak_rss_kib"] > baseline["peak_rss_kib"] * (1 + RSS_TOLERANCE):
+        regressed.append("peak RSS")
+    for key in ["reads", "writes", "listings"]:
+        if result[key] > baseline[key]:
+            regressed.append(key)
+    return regressed
+
+
+def run_benchmarks(work_dir: Path, sizes: List[str], repetitions: int, save_baseline: bool) -> bool:
+    """
+    Run all benchmarks on leagues of all sizes and print a table. The results are saved as `latest.json` in the
+    work directory and compared to `baseline.json`. Returns true if nothing regressed.
+    The minimum of the repetitions is used, since it is the least affected by noise.
+    """
+    work_dir.mkdir(parents=True, exist_ok=True)
+    baseline_path = work_dir / "baseline.json"
+    baseline = {}
+    if baseline_path.exists():
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+    results = {}
+    ok = True
+    for size in sizes:
+        league_dir = ensure_league(work_dir, size)
+        results[size] = {}
+        print(f"\nLeague {size}")
+        print(f"{'benchmark': <22} {'wall ms': >9} {'base ms': >9} {'RSS MiB': >8} {'reads': >7} {'writes': >7} "
+              f"{'lists': >6}")
+        for name in benchmarks():
+            runs = [measure(league_dir, name) for _ in range(repetitions)]
+            result = {key: min(run[key] for run in runs) if runs[0][key] is not None else None for key in runs[0]}
+            results[size][name] = result
+
+            base = baseline.get(size, {}).get(name)
+            regressed = regressions(result, base) if base else []
+            ok &= not regressed
+            base_ms = f"{base['wall_ms']: >9.1f}" if base else f"{'-': >9}"
+            rss = f"{result['peak_rss_kib'] / 1024: >8.1f}" if result["peak_rss_kib"] else f"{'-': >8}"
+            status = f"  REGRESSED: {', '.join(regressed)}" if regressed else ""
+            print(f"{name: <22} {result['wall_ms']: >9.1f} {base_ms} {rss} {result['reads']: >7} "
+                  f"{result['writes']: >7} {result['listings']: >6}{status}")
+
+    with open(work_dir / "latest.json", "w") as f:
+        json.dump(results, f, indent=4)
+    if save_baseline:
+        baseline.update(results)
+        with open(baseline_path, "w") as f:
+            json.dump(baseline, f, indent=4)
+        print(f"\nSaved baseline to '{baseline_path}'")
+    return ok
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == "--measure":
+        # Internal: run a single benchmark in this process
+        print(json.dumps(measure_in_process(Path(sys.argv[2]), sys.argv[3])))
+        sys.exit(0)
+
+    args = sys.argv[1:]
+    save_baseline = "--save-baseline" in args
+    if save_baseline:
+        args.remove("--save-baseline")
+    repetitions = 3
+    if "--repetitions" in args:
+        i = args.index("--repetitions")
+        repetitions = int(args[i + 1])
+        del args[i:i + 2]
+    if len(args) == 0:
+        print(__doc__)
+        sys.exit(1)
+    ok = run_benchmarks(Path(args[0]), args[1:] or DEFAULT_SIZES, repetitions, save_baseline)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,115 @@
+import copy
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from bots import BotConfigs, load_all_bots, load_retired_bots
+from leaguesettings import LeagueSettings
+from match import MatchDetails
+from match_maker import TicketSystem
+from paths import LeagueDir
+from ranking_system import RankingSystem
+
+
+def mtime(path: Path) -> Optional[int]:
+    """
+    Returns the modification time of the file or directory in nanoseconds, or None if it does not exist.
+    Adding or removing a file changes the modification time of its directory.
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def league_version(ld: LeagueDir) -> tuple:
+    """
+    Returns a key that changes whenever a match, rankings, or tickets file is saved or removed.
+    """
+    return mtime(ld.matches), mtime(ld.rankings), mtime(ld.tickets)
+
+
+class LeagueState:
+    """
+    Keeps the state of a league in memory between commands, e.g. in `autoleague shell`. The ranking system,
+    ticket system, bots, retirement, and recent matches are loaded once and reused until the files behind them
+    change. Changes are detected by the modification times of the league's directories and files, so changes
+    saved by commands (or other processes) are picked up on the next access, and saving stays write-through.
+    Changes inside a bot's folder are not detected, use `invalidate` to reload everything.
+    """
+    _shared: Dict[Path, 'LeagueState'] = {}
+
+    def __init__(self, ld: LeagueDir):
+        self.ld = ld
+        # Maps the name of each cached value to the key it was loaded with and the value
+        self._cache: Dict[str, tuple] = {}
+        # Recent matches by file name. Only new match files are read when the matches directory changes.
+        self._matches: Dict[str, MatchDetails] = {}
+
+    @staticmethod
+    def shared(ld: LeagueDir) -> 'LeagueState':
+        """
+        Returns the state of the given league shared by all commands run by this process.
+        """
+        key = ld.matches.parent  # The league directory
+        if key not in LeagueState._shared:
+            LeagueState._shared[key] = LeagueState(ld)
+        return LeagueState._shared[key]
+
+    def _cached(self, name: str, key: tuple, load):
+        if name not in self._cache or self._cache[name][0] != key:
+            self._cache[name] = (key, load())
+        return self._cache[name][1]
+
+    def rankings(self) -> RankingSystem:
+        """
+        Returns a copy of the current ranking system, which can be changed and saved by the caller.
+        """
+        rank_sys = self._cached("rankings", (mtime(self.ld.rankings),), lambda: RankingSystem.load(self.ld))
+        return copy.deepcopy(rank_sys)
+
+    def tickets(self) -> TicketSystem:
+        """
+        Returns a copy of the current ticket system, which can be changed and saved by the caller.
+        """
+        key = (mtime(self.ld.tickets), mtime(self.ld.matches), mtime(self.ld.league_settings))
+        ticket_sys = self._cached("tickets", key, lambda: TicketSystem.load(
+            self.ld, self.latest_matches(LeagueSettings.load(self.ld).last_summary)))
+        return copy.deepcopy(ticket_sys)
+
+    def bots(self) -> BotConfigs:
+        """
+        Returns all bots. Parsed bot configs are kept between calls.
+        """
+        return self._cached("bots", (mtime(self.ld.bots),), lambda: load_all_bots(self.ld))
+
+    def retired(self) -> Set[str]:
+        retired = self._cached("retired", (mtime(self.ld.retirement),), lambda: load_retired_bots(self.ld))
+        return set(retired)
+
+    def unretired_bots(self) -> BotConfigs:
+        return self.bots().without(self.retired())
+
+    def latest_matches(self, count: int) -> List[MatchDetails]:
+        """
+        Returns the details of the n latest matches (all matches if n is 0, like `MatchDetails.latest`).
+        Match files are only read the first time they are needed.
+        """
+        def load():
+            names = sorted(path.name for path in self.ld.matches.glob("*.json"))
+            self._matches = {name: self._matches.get(name) for name in names}
+            return names
+
+        names = self._cached("matches", (mtime(self.ld.matches),), load)
+        latest = names[-count:]
+        for name in latest:
+            if self._matches[name] is None:
+                self._matches[name] = MatchDetails.read(self.ld.matches / name)
+        return [self._matches[name] for name in latest]
+
+    def invalidate(self):
+        """
+        Forget everything, so it is reloaded from disk when needed.
+        """
+        self._cache.clear()
+        self._matches.clear()
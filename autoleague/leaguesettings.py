@@ -1,6 +1,7 @@
 import json
 
 from paths import LeagueDir
+from storage import atomic_write
 
 
 class LeagueSettings:
@@ -21,8 +22,12 @@ class LeagueSettings:
         self.ticket_increase_rate = 1.5
         self.game_catchup_boost = 0.75
 
+        # Time stamps at which seasons started, in order. Used to aggregate stats per season.
+        # Can be set using `season start [time]`.
+        self.season_starts = []
+
     def save(self, ld: LeagueDir):
-        with open(ld.league_settings, 'w') as f:
+        with atomic_write(ld.league_settings, 'w') as f:
             json.dump(self.__dict__, f, sort_keys=True, indent=4)
 
     @staticmethod
@@ -1,14 +1,18 @@
 import json
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Mapping, List, Dict, Optional
-
-from rlbot.matchconfig.conversions import read_match_config_from_file
-from rlbot.matchconfig.match_config import MatchConfig, PlayerConfig, Team
-from rlbot.parsing.bot_config_bundle import BotConfigBundle
+from typing import Mapping, List, Dict, Optional, TYPE_CHECKING
 
 from bots import BotID, psyonix_bot_skill
 from paths import PackageFiles, LeagueDir
+from storage import atomic_write
+
+# rlbot is slow to import, so it is only imported when a match config is made
+if TYPE_CHECKING:
+    import numpy as np
+    from bot_registry import BotRegistry
+    from rlbot.matchconfig.match_config import MatchConfig, PlayerConfig, Team
+    from rlbot.parsing.bot_config_bundle import BotConfigBundle
 
 
 @dataclass
@@ -46,7 +50,9 @@ class MatchDetails:
     result: Optional[MatchResult] = None
     replay_id: Optional[str] = None
 
-    def to_config(self, bots: Mapping[BotID, BotConfigBundle]) -> MatchConfig:
+    def to_config(self, bots: Mapping[BotID, 'BotConfigBundle']) -> 'MatchConfig':
+        from rlbot.matchconfig.conversions import read_match_config_from_file
+        from rlbot.matchconfig.match_config import Team
         match_config = read_match_config_from_file(PackageFiles.default_match_config)
         match_config.game_map = self.map
         match_config.player_configs = [
@@ -59,7 +65,8 @@ class MatchDetails:
         ]
         return match_config
 
-    def bot_to_config(self, bot: BotID, bots: Mapping[BotID, BotConfigBundle], team: Team) -> PlayerConfig:
+    def bot_to_config(self, bot: BotID, bots: Mapping[BotID, 'BotConfigBundle'], team: 'Team') -> 'PlayerConfig':
+        from rlbot.matchconfig.match_config import PlayerConfig
         config = PlayerConfig.bot_config(Path(bots[bot].config_path), team)
         # Resolve Psyonix bots -- only Psyonix bots are in this list
         if bot in psyonix_bot_skill:
@@ -67,6 +74,13 @@ class MatchDetails:
             config.bot_skill = psyonix_bot_skill[bot]
         return config
 
+    def slots(self, registry: 'BotRegistry') -> 'np.ndarray':
+        """
+        Returns the registry ids of the blue and then the orange bots as an array with shape (6,). Raises KeyError
+        if a bot is not registered.
+        """
+        return registry.ids(self.blue + self.orange)
+
     def save(self, ld: LeagueDir):
         self.write(ld.matches / f"{self.name}.json")
 
@@ -74,7 +88,7 @@ class MatchDetails:
         """
         Write match details to a specific path
         """
-        with open(path, 'w') as f:
+        with atomic_write(path, 'w') as f:
             json.dump(self, f, cls=MatchDetailsEncoder, sort_keys=True)
 
     @staticmethod
@@ -83,23 +97,23 @@ class MatchDetails:
         Returns the match details of the n latest matches
         """
         # Assume last match file is the newest, since they are prefixed with a time stamp
-        return [MatchDetails.read(path) for path in list(ld.matches.iterdir())[-count:]]
+        return [MatchDetails.read(path) for path in sorted(ld.matches.glob("*.json"))[-count:]]
 
     @staticmethod
     def all(ld: LeagueDir) -> List['MatchDetails']:
         """
         Returns a list of all matches played, chronological order
         """
-        return [MatchDetails.read(path) for path in list(ld.matches.iterdir())]
+        return [MatchDetails.read(path) for path in sorted(ld.matches.glob("*.json"))]
 
     @staticmethod
     def undo(ld: LeagueDir):
         """
         Remove latest match
         """
-        if any(ld.matches.iterdir()):
+        if any(ld.matches.glob("*.json")):
             # Assume last match file is the newest, since they are prefixed with a time stamp
-            list(ld.matches.iterdir())[-1].unlink()   # Remove file
+            sorted(ld.matches.glob("*.json"))[-1].unlink()   # Remove file
         else:
             print("No match to undo.")
 
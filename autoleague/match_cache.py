@@ -0,0 +1,146 @@
+from pathlib import Path
+from typing import Dict, List, Optional, Type, TypeVar
+
+import numpy as np
+
+from match import MatchDetails
+from paths import LeagueDir
+from storage import atomic_write
+
+Cache = TypeVar("Cache", bound="MatchCache")
+
+
+class MatchCache:
+    """
+    Base class of data computed from all matches, like the match index and the career stats, which is saved as an
+    npz file in the league directory. The file remembers how many matches it includes, the name of the latest one,
+    and the modification time of the matches directory when it was saved.
+
+    Saving a match adds it to the data with `add_saved_match`, so lookups use `current`, which only loads the file and
+    doesn't touch the match files. `ensure` is the fallback for when the data is missing or the matches directory
+    changed otherwise, e.g. because a match was undone. It adds the matches saved since and rebuilds the data from
+    all matches if the matches it includes have changed.
+
+    Subclasses implement `path`, `build`, `add_match`, `arrays`, and `from_arrays`, and may implement `add_matches`
+    to add several matches at once.
+    """
+    def __init__(self):
+        self.match_count = 0
+        # Name of the latest included match, which starts with its time stamp
+        self.latest_match = ""
+        # Modification time of the matches directory in ns, before the included matches were listed
+        self.matches_mtime = 0
+
+    @staticmethod
+    def path(ld: LeagueDir) -> Path:
+        raise NotImplementedError
+
+    @staticmethod
+    def build(matches: List[MatchDetails]) -> 'MatchCache':
+        """
+        Build the data from the given matches, which are in chronological order.
+        """
+        raise NotImplementedError
+
+    def add_match(self, match: MatchDetails):
+        raise NotImplementedError
+
+    def add_matches(self, matches: List[MatchDetails]):
+        """
+        Add the given matches, which are newer than the included ones and in chronological order.
+        """
+        for match in matches:
+            self.add_match(match)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Returns the data as named arrays to be saved.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def from_arrays(data) -> 'MatchCache':
+        raise NotImplementedError
+
+    @classmethod
+    def _build(cls: Type[Cache], paths: List[Path]) -> Cache:
+        cache = cls.build([MatchDetails.read(path) for path in paths])
+        cache.match_count = len(paths)
+        cache.latest_match = paths[-1].stem if paths else ""
+        return cache
+
+    def save(self, ld: LeagueDir):
+        with atomic_write(self.path(ld), 'wb') as f:
+            np.savez_compressed(f, match_count=self.match_count, latest_match=self.latest_match,
+                                matches_mtime=self.matches_mtime, **self.arrays())
+
+    @classmethod
+    def load(cls: Type[Cache], ld: LeagueDir) -> Optional[Cache]:
+        """
+        Loads the saved data as it is or returns None if there is none.
+        """
+        if not cls.path(ld).exists():
+            return None
+        with np.load(cls.path(ld)) as data:
+            if "latest_match" not in data:
+                # Saved before the latest match was remembered
+                return None
+            cache = cls.from_arrays(data)
+            cache.match_count = int(data["match_count"])
+            cache.latest_match = str(data["latest_match"])
+            # Data saved before the modification time was remembered is checked by `ensure` once
+            cache.matches_mtime = int(data["matches_mtime"]) if "matches_mtime" in data else 0
+        return cache
+
+    @classmethod
+    def current(cls: Type[Cache], ld: LeagueDir) -> Cache:
+        """
+        Loads the data for lookups. The match files are only read, if the matches directory changed since the data
+        was saved without the data being updated, see `ensure`.
+        """
+        cache = cls.load(ld)
+        if cache is not None and cache.matches_mtime == ld.matches.stat().st_mtime_ns:
+            return cache
+        return cls.ensure(ld)
+
+    @classmethod
+    def add_saved_match(cls, ld: LeagueDir, match: MatchDetails):
+        """
+        Adds the given match, which has just been saved, to the saved data. Must be called with the league lock.
+        """
+        cls.ensure(ld, match)
+
+    @classmethod
+    def ensure(cls: Type[Cache], ld: LeagueDir, saved: Optional[MatchDetails] = None) -> Cache:
+        """
+        Loads the data and adds the matches saved since it was saved. It is rebuilt from all matches, if it is
+        missing, if the matches it includes have changed, or if most matches are new. The given saved match is
+        added without reading its file.
+        """
+        # The time is taken before listing the matches. If a match is saved meanwhile, the data looks outdated.
+        matches_mtime = ld.matches.stat().st_mtime_ns
+        paths = sorted(ld.matches.glob("*.json"))
+        cache = cls.load(ld)
+        if cache is not None and cache.match_count <= len(paths) and \
+                (paths[cache.match_count - 1].stem if cache.match_count > 0 else "") == cache.latest_match and \
+                len(paths) - cache.match_count <= cache.match_count:
+            if cache.match_count == len(paths) and cache.matches_mtime == matches_mtime:
+                return cache
+            new_paths = paths[cache.match_count:]
+            cache.add_matches([saved if saved is not None and saved.name == path.stem else MatchDetails.read(path)
+                               for path in new_paths])
+            cache.match_count = len(paths)
+            cache.latest_match = paths[-1].stem if paths else ""
+        else:
+            cache = cls._build(paths)
+        cache.matches_mtime = matches_mtime
+        cache.save(ld)
+        return cache
+
+    @classmethod
+    def invalidate(cls, ld: LeagueDir):
+        """
+        Remove the saved data. It is rebuilt when needed.
+        """
+        if cls.path(ld).exists():
+            cls.path(ld).unlink()
@@ -13,6 +13,7 @@ from rlbottraining.training_exercise import TrainingExercise
 from bots import fmt_bot_name
 from match import MatchResult, PlayerScore
 from replays import ReplayMonitor
+from timing import MatchTimer
 
 
 class FailDueToNoReplay(Fail):
@@ -23,6 +24,7 @@ class FailDueToNoReplay(Fail):
 @dataclass
 class MatchGrader(Grader):
     replay_monitor: ReplayMonitor = field(default_factory=ReplayMonitor)
+    timer: MatchTimer = field(default_factory=MatchTimer)
 
     last_match_time: float = 0
     last_game_tick_packet: GameTickPacket = None
@@ -30,21 +32,29 @@ class MatchGrader(Grader):
 
     def on_tick(self, tick: TrainingTickPacket) -> Optional[Grade]:
         self.replay_monitor.ensure_monitoring()
+        if self.timer.current_phase == "bot_load":
+            # This is the first tick of the match
+            self.timer.begin("kickoff_to_end")
         self.last_game_tick_packet = tick.game_tick_packet
         game_info = tick.game_tick_packet.game_info
         if game_info.is_match_ended:
             self.fetch_match_score(tick.game_tick_packet)
+            self.timer.begin("replay_wait")
             # Since a recent update to RLBot and due to how rlbottraining calls on_tick, we only get one
             # packet where game_info.is_math_ended is True. Now we setup a busy loop to wait for replay
             game_end_time = time.time()
             seconds_since_game_end = 0
             while seconds_since_game_end < 30:
                 seconds_since_game_end = time.time() - game_end_time
+                self.replay_monitor.check_pending()
                 if self.replay_monitor.replay_id:
                     self.replay_monitor.stop_monitoring()
+                    self.timer.end()
                     return Pass()
+                time.sleep(0.1)
             # 30 seconds passed with no replay
             self.replay_monitor.stop_monitoring()
+            self.timer.end()
             return FailDueToNoReplay()
         else:
             self.last_match_time = game_info.seconds_elapsed
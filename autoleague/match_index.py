@@ -0,0 +1,212 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+import numpy as np
+
+from bots import BotID
+from match import MatchDetails
+from match_cache import MatchCache
+from paths import LeagueDir
+
+if TYPE_CHECKING:
+    from bot_registry import BotRegistry
+
+
+@dataclass
+class IndexedMatch:
+    """
+    The fields of a match stored in the match index.
+    """
+    time_stamp: str
+    blue: List[BotID]
+    orange: List[BotID]
+    map: str
+    blue_goals: int
+    orange_goals: int
+    replay_id: Optional[str]
+
+
+class MatchIndex(MatchCache):
+    """
+    A compact index of all matches: time stamp, participants, map, score, and replay id. The index is saved as
+    `match_index.npz` in the league directory, and each saved match is added to it (see MatchCache). Queries binary
+    search the sorted time stamps and intersect per-bot posting lists (the sorted indices of the matches each bot
+    played in), so they never read the match files.
+    """
+    def __init__(self):
+        super().__init__()
+        self.times = np.zeros(0, dtype="U14")
+        self.bots: List[BotID] = []
+        self.maps: List[str] = []
+        # The positions of the bots and maps in the lists above
+        self._bot_ids: Dict[BotID, int] = {}
+        self._map_ids: Dict[str, int] = {}
+        # Bot indices with shape (matches, 3)
+        self.blue = np.zeros((0, 3), dtype=np.int32)
+        self.orange = np.zeros((0, 3), dtype=np.int32)
+        self.map = np.zeros(0, dtype=np.int32)
+        self.blue_goals = np.zeros(0, dtype=np.int32)
+        self.orange_goals = np.zeros(0, dtype=np.int32)
+        self.replay_ids = np.zeros(0, dtype=str)
+        self._postings: Optional[Dict[int, np.ndarray]] = None
+
+    def __len__(self):
+        return len(self.times)
+
+    def match(self, i: int) -> IndexedMatch:
+        return IndexedMatch(
+            time_stamp=str(self.times[i]),
+            blue=[self.bots[bot] for bot in self.blue[i]],
+            orange=[self.bots[bot] for bot in self.orange[i]],
+            map=self.maps[self.map[i]],
+            blue_goals=int(self.blue_goals[i]),
+            orange_goals=int(self.orange_goals[i]),
+            replay_id=str(self.replay_ids[i]) or None,
+        )
+
+    def slots(self, registry: 'BotRegistry') -> np.ndarray:
+        """
+        Returns the registry ids of the blue and then the orange bots of all matches with shape (matches, 6).
+        Raises KeyError if a bot is not registered, see `BotRegistry.ensure`.
+        """
+        ids = registry.ids(self.bots)
+        return ids[np.concatenate([self.blue, self.orange], axis=1)] if len(ids) else np.zeros((0, 6), dtype=np.int64)
+
+    def postings(self, bot: BotID) -> np.ndarray:
+        """
+        Returns the sorted indices of the matches the given bot played in.
+        """
+        if self._postings is None:
+            # Group the match indices of all 6 slots by bot. A stable sort keeps each group sorted.
+            slots = np.concatenate([self.blue, self.orange], axis=1).ravel()
+            matches = np.repeat(np.arange(len(self)), 6)
+            order = np.argsort(slots, kind="stable")
+            bot_ids, starts = np.unique(slots[order], return_index=True)
+            groups = np.split(matches[order], starts[1:])
+            self._postings = dict(zip(bot_ids.tolist(), groups))
+        if bot not in self._bot_ids:
+            return np.zeros(0, dtype=np.int64)
+        return self._postings.get(self._bot_ids[bot], np.zeros(0, dtype=np.int64))
+
+    def query(self, bot: Optional[BotID] = None, teammate: Optional[BotID] = None,
+              opponent: Optional[BotID] = None, map: Optional[str] = None, since: Optional[str] = None,
+              until: Optional[str] = None, min_margin: Optional[int] = None,
+              max_margin: Optional[int] = None) -> List[IndexedMatch]:
+        """
+        Returns the matches matching all the given filters in chronological order. `since` and `until` are
+        inclusive prefixes of time stamps, e.g. "202301" for January 2023. The score margin is from the view of
+        `bot` (negative for losses) or the absolute margin if no bot is given. The teammate and opponent filters
+        require a bot.
+        """
+        # Narrow down to the date range
+        lo = np.searchsorted(self.times, since.ljust(14, "0")) if since else 0
+        hi = np.searchsorted(self.times, until.ljust(14, "9"), side="right") if until else len(self)
+        candidates = np.arange(lo, hi)
+
+        # Intersect the posting lists of the given bots
+        for other in [bot, teammate, opponent]:
+            if other is not None:
+                candidates = np.intersect1d(candidates, self.postings(other), assume_unique=True)
+
+        if len(candidates) == 0:
+            return []
+
+        keep = np.ones(len(candidates), dtype=bool)
+        margin = (self.blue_goals - self.orange_goals)[candidates]
+        if bot is not None:
+            bot_id = self._bot_ids[bot]
+            bot_is_blue = (self.blue[candidates] == bot_id).any(axis=1)
+            margin = np.where(bot_is_blue, margin, -margin)
+            bot_team = np.where(bot_is_blue[:, None], self.blue[candidates], self.orange[candidates])
+            other_team = np.where(bot_is_blue[:, None], self.orange[candidates], self.blue[candidates])
+            if teammate is not None:
+                keep &= (bot_team == self._bot_ids[teammate]).any(axis=1)
+            if opponent is not None:
+                keep &= (other_team == self._bot_ids[opponent]).any(axis=1)
+        else:
+            margin = np.abs(margin)
+        if map is not None:
+            keep &= self.map[candidates] == self._map_ids.get(map, -1)
+        if min_margin is not None:
+            keep &= margin >= min_margin
+        if max_margin is not None:
+            keep &= margin <= max_margin
+
+        return [self.match(i) for i in candidates[keep].tolist()]
+
+    @staticmethod
+    def _id_of(ids: Dict[str, int], values: List[str], value: str) -> int:
+        if value not in ids:
+            ids[value] = len(values)
+            values.append(value)
+        return ids[value]
+
+    def add_match(self, match: MatchDetails):
+        self.add_matches([match])
+
+    def add_matches(self, matches: List[MatchDetails]):
+        # The new rows are collected in lists, so each column is only copied once
+        def bot_ids(bots: List[BotID]) -> List[int]:
+            return [self._id_of(self._bot_ids, self.bots, bot) for bot in bots]
+
+        blue = np.array([bot_ids(match.blue) for match in matches], dtype=np.int32).reshape(-1, 3)
+        orange = np.array([bot_ids(match.orange) for match in matches], dtype=np.int32).reshape(-1, 3)
+        maps = [self._id_of(self._map_ids, self.maps, match.map) for match in matches]
+        self.times = np.concatenate([self.times, np.array([match.time_stamp for match in matches], dtype="U14")])
+        self.blue = np.concatenate([self.blue, blue])
+        self.orange = np.concatenate([self.orange, orange])
+        self.map = np.concatenate([self.map, np.array(maps, dtype=np.int32)])
+        self.blue_goals = np.concatenate(
+            [self.blue_goals, np.array([match.result.blue_goals for match in matches], dtype=np.int32)])
+        self.orange_goals = np.concatenate(
+            [self.orange_goals, np.array([match.result.orange_goals for match in matches], dtype=np.int32)])
+        self.replay_ids = np.concatenate(
+            [self.replay_ids, np.array([match.replay_id or "" for match in matches], dtype=str)])
+        self._postings = None
+
+    @staticmethod
+    def build(matches: List[MatchDetails]) -> 'MatchIndex':
+        """
+        Build the index from the given matches, which must be in chronological order.
+        """
+        index = MatchIndex()
+        index.bots = sorted({bot for match in matches for bot in match.blue + match.orange})
+        index.maps = sorted({match.map for match in matches})
+        index._bot_ids = bot_ids = {bot: i for i, bot in enumerate(index.bots)}
+        index._map_ids = map_ids = {map: i for i, map in enumerate(index.maps)}
+        index.times = np.array([match.time_stamp for match in matches], dtype="U14")
+        index.blue = np.array([[bot_ids[bot] for bot in match.blue] for match in matches],
+                              dtype=np.int32).reshape(-1, 3)
+        index.orange = np.array([[bot_ids[bot] for bot in match.orange] for match in matches],
+                                dtype=np.int32).reshape(-1, 3)
+        index.map = np.array([map_ids[match.map] for match in matches], dtype=np.int32)
+        index.blue_goals = np.array([match.result.blue_goals for match in matches], dtype=np.int32)
+        index.orange_goals = np.array([match.result.orange_goals for match in matches], dtype=np.int32)
+        index.replay_ids = np.array([match.replay_id or "" for match in matches], dtype=str)
+        return index
+
+    @staticmethod
+    def path(ld: LeagueDir) -> Path:
+        return ld.match_index
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return dict(times=self.times, bots=np.array(self.bots, dtype=str), maps=np.array(self.maps, dtype=str),
+                    blue=self.blue, orange=self.orange, map=self.map, blue_goals=self.blue_goals,
+                    orange_goals=self.orange_goals, replay_ids=self.replay_ids)
+
+    @staticmethod
+    def from_arrays(data) -> 'MatchIndex':
+        index = MatchIndex()
+        index.times = data["times"]
+        index.bots = data["bots"].tolist()
+        index.maps = data["maps"].tolist()
+        index._bot_ids = {bot: i for i, bot in enumerate(index.bots)}
+        index._map_ids = {map: i for i, map in enumerate(index.maps)}
+        index.blue = data["blue"]
+        index.orange = data["orange"]
+        index.map = data["map"]
+        index.blue_goals = data["blue_goals"]
+        index.orange_goals = data["orange_goals"]
+        index.replay_ids = data["replay_ids"]
+        return index
@@ -1,26 +1,53 @@
 import json
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 from random import shuffle, choice
-from typing import Dict, List, Iterable, Mapping, Tuple, Optional
+from typing import Dict, List, Iterable, Mapping, Tuple, Optional, TYPE_CHECKING
 
 import math
-import numpy
 import trueskill
 import itertools
 from pathlib import Path
-from rlbot.parsing.bot_config_bundle import BotConfigBundle, get_bot_config_bundle
 
 from bots import BotID, fmt_bot_name
 from leaguesettings import LeagueSettings
 from match import MatchDetails
 from paths import LeagueDir, PackageFiles
 from ranking_system import RankingSystem
+from storage import atomic_write
 from trueskill import Rating
 
+# numpy and rlbot are slow to import, so they are only imported by matchmaking. Then commands
+# that just read or change tickets start quickly.
+if TYPE_CHECKING:
+    import numpy as np
+    from rlbot.parsing.bot_config_bundle import BotConfigBundle
+    from bot_registry import BotRegistry
+
 # Minimum required TrueSkill match quality. Can't be higher than 0.44
 MIN_REQ_FAIRNESS = 0.3
 
+# Parameters of decide_on_players_3. `stats matchmaking` compares alternatives by simulating sessions of the league.
+# Higher ticket strength produces a more uniform distribution of matches played, adjust by increments of 0.1
+TICKET_STRENGTH = 1
+# Higher MMR tolerance allows accurately rated bots to play in more "distant" MMR matches, adjust by increments of 1
+MMR_TOLERANCE = 4
+# Max attempts to build match of quality >= MIN_QUALITY
+MAX_ITERATIONS = 20
+MIN_QUALITY = 0.4
+
+# The maps matches are played on
+MAPS = [
+    "ChampionsField",
+    "DFHStadium",
+    "NeoTokyo",
+    "UrbanCentral",
+    "BeckwithPark",
+    "Mannfield",
+    "NeonFields",
+    "UtopiaColiseum",
+]
+
 
 class TicketSystem:
     def __init__(self):
@@ -79,6 +106,7 @@ class TicketSystem:
         """
         Picks 6 unique bots based on their number of tickets in the ticket system
         """
+        import numpy
         self.ensure(bots)
 
         # We don't use self.total() since it can be the case, that not all bots appear in `bots`
@@ -108,16 +136,34 @@ class TicketSystem:
                 # Tickets also multiply a little even if the bot has played more games than any other.
                 self.tickets[bot] *= (self.ticket_increase_rate + games_deficit * self.game_catchup_boost)
 
+    def arrays(self, registry: 'BotRegistry') -> Tuple['np.ndarray', 'np.ndarray']:
+        """
+        Returns the tickets and the session game counts of all bots as arrays indexed by the ids of the registry.
+        Bots without tickets are NaN. Bots which are not registered are left out, see `BotRegistry.ensure`.
+        """
+        import numpy as np
+        ticket_bots = [bot for bot in self.tickets if bot in registry]
+        game_count_bots = [bot for bot in self.session_game_counts if bot in registry]
+        tickets = np.full(len(registry), np.nan)
+        game_counts = np.zeros(len(registry), dtype=np.int64)
+        tickets[registry.ids(ticket_bots)] = [self.tickets[bot] for bot in ticket_bots]
+        game_counts[registry.ids(game_count_bots)] = [self.session_game_counts[bot] for bot in game_count_bots]
+        return tickets, game_counts
+
     def save(self, ld: LeagueDir, time_stamp: str):
-        with open(ld.tickets / f"{time_stamp}_tickets.json", 'w') as f:
+        with atomic_write(ld.tickets / f"{time_stamp}_tickets.json", 'w') as f:
             json.dump(self.tickets, f, sort_keys=True)
 
     @staticmethod
-    def load(ld: LeagueDir) -> 'TicketSystem':
+    def load(ld: LeagueDir, matches_in_session: Optional[List[MatchDetails]] = None) -> 'TicketSystem':
+        """
+        Loads the latest tickets and counts the games played in the current session, i.e. in the matches of the
+        last summary. The matches of the session are read from disk, unless they are given.
+        """
         ticket_sys = TicketSystem()
-        if any(ld.tickets.iterdir()):
+        if any(ld.tickets.glob("*.json")):
             # Assume last tickets file is the newest, since they are prefixed with a time stamp
-            with open(list(ld.tickets.iterdir())[-1]) as f:
+            with open(sorted(ld.tickets.glob("*.json"))[-1]) as f:
                 ticket_sys.tickets = json.load(f)
 
         settings = LeagueSettings.load(ld)
@@ -125,7 +171,8 @@ class TicketSystem:
         ticket_sys.ticket_increase_rate = settings.ticket_increase_rate
         ticket_sys.game_catchup_boost = settings.game_catchup_boost
 
-        matches_in_session = MatchDetails.latest(ld, settings.last_summary)
+        if matches_in_session is None:
+            matches_in_session = MatchDetails.latest(ld, settings.last_summary)
         for match in matches_in_session:
             bots = match.blue + match.orange
             ticket_sys.ensure(bots)
@@ -150,16 +197,16 @@ class TicketSystem:
         first.new_bot_ticket_count = settings.new_bot_ticket_count
         first.ticket_increase_rate = settings.ticket_increase_rate
         first.game_catchup_boost = settings.game_catchup_boost
-        return [first] + [TicketSystem.read(path, settings) for path in list(ld.tickets.iterdir())]
+        return [first] + [TicketSystem.read(path, settings) for path in sorted(ld.tickets.glob("*.json"))]
 
     @staticmethod
     def undo(ld: LeagueDir):
         """
         Remove latest tickets file
         """
-        if any(ld.tickets.iterdir()):
+        if any(ld.tickets.glob("*.json")):
             # Assume last tickets file is the newest, since they are prefixed with a time stamp
-            list(ld.tickets.iterdir())[-1].unlink()  # Remove file
+            sorted(ld.tickets.glob("*.json"))[-1].unlink()  # Remove file
         else:
             print("No tickets to undo.")
 
@@ -179,7 +226,7 @@ def pdf(x, mu: float = 0, sigma: float = 1):
 
 class MatchMaker:
     @staticmethod
-    def make_next(bots: Mapping[BotID, BotConfigBundle], rank_sys: RankingSystem,
+    def make_next(bots: Mapping[BotID, 'BotConfigBundle'], rank_sys: RankingSystem,
                   ticket_sys: TicketSystem) -> MatchDetails:
         """
         Make the next match to play. This will use to TicketSystem and the RankingSystem to find
@@ -187,19 +234,33 @@ class MatchMaker:
         is guaranteed to finish (since the TicketSystem is updated).
         """
 
-        time_stamp = make_timestamp()
         blue, orange = MatchMaker.decide_on_players_3(bots.keys(), rank_sys, ticket_sys)
+        return MatchMaker.make_match(blue, orange)
+
+    @staticmethod
+    def make_batch(bots: Mapping[BotID, 'BotConfigBundle'], rank_sys: RankingSystem, ticket_sys: TicketSystem,
+                   count: int) -> List[MatchDetails]:
+        """
+        Make `count` matches with no bot in more than one of them, so they can be played at the same time.
+        The matches are made like consecutive calls to `make_next`, except that the bots of the earlier matches
+        are not available and the ratings are not updated in between. The results can arrive in any order, and
+        should be applied in the order they arrive, with the match time stamped by `next_timestamp` when saved.
+        """
+        available = list(bots.keys())
+        if len(available) < 6 * count:
+            raise ValueError(f"{len(available)} bots are not enough for {count} matches at the same time")
+        matches = []
+        for _ in range(count):
+            blue, orange = MatchMaker.decide_on_players_3(available, rank_sys, ticket_sys)
+            matches.append(MatchMaker.make_match(blue, orange))
+            available = [bot for bot in available if bot not in blue + orange]
+        return matches
+
+    @staticmethod
+    def make_match(blue: List[BotID], orange: List[BotID]) -> MatchDetails:
+        time_stamp = make_timestamp()
         name = "_".join([time_stamp] + blue + ["vs"] + orange)
-        map = choice([
-            "ChampionsField",
-            "DFHStadium",
-            "NeoTokyo",
-            "UrbanCentral",
-            "BeckwithPark",
-            "Mannfield",
-            "NeonFields",
-            "UtopiaColiseum",
-        ])
+        map = choice(MAPS)
         return MatchDetails(time_stamp, name, blue, orange, map)
 
     @staticmethod
@@ -240,6 +301,7 @@ class MatchMaker:
         Find two balanced teams. The TicketSystem and the RankingSystem to find
         a fair match up between some bots that haven't played for a while.
         """
+        import numpy
 
         # Composing a team of the best player + the worst two players will likely yield a balanced match (0, 4, 5).
         # These represent a few arrangements like that which seem reasonable to try, they will be checked against
@@ -292,19 +354,16 @@ class MatchMaker:
         return blue_ids, orange_ids
 
     @staticmethod
-    def decide_on_players_3(bot_ids: Iterable[BotID], rank_sys: RankingSystem,
-                            ticket_sys: TicketSystem) -> Tuple[List[BotID], List[BotID]]:
+    def decide_on_players_3(bot_ids: Iterable[BotID], rank_sys: RankingSystem, ticket_sys: TicketSystem,
+                            ticket_strength: float = TICKET_STRENGTH, mmr_tolerance: float = MMR_TOLERANCE,
+                            max_iterations: int = MAX_ITERATIONS,
+                            min_quality: float = MIN_QUALITY) -> Tuple[List[BotID], List[BotID]]:
         """
         Find two balanced teams. The TicketSystem and the RankingSystem to find
         a fair match up between some bots that haven't played for a while.
+        The parameters default to the module's constants, other values are compared by `stats matchmaking`.
         """
-        # Higher ticket strength produces a more uniform distribution of matches played, adjust by increments of 0.1
-        TICKET_STRENGTH = 1
-        # Higher MMR tolerance allows accurately rated bots to play in more "distant" MMR matches, adjust by increments of 1
-        MMR_TOLERANCE = 4
-        # Max attempts to build match of quality >= MIN_QUALITY
-        MAX_ITERATIONS = 20
-        MIN_QUALITY = 0.4
+        import numpy
 
         rank_sys.ensure_all(bot_ids)
         ticket_sys.ensure(bot_ids)
@@ -314,7 +373,7 @@ class MatchMaker:
 
         max_tickets = max([ticket_sys.get(bot_id) for bot_id in bot_ids])
 
-        for i in range(MAX_ITERATIONS):
+        for i in range(max_iterations):
             # Get Leader Bot (choose randomly between bots with highest tickets)
             possible_leaders = [bot_id for bot_id, tickets in ticket_sys.tickets.items() if tickets == max_tickets and bot_id in bot_ids]
             leader = numpy.random.choice(possible_leaders)
@@ -328,11 +387,11 @@ class MatchMaker:
 
             for c in candidates:
                 # Calculate probability to perform at desired mmr
-                performance_prob = pdf(match_mmr, mu=c.rating.mu, sigma=math.sqrt(c.rating.sigma**2 + MMR_TOLERANCE**2))
+                performance_prob = pdf(match_mmr, mu=c.rating.mu, sigma=math.sqrt(c.rating.sigma**2 + mmr_tolerance**2))
 
                 # Calculate weighting factor based on tickets
                 tickets = ticket_sys.get(c.bot_id)
-                tickets_weight = tickets ** TICKET_STRENGTH
+                tickets_weight = tickets ** ticket_strength
 
                 # Calculate candidate score
                 scores.append(performance_prob * tickets_weight)
@@ -356,7 +415,7 @@ class MatchMaker:
                     best_quality = quality
                     best_match = (blue_team, orange_team)
 
-            if best_quality >= MIN_QUALITY:
+            if best_quality >= min_quality:
                 break
 
         # We sort by get_mmr() because it considers sigma
@@ -370,6 +429,7 @@ class MatchMaker:
 
     @staticmethod
     def make_test_match(bot_id: BotID) -> MatchDetails:
+        from rlbot.parsing.bot_config_bundle import get_bot_config_bundle
         allstar_config = get_bot_config_bundle(PackageFiles.psyonix_allstar)
         allstar_id = fmt_bot_name(allstar_config.name)
         team = [bot_id, allstar_id, allstar_id]
@@ -378,3 +438,14 @@ class MatchMaker:
 
 def make_timestamp() -> str:
     return datetime.now().strftime("%Y%m%d%H%M%S")
+
+
+def next_timestamp(last: str) -> str:
+    """
+    Returns a time stamp for now that is later than the given time stamp, which is the latest saved match.
+    Used when several matches finish within a second, since the files of a match are named by its time stamp.
+    """
+    time_stamp = make_timestamp()
+    if time_stamp <= last:
+        time_stamp = (datetime.strptime(last, "%Y%m%d%H%M%S") + timedelta(seconds=1)).strftime("%Y%m%d%H%M%S")
+    return time_stamp
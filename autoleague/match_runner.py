@@ -15,19 +15,25 @@ from overlay import make_overlay
 from paths import LeagueDir
 from replays import ReplayPreference, ReplayMonitor, ReplayData
 from settings import PersistentSettings
+from timing import MatchTimer
 
 
 def run_match(ld: LeagueDir, match_details: MatchDetails, bots: Mapping[BotID, BotConfigBundle],
-              replay_preference: ReplayPreference) -> Tuple[MatchResult, Optional[ReplayData]]:
+              replay_preference: ReplayPreference,
+              timer: Optional[MatchTimer] = None) -> Tuple[MatchResult, Optional[ReplayData]]:
     """
     Run a match, wait for it to finish, and return the result.
+    If a timer is given, the time spent in each phase of the match is recorded in it.
     """
 
     settings = PersistentSettings.load()
+    timer = timer or MatchTimer()
 
+    timer.begin("launch")
     with setup_manager_context(settings.launcher()) as setup_manager:
 
         # Expose data to overlay
+        timer.begin("overlay")
         make_overlay(ld, match_details, bots)
 
         # Prepare the match exercise
@@ -37,6 +43,7 @@ def run_match(ld: LeagueDir, match_details: MatchDetails, bots: Mapping[BotID, B
             match_config=match_details.to_config(bots),
             grader=MatchGrader(
                 replay_monitor=ReplayMonitor(replay_preference=replay_preference),
+                timer=timer,
             )
         )
 
@@ -46,6 +53,8 @@ def run_match(ld: LeagueDir, match_details: MatchDetails, bots: Mapping[BotID, B
 
         # For loop, but should only run exactly once
         with use_or_create(setup_manager, setup_manager_context) as setup_manager:
+            # Loading the match and bots ends when the grader receives its first tick
+            timer.begin("bot_load")
             wrapped_exercises = [TrainingExerciseAdapter(match)]
 
             for rlbot_result in run_exercises(setup_manager, wrapped_exercises, 4, reload_agent=False):
@@ -57,6 +66,7 @@ def run_match(ld: LeagueDir, match_details: MatchDetails, bots: Mapping[BotID, B
 
                 # Warn if no replay was found
                 replay_data = exercise_result.exercise.grader.replay_monitor.replay_data()
+                timer.begin("replay_copy")
                 if isinstance(exercise_result.grade, Fail) and replay_data.replay_id is None:
                     print(f"WARNING: No replay was found for the match '{match_details.name}'.")
                 else:
@@ -68,5 +78,6 @@ def run_match(ld: LeagueDir, match_details: MatchDetails, bots: Mapping[BotID, B
                         except:
                             pass
 
+                timer.end()
                 match_result = exercise_result.exercise.grader.match_result
                 return match_result, replay_data
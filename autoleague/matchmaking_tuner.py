@@ -0,0 +1,143 @@
+"""
+Compares values of the ticket and matchmaking parameters by simulating sessions of the league. Each combination of
+parameters in the grid is simulated with the real TicketSystem and MatchMaker, starting from the current ratings and
+tickets of the league. Results are simulated by treating the current mu of each bot as its true skill, and a few new
+bots join at the start of the simulation. The combinations are spread across a process pool, and all combinations
+use the same random seeds, so they are compared on equal terms.
+
+For each combination the following is reported, averaged over the simulated sessions:
+    games var   The variance of the number of games played per bot in a session (lower is more even)
+    quality     The mean TrueSkill match quality
+    MMR gap     The mean difference between the highest and lowest mu in a match
+
+Usage:
+    autoleague stats matchmaking [n] [processes]
+    python matchmaking_tuner.py <league_dir> [sessions] [processes]
+"""
+
+import contextlib
+import io
+import itertools
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple, TYPE_CHECKING
+
+import trueskill
+from trueskill import Rating
+
+if TYPE_CHECKING:
+    from paths import LeagueDir
+
+# The values tried for each parameter. Parameters of the TicketSystem are set on it, the others are passed to
+# MatchMaker.decide_on_players_3.
+GRID = {
+    "ticket_increase_rate": [1.2, 1.5, 2.0],
+    "game_catchup_boost": [0.5, 0.75, 1.0],
+    "new_bot_ticket_count": [2.0, 4.0],
+    "ticket_strength": [0.5, 1, 2],
+    "mmr_tolerance": [2, 4, 8],
+    "min_quality": [0.3, 0.4],
+}
+TICKET_PARAMETERS = ["ticket_increase_rate", "game_catchup_boost", "new_bot_ticket_count"]
+
+MATCHES_PER_SESSION = 40
+NEW_BOTS = 3
+SEED = 0
+
+
+def simulate(params: Dict[str, float], ratings: Dict[str, Tuple[float, float]], tickets: Dict[str, float],
+             sessions: int) -> Tuple[float, float, float]:
+    """
+    Simulate the sessions with the given parameters and return the mean games played variance, match quality, and
+    MMR gap. The ratings map bots to mu and sigma, and the tickets map bots to their tickets.
+    """
+    import numpy
+    from match import MatchResult
+    from match_maker import MatchMaker, TicketSystem
+    from ranking_system import RankingSystem
+
+    RankingSystem.setup()
+    matchmaking_params = {name: value for name, value in params.items() if name not in TICKET_PARAMETERS}
+    random.seed(SEED)
+    numpy.random.seed(SEED)
+
+    rank_sys = RankingSystem()
+    rank_sys.ratings = {bot: Rating(mu, sigma) for bot, (mu, sigma) in ratings.items()}
+    true_skill = {bot: mu for bot, (mu, _) in ratings.items()}
+    mus = list(true_skill.values())
+    for i in range(NEW_BOTS):
+        true_skill[f"New_Bot_{i}"] = random.choice(mus)
+    bots = list(true_skill.keys())
+
+    ticket_sys = TicketSystem()
+    ticket_sys.tickets = dict(tickets)
+    for name in TICKET_PARAMETERS:
+        setattr(ticket_sys, name, params[name])
+
+    beta = trueskill.global_env().beta
+    variances, qualities, gaps = [], [], []
+    for _ in range(sessions):
+        ticket_sys.session_game_counts = {}
+        for _ in range(MATCHES_PER_SESSION):
+            with contextlib.redirect_stdout(io.StringIO()):
+                blue, orange = MatchMaker.decide_on_players_3(bots, rank_sys, ticket_sys, **matchmaking_params)
+            match = MatchMaker.make_match(blue, orange)
+            blue = [rank_sys.get(bot) for bot in match.blue]
+            orange = [rank_sys.get(bot) for bot in match.orange]
+            qualities.append(trueskill.quality([blue, orange]))
+            gaps.append(max(r.mu for r in blue + orange) - min(r.mu for r in blue + orange))
+
+            # Simulate the result from the true skills
+            advantage = sum(true_skill[bot] for bot in match.blue) - sum(true_skill[bot] for bot in match.orange)
+            blue_wins = random.random() < 0.5 * (1 + math.erf(advantage / (math.sqrt(6) * beta)))
+            margin = 1 + int(random.expovariate(1))
+            result = MatchResult(margin, 0) if blue_wins else MatchResult(0, margin)
+            rank_sys.update(match, result)
+        variances.append(numpy.var([ticket_sys.session_game_counts.get(bot, 0) for bot in bots]))
+
+    return float(numpy.mean(variances)), float(numpy.mean(qualities)), float(numpy.mean(gaps))
+
+
+def run_tuner(ld: 'LeagueDir', sessions: int = 4, processes: int = os.cpu_count()) -> List[tuple]:
+    """
+    Simulate all combinations in the grid and print them as a table sorted by games played variance.
+    """
+    from bots import load_all_unretired_bots
+    from match_maker import TicketSystem
+    from ranking_system import RankingSystem
+
+    bots = list(load_all_unretired_bots(ld).keys())
+    rank_sys = RankingSystem.load(ld).ensure_all(bots)
+    ratings = {bot: (rank_sys.get(bot).mu, rank_sys.get(bot).sigma) for bot in bots}
+    ticket_sys = TicketSystem.load(ld, [])
+    tickets = {bot: ticket_sys.tickets[bot] for bot in bots if bot in ticket_sys.tickets}
+
+    combinations = [dict(zip(GRID.keys(), values)) for values in itertools.product(*GRID.values())]
+    print(f"Simulating {len(combinations)} combinations of {sessions} sessions with {len(bots)} bots "
+          f"on {processes} processes ...")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(processes) as pool:
+        futures = [pool.submit(simulate, params, ratings, tickets, sessions) for params in combinations]
+        rows = [(params, *future.result()) for params, future in zip(combinations, futures)]
+    print(f"Done in {time.perf_counter() - start:.0f} s\n")
+
+    rows.sort(key=lambda row: row[1])
+    header = " ".join(f"{name: >{len(name)}}" for name in GRID.keys())
+    print(f"{header} {'games var': >10} {'quality': >8} {'MMR gap': >8}")
+    for params, variance, quality, gap in rows:
+        values = " ".join(f"{value: >{len(name)}}" for name, value in params.items())
+        print(f"{values} {variance: >10.3f} {quality: >8.3f} {gap: >8.2f}")
+    return rows
+
+
+if __name__ == '__main__':
+    if not 2 <= len(sys.argv) <= 4:
+        print(__doc__)
+        sys.exit(1)
+    from paths import LeagueDir
+    run_tuner(LeagueDir(Path(sys.argv[1])), *[int(arg) for arg in sys.argv[2:]])
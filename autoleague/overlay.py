@@ -1,24 +1,32 @@
+import hashlib
 import json
-import shutil
-import string
-from collections import defaultdict
+import os
 from pathlib import Path
-from typing import Mapping
+from typing import Mapping, Dict, List, Tuple, Optional, TYPE_CHECKING
 
-from rlbot.parsing.bot_config_bundle import BotConfigBundle
-
-from bots import BotID, logo, defmt_bot_name, load_all_bots, fmt_bot_name, load_all_unretired_bots, load_retired_bots
+from bots import BotID, BotConfigs, logo, defmt_bot_name, load_all_bots, fmt_bot_name, load_all_unretired_bots, load_retired_bots
 from leaguesettings import LeagueSettings
 from match import MatchDetails
 from match_maker import TicketSystem
+from overlay_server import publish
 from paths import PackageFiles, LeagueDir
 from ranking_system import RankingSystem
+from storage import atomic_write
+
+try:
+    from PIL import Image
+except ImportError:
+    # Pillow is optional. Without it, logos are not scaled down
+    Image = None
+
+if TYPE_CHECKING:
+    from rlbot.parsing.bot_config_bundle import BotConfigBundle
 
 
-def make_overlay(ld: LeagueDir, match: MatchDetails, bots: Mapping[BotID, BotConfigBundle]):
+def make_overlay(ld: LeagueDir, match: MatchDetails, bots: BotConfigs):
     """
     Make a `current_match.json` file which contains the details about the current
-    match and its participants.
+    match and its participants. The details are taken from the bot index, so no bot config is parsed.
     """
 
     retired = load_retired_bots(ld)
@@ -26,17 +34,17 @@ def make_overlay(ld: LeagueDir, match: MatchDetails, bots: Mapping[BotID, BotCon
     rank_list = rankings.as_sorted_list(exclude=retired)
 
     def bot_data(bot_id):
-        config = bots[bot_id]
+        details = bots.details(bot_id)
         rank, mmr = [(i + 1, mrr) for i, (id, mrr, sigma) in enumerate(rank_list) if id == bot_id][0]
         return {
-            "name": config.name,
-            "config_path": str(config.config_path),
-            "logo_path": try_copy_logo(config),
-            "developer": config.base_agent_config.get("Details", "developer"),
-            "description": config.base_agent_config.get("Details", "description"),
-            "fun_fact": config.base_agent_config.get("Details", "fun_fact"),
-            "github": config.base_agent_config.get("Details", "github"),
-            "language": config.base_agent_config.get("Details", "language"),
+            "name": bots.name(bot_id),
+            "config_path": bots.config_path(bot_id),
+            "logo_path": try_copy_logo(bots.logo_path(bot_id)),
+            "developer": details["developer"],
+            "description": details["description"],
+            "fun_fact": details["fun_fact"],
+            "github": details["github"],
+            "language": details["language"],
             "rank": rank,
             "mmr": mmr,
         }
@@ -47,8 +55,62 @@ def make_overlay(ld: LeagueDir, match: MatchDetails, bots: Mapping[BotID, BotCon
         "map": match.map
     }
 
-    with open(PackageFiles.overlay_current_match, 'w') as f:
+    with atomic_write(PackageFiles.overlay_current_match, 'w') as f:
         json.dump(overlay, f, indent=4)
+    publish(PackageFiles.overlay_current_match.name, overlay)
+
+
+class SummaryState:
+    """
+    The state behind the summary: the matches included in the summary, the wins and losses of each bot in
+    those matches, and the rankings from before the first of those matches. The state is saved as
+    `summary_state.json` in the league directory, so the summary can be updated with a single new match
+    without reloading the previous matches and rankings.
+    """
+    def __init__(self):
+        self.matches: List[dict] = []
+        # Maps bots to list of booleans, where true=win and false=loss
+        self.bot_wins: Dict[BotID, List[bool]] = {}
+        # Tuples of bot id, mmr, and sigma sorted by mmr, including retired bots
+        self.old_rankings: List[Tuple[BotID, int, float]] = []
+
+    def add_match(self, match: MatchDetails):
+        self.matches.append({
+            "index": len(self.matches),
+            "blue_names": [defmt_bot_name(bot_id) for bot_id in match.blue],
+            "orange_names": [defmt_bot_name(bot_id) for bot_id in match.orange],
+            "blue_goals": match.result.blue_goals,
+            "orange_goals": match.result.orange_goals,
+        })
+        for bot in match.blue:
+            self.bot_wins.setdefault(bot, []).append(match.result.blue_goals > match.result.orange_goals)
+        for bot in match.orange:
+            self.bot_wins.setdefault(bot, []).append(match.result.blue_goals < match.result.orange_goals)
+
+    def save(self, ld: LeagueDir):
+        with atomic_write(ld.summary_state, 'w') as f:
+            json.dump(self.__dict__, f)
+
+    @staticmethod
+    def load(ld: LeagueDir) -> Optional['SummaryState']:
+        """
+        Loads the summary state or returns None if there is none.
+        """
+        if not ld.summary_state.exists():
+            return None
+        state = SummaryState()
+        with open(ld.summary_state) as f:
+            state.__dict__.update(json.load(f))
+        state.old_rankings = [tuple(elem) for elem in state.old_rankings]
+        return state
+
+    @staticmethod
+    def invalidate(ld: LeagueDir):
+        """
+        Remove the saved summary state, e.g. because a match was undone. The next summary is made from scratch.
+        """
+        if ld.summary_state.exists():
+            ld.summary_state.unlink()
 
 
 def make_summary(ld: LeagueDir, count: int):
@@ -56,102 +118,156 @@ def make_summary(ld: LeagueDir, count: int):
     Make a summary of the N latest matches and the resulting ranks and tickets.
     If N is 0 the summary will just contain the current ratings.
     """
-    summary = {}
+    state = SummaryState()
 
-    tickets = TicketSystem.load(ld)
+    if count > 0:
+        for match in MatchDetails.latest(ld, count):
+            state.add_match(match)
+        # Determine current rank and their rank N matches ago
+        n_rankings = RankingSystem.latest(ld, count + 1)
+        state.old_rankings = n_rankings[0].as_sorted_list()
+        rank_sys = n_rankings[-1]
+    else:
+        # Old rankings and current rankings is the same
+        rank_sys = RankingSystem.load(ld)
+        state.old_rankings = rank_sys.as_sorted_list()
 
-    # ========== Matches ==========
+    write_summary(ld, state, rank_sys, TicketSystem.load(ld), load_all_unretired_bots(ld))
 
-    matches = []
-    bot_wins = defaultdict(list)  # Maps bots to list of booleans, where true=win and false=loss
 
-    if count > 0:
-        latest_matches = MatchDetails.latest(ld, count)
-        for i, match in enumerate(latest_matches):
-            matches.append({
-                "index": i,
-                "blue_names": [defmt_bot_name(bot_id) for bot_id in match.blue],
-                "orange_names": [defmt_bot_name(bot_id) for bot_id in match.orange],
-                "blue_goals": match.result.blue_goals,
-                "orange_goals": match.result.orange_goals,
-            })
-            for bot in match.blue:
-                bot_wins[bot].append(match.result.blue_goals > match.result.orange_goals)
-            for bot in match.orange:
-                bot_wins[bot].append(match.result.blue_goals < match.result.orange_goals)
-
-    summary["matches"] = matches
-
-    # ========= Ranks/Ratings =========
-
-    bots = load_all_unretired_bots(ld)
+def update_summary(ld: LeagueDir, match: MatchDetails, rank_sys: RankingSystem, ticket_sys: TicketSystem,
+                   bots: Mapping[BotID, 'BotConfigBundle']):
+    """
+    Add the given match, which has just been saved, to the summary. The given systems must be the current
+    systems. Only the new match is processed, so the cost does not grow with the number of matches in the
+    summary. If there is no saved summary state, the summary is made from scratch instead.
+    """
+    state = SummaryState.load(ld)
+    if state is None or len(state.matches) != LeagueSettings.load(ld).last_summary:
+        make_summary(ld, LeagueSettings.load(ld).last_summary + 1)
+        return
+
+    state.add_match(match)
+    write_summary(ld, state, rank_sys, ticket_sys, bots)
+
+
+def write_summary(ld: LeagueDir, state: SummaryState, rank_sys: RankingSystem, tickets: TicketSystem,
+                  bots: Mapping[BotID, 'BotConfigBundle']):
+    """
+    Write the summary of the given state and current systems to the overlay, and save the state.
+    """
     retired = load_retired_bots(ld)
-    bots_by_rank = []
 
-    if count <= 0:
-        # Old rankings and current rankings is the same, but make sure all bots have a rank currently
-        old_rankings = RankingSystem.load(ld).as_sorted_list(exclude=retired)
-        cur_rankings = RankingSystem.load(ld).ensure_all(list(bots.keys())).as_sorted_list(exclude=retired)
-    else:
-        # Determine current rank and their to N matches ago
-        n_rankings = RankingSystem.latest(ld, count + 1)
-        old_rankings = n_rankings[0].as_sorted_list(exclude=retired)
-        cur_rankings = n_rankings[-1].ensure_all(list(bots.keys())).as_sorted_list(exclude=retired)
+    # Make sure all bots have a rank currently
+    cur_rankings = rank_sys.ensure_all(list(bots.keys())).as_sorted_list(exclude=retired)
+    old_ranks = {
+        bot: (j + 1, mmr)
+        for j, (bot, mmr, _) in enumerate(elem for elem in state.old_rankings if elem[0] not in retired)
+    }
 
+    bots_by_rank = []
     for i, (bot, mrr, sigma) in enumerate(cur_rankings):
-        cur_rank = i + 1
-        old_rank = None
-        old_mmr = None
-        for j, (other_bot, other_mrr, _) in enumerate(old_rankings):
-            if bot == other_bot:
-                old_rank = j + 1
-                old_mmr = other_mrr
-                break
+        old_rank, old_mmr = old_ranks.get(bot, (None, None))
         bots_by_rank.append({
             "bot_id": defmt_bot_name(bot),
             "mmr": mrr,
             "old_mmr": old_mmr,
             "sigma": sigma,
-            "cur_rank": cur_rank,
+            "cur_rank": i + 1,
             "old_rank": old_rank,
             "tickets": tickets.get(bot) or tickets.new_bot_ticket_count,
-            "wins": bot_wins[bot],
+            "wins": state.bot_wins.get(bot, []),
         })
 
-    summary["bots_by_rank"] = bots_by_rank
+    summary = {
+        "matches": state.matches,
+        "bots_by_rank": bots_by_rank,
+    }
 
     # =========== Write =============
 
-    with open(PackageFiles.overlay_summary, 'w') as f:
+    with atomic_write(PackageFiles.overlay_summary, 'w') as f:
         json.dump(summary, f, indent=4)
+    publish(PackageFiles.overlay_summary.name, summary)
+
+    state.save(ld)
 
     league_settings = LeagueSettings.load(ld)
-    league_settings.last_summary = count
+    league_settings.last_summary = len(state.matches)
     league_settings.save(ld)
 
 
-# Borrowed from RLBotGUI
-def try_copy_logo(bundle: BotConfigBundle):
-    logo_path = bundle.get_logo_file()
-    if logo_path is not None:
-        root_folder = PackageFiles.overlay_dir
-        folder = root_folder / 'images' / 'logos'
-        folder.mkdir(parents=True, exist_ok=True)  # Ensure the folder exists
-        web_url = 'images/logos/' + convert_to_filename(logo_path)
-        target_file = root_folder / web_url
-        shutil.copy(logo_path, target_file)
-        return web_url
-    return None
+# The largest size a logo is shown at in the overlays (see `.bot-herald img` in versus_logos.css)
+LOGO_DISPLAY_SIZE = (400, 200)
+
+
+def try_copy_logo(logo_path: Optional[str]):
+    """
+    Makes the given logo available to the overlay and returns its url relative to the overlay directory,
+    or None if the bot has no logo. Logos are stored by the hash of their content, so a logo is only copied when it
+    has changed. The store always holds copies, never links, so editing a bot's logo can't change a stored logo.
+    If Pillow is installed, large logos are scaled down to the size they are displayed at.
+    """
+    if logo_path is None:
+        return None
+
+    folder = PackageFiles.overlay_logos
+    folder.mkdir(parents=True, exist_ok=True)  # Ensure the folder exists
+    logo_index = load_logo_index()
+
+    # The logo is only hashed if it has been modified since it was last copied
+    stat = os.stat(logo_path)
+    entry = logo_index.get(logo_path)
+    if entry is not None and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size \
+            and (PackageFiles.overlay_dir / entry["web_url"]).exists():
+        return entry["web_url"]
+
+    with open(logo_path, 'rb') as f:
+        content = f.read()
+    content_hash = hashlib.sha1(content).hexdigest()
+    file_name = content_hash + os.path.splitext(logo_path)[1].lower()
+    target_file = folder / file_name
+    if not target_file.exists():
+        if not try_scale_logo(logo_path, target_file):
+            with atomic_write(target_file, 'wb') as f:
+                f.write(content)
+
+    web_url = 'images/logos/' + file_name
+    logo_index[logo_path] = {"mtime": stat.st_mtime, "size": stat.st_size, "web_url": web_url}
+    with atomic_write(PackageFiles.overlay_logo_index, 'w') as f:
+        json.dump(logo_index, f, indent=4)
+    return web_url
+
+
+def try_scale_logo(logo_path: str, target_file: Path) -> bool:
+    """
+    Writes a copy of the logo scaled down to the display size, if Pillow is installed and the logo is larger
+    than the display size. Returns true if the scaled copy was written.
+    """
+    if Image is None:
+        return False
+    try:
+        with Image.open(logo_path) as image:
+            if image.width <= LOGO_DISPLAY_SIZE[0] and image.height <= LOGO_DISPLAY_SIZE[1]:
+                return False
+            image.thumbnail(LOGO_DISPLAY_SIZE)
+            with atomic_write(target_file, 'wb') as f:
+                image.save(f, format=image.format)
+            return True
+    except (OSError, ValueError):
+        # Not an image Pillow understands, just copy it
+        return False
 
 
-def convert_to_filename(text):
+def load_logo_index() -> Dict[str, dict]:
     """
-    Normalizes string, converts to lowercase, removes non-alphanumeric characters,
-    and converts spaces to underscores.
+    Loads the index of logos available to the overlay. It maps the path of each bot's logo to the file's
+    modification time and size when it was copied, and the url of the copy.
     """
-    import unicodedata
-    normalized = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
-    valid_chars = f'-_.() {string.ascii_letters}{string.digits}'
-    filename = ''.join(c for c in normalized if c in valid_chars)
-    filename = filename.replace(' ', '_')  # Replace spaces with underscores
-    return filename
+    if not PackageFiles.overlay_logo_index.exists():
+        return dict()
+    try:
+        with open(PackageFiles.overlay_logo_index) as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        return dict()
@@ -0,0 +1,303 @@
+import atexit
+import json
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from paths import PackageFiles
+from storage import atomic_write
+
+DEFAULT_PORT = 8765
+
+# Seconds between keep-alive comments sent to idle event streams
+KEEP_ALIVE_INTERVAL = 15
+
+# The overlay data files (paths relative to the overlay directory) which can be published to the server
+PUBLISHED_FILES = {
+    PackageFiles.overlay_current_match.name,
+    PackageFiles.overlay_summary.name,
+    "tmcp-overlay/overlay/data.json",
+}
+
+# Seconds to skip publishing after the server could not be reached
+SERVER_ABSENT_INTERVAL = 30
+
+# Seconds to wait for unsent data when the process exits
+EXIT_FLUSH_TIMEOUT = 1
+
+# The default maximum number of times per second a CoalescingWriter writes its data file
+MAX_WRITES_PER_SECOND = 10
+
+# Seconds to wait for the last data to be written when a CoalescingWriter is stopped
+STOP_TIMEOUT = 5
+
+
+class Publisher:
+    """
+    Sends published data to the overlay server from a background thread, so publishing never delays a match.
+    Only the latest data of each file is sent. If the server can't be reached, e.g. because it isn't running,
+    publishing is skipped for SERVER_ABSENT_INTERVAL seconds, so there is only one failed connection at a time.
+    """
+    def __init__(self, port: int):
+        self.port = port
+        self.lock = threading.Lock()
+        self.pending: Dict[str, bytes] = {}
+        self.sending = False
+        self.absent_until = 0.
+        self.wake = threading.Event()
+        threading.Thread(target=self.run, daemon=True).start()
+        atexit.register(self.flush, EXIT_FLUSH_TIMEOUT)
+
+    def publish(self, name: str, data) -> bool:
+        if time.monotonic() < self.absent_until:
+            return False
+        with self.lock:
+            self.pending[name] = json.dumps(data).encode("utf-8")
+        self.wake.set()
+        return True
+
+    def run(self):
+        while True:
+            self.wake.wait()
+            with self.lock:
+                self.wake.clear()
+                pending, self.pending = self.pending, {}
+                self.sending = True
+            for name, data in pending.items():
+                if not self.send(name, data):
+                    self.absent_until = time.monotonic() + SERVER_ABSENT_INTERVAL
+                    break
+            self.sending = False
+
+    def send(self, name: str, data: bytes) -> bool:
+        request = urllib.request.Request(
+            f"http://localhost:{self.port}/publish/{name}",
+            data=data,
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=0.5):
+                return True
+        except (urllib.error.URLError, OSError):
+            return False
+
+    def flush(self, timeout: float):
+        """
+        Wait until all published data has been sent, or the timeout has passed.
+        """
+        deadline = time.monotonic() + timeout
+        while (self.pending or self.sending) and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+_publishers: Dict[int, Publisher] = {}
+
+
+def publish(name: str, data, port: int = DEFAULT_PORT) -> bool:
+    """
+    Publish new data for the given overlay data file (one of PUBLISHED_FILES) to the overlay server. The data is
+    sent in the background. Returns false if the server was recently found not to be running. Never raises on
+    connection errors, so publishing can't break a running match.
+    """
+    if port not in _publishers:
+        _publishers[port] = Publisher(port)
+    return _publishers[port].publish(name, data)
+
+
+class CoalescingWriter:
+    """
+    Writes an overlay data file and publishes it from a background thread. Submitting new data only replaces the
+    pending data, so updates arriving faster than the max rate are coalesced and only the newest data is written.
+    Files are written to a temporary file first and then renamed, so the overlay never reads a half-written file.
+    """
+    def __init__(self, path: Path, name: str, max_writes_per_second: float = MAX_WRITES_PER_SECOND):
+        self.path = path
+        # The name of the file when published, one of PUBLISHED_FILES
+        self.name = name
+        self.min_interval = 1.0 / max_writes_per_second
+        self.pending: Optional[dict] = None
+        self.stopping = False
+        self.condition = threading.Condition()
+        self.submitted_count = 0
+        self.written_count = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, data: dict):
+        """
+        Schedule the data to be written. Never blocks on file or network I/O.
+        """
+        with self.condition:
+            self.pending = data
+            self.submitted_count += 1
+            self.condition.notify()
+
+    def stop(self, timeout: float = STOP_TIMEOUT):
+        """
+        Write the pending data right away, if any, and stop the background thread.
+        """
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        self.thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending is not None or self.stopping)
+                if self.pending is None:
+                    return
+                data = self.pending
+                self.pending = None
+
+            start = time.monotonic()
+            self._write(data)
+            publish(self.name, data)
+            self.written_count += 1
+
+            # Updates arriving in the meantime are coalesced. Stopping ends the wait, so the last data is written.
+            with self.condition:
+                self.condition.wait_for(lambda: self.stopping, max(0.0, self.min_interval - (time.monotonic() - start)))
+
+    def _write(self, data: dict):
+        try:
+            with atomic_write(self.path) as file:
+                json.dump(data, file, indent=4)
+        except Exception:
+            pass
+
+
+class OverlayState:
+    """
+    The latest published data of each overlay data file, and the event streams of the connected pages.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latest: Dict[str, bytes] = {}
+        self.listeners: List[queue.Queue] = []
+
+    def publish(self, name: str, data: bytes):
+        event = json.dumps({"name": name, "data": json.loads(data)}).encode("utf-8")
+        with self.lock:
+            self.latest[name] = data
+            for listener in self.listeners:
+                listener.put(event)
+
+    def listen(self) -> queue.Queue:
+        """
+        Returns a new event queue, which starts out with the latest data of all files.
+        """
+        listener = queue.Queue()
+        with self.lock:
+            for name, data in self.latest.items():
+                listener.put(json.dumps({"name": name, "data": json.loads(data)}).encode("utf-8"))
+            self.listeners.append(listener)
+        return listener
+
+    def stop_listening(self, listener: queue.Queue):
+        with self.lock:
+            self.listeners.remove(listener)
+
+
+class OverlayRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Serves the files of the overlay directory. Additionally:
+    - `POST /publish/<name>` publishes new json data for the overlay data file <name>, one of PUBLISHED_FILES.
+    - `GET /events` is a Server-Sent Events stream of all published data.
+    - `GET /<name>` returns the latest published data of <name>, if any was published.
+    """
+    def __init__(self, *args, state: OverlayState, **kwargs):
+        self.state = state
+        super().__init__(*args, **kwargs)
+
+    def do_POST(self):
+        if not self.path.startswith("/publish/"):
+            self.send_error(404)
+            return
+        name = self.path[len("/publish/"):]
+        if name not in PUBLISHED_FILES:
+            self.send_error(404, "Not an overlay data file")
+            return
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            self.state.publish(name, data)
+        except json.JSONDecodeError:
+            self.send_error(400, "Published data must be json")
+            return
+        self.send_response(204)
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path == "/events":
+            self.stream_events()
+            return
+
+        # Serve published data from memory, so it is never read while being written
+        data = self.state.latest.get(self.path.lstrip("/").split("?")[0])
+        if data is not None:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        super().do_GET()
+
+    def stream_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        listener = self.state.listen()
+        try:
+            while True:
+                try:
+                    event = listener.get(timeout=KEEP_ALIVE_INTERVAL)
+                    self.wfile.write(b"data: " + event + b"\n\n")
+                except queue.Empty:
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The page was closed
+            pass
+        finally:
+            self.state.stop_listening(listener)
+
+    def end_headers(self):
+        # The overlay files change while the server is running
+        if self.command == "GET" and self.path != "/events":
+            self.send_header("Cache-Control", "no-cache")
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        # Keep the console quiet; every page reload would be logged otherwise
+        pass
+
+
+def make_server(port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """
+    Create a server for the overlay directory. Call `serve_forever` to start it.
+    """
+    handler = partial(OverlayRequestHandler, state=OverlayState(), directory=str(PackageFiles.overlay_dir))
+    server = ThreadingHTTPServer(("localhost", port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve_overlays(port: int = DEFAULT_PORT):
+    """
+    Serve the overlays until interrupted with ctrl+C.
+    """
+    print(f"Serving overlays at http://localhost:{port}/ (ctrl+C to stop)")
+    try:
+        make_server(port).serve_forever()
+    except KeyboardInterrupt:
+        pass
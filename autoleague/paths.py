@@ -36,6 +36,38 @@ class LeagueDir:
     #     matches.csv
     #     ratings.csv
     #     ...
+    # stats/
+    #     # Computed statistics, e.g. the win matrices as csv, npy, and png files
+    #     win_matrix.csv
+    #     win_rate_matrix.csv
+    #     ...
+    # match_index.npz
+    #     # Time stamp, participants, map, score, and replay id of all matches.
+    # pair_index.npz
+    #     # Matches, wins, and goal differentials of each pair of bots as teammates and opponents.
+    # career_stats.npz
+    #     # Matches, wins, and score totals of each bot.
+    # rating_history.npz
+    #     # The changes of all ratings. Extended with new rankings automatically.
+    # profiles/
+    #     # Reports written by `--profile`. Safe to delete.
+    #     20210115150600_match_run.prof
+    #     20210115150600_match_run.txt
+    #     ...
+    # summary_state.json
+    #     # The matches and old rankings of the current summary. Rebuilt by `summary [n]`.
+    # bot_registry.json
+    #     # The stable integer id of each bot. Ids are used to index arrays of bot data.
+    # bot_index.json
+    #     # Cache of parsed bot configs. Safe to delete.
+    # unzip_index.json
+    #     # The zip files in bots/ which have been extracted already.
+    # coordinator_token.txt
+    #     # The secret workers need to report results to `match coordinate`.
+    # league.lock
+    #     # Locked by commands that change the league, so they don't run concurrently.
+    # match_timings.jsonl
+    #     # Time spent in each phase of running a match. One json object per line for each match.
     """
 
     def __init__(self, league_dir: Path):
@@ -48,6 +80,10 @@ class LeagueDir:
         self.tickets = self._league_dir / "tickets"
         self.replays = self._league_dir / "replays"
         self.bot_summary = self._league_dir / "bot_summary.json"
+        self.summary_state = self._league_dir / "summary_state.json"
+        self.bot_index = self._league_dir / "bot_index.json"
+        self.bot_registry = self._league_dir / "bot_registry.json"
+        self.unzip_index = self._league_dir / "unzip_index.json"
         self.csvs = self._league_dir / "csvs"
         self.csv_bots = self.csvs / "bots.csv"
         self.csv_matches = self.csvs / "matches.csv"
@@ -55,6 +91,20 @@ class LeagueDir:
         self.csv_ratings = self.csvs / "ratings.csv"
         self.csv_scores = self.csvs / "scores.csv"
         self.csvs_readme = self.csvs / "README.md"
+        self.csv_export_state = self.csvs / "export_state.json"
+        self.match_index = self._league_dir / "match_index.npz"
+        self.pair_index = self._league_dir / "pair_index.npz"
+        self.career_stats = self._league_dir / "career_stats.npz"
+        self.rating_history = self._league_dir / "rating_history.npz"
+        self.profiles = self._league_dir / "profiles"
+        self.stats = self._league_dir / "stats"
+        # The win matrices are written with several extensions, e.g. .csv and .npy
+        self.stats_win_matrix = self.stats / "win_matrix"
+        self.stats_win_rate_matrix = self.stats / "win_rate_matrix"
+        self.stats_rating_grid = self.stats / "rating_grid.csv"
+        self.match_timings = self._league_dir / "match_timings.jsonl"
+        self.lock = self._league_dir / "league.lock"
+        self.coordinator_token = self._league_dir / "coordinator_token.txt"
         self._ensure_directory_structure()
 
     def _ensure_directory_structure(self):
@@ -83,3 +133,5 @@ class PackageFiles:
 
     overlay_current_match = overlay_dir / "current_match.json"
     overlay_summary = overlay_dir / "summary.json"
+    overlay_logos = overlay_dir / "images" / "logos"
+    overlay_logo_index = overlay_logos / "index.json"
@@ -0,0 +1,61 @@
+import cProfile
+import io
+import pstats
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+from paths import LeagueDir
+from storage import atomic_write
+
+# Number of functions and allocation sites listed in the summary
+TOP_N = 25
+
+
+def profile_call(ld: LeagueDir, name: str, func: Callable, *args, memory: bool = False, top: int = TOP_N, **kwargs):
+    """
+    Call the function with cProfile (and tracemalloc, if `memory` is true) enabled and return its result.
+    The profile is written to `profiles/<time stamp>_<name>.prof` in the league directory, which can be
+    opened with e.g. snakeviz, and a summary of the top functions and allocations is written next to it.
+    """
+    profiler = cProfile.Profile()
+    if memory:
+        tracemalloc.start()
+    profiler.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        snapshot = None
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        path = write_profile(ld, name, profiler, snapshot, peak if memory else None, top)
+        print(f"Profile written to '{path}'")
+
+
+def write_profile(ld: LeagueDir, name: str, profiler: cProfile.Profile, snapshot, peak, top: int) -> Path:
+    """
+    Write the profile and its summary to the profiles directory and return the path to the summary.
+    """
+    ld.profiles.mkdir(exist_ok=True)
+    stem = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{name}"
+    profiler.dump_stats(str(ld.profiles / f"{stem}.prof"))
+
+    summary = io.StringIO()
+    summary.write(f"Profile of '{name}'\n\n")
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats("cumulative").print_stats(top)
+    stats.sort_stats("tottime").print_stats(top)
+    if snapshot is not None:
+        summary.write(f"Peak traced memory: {peak / 1024:.1f} KiB\n")
+        summary.write(f"Top {top} allocation sites by size:\n")
+        for stat in snapshot.statistics("lineno")[:top]:
+            summary.write(f"    {stat}\n")
+
+    path = ld.profiles / f"{stem}.txt"
+    with atomic_write(path, 'w') as f:
+        f.write(summary.getvalue())
+    return path
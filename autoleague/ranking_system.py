@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Dict, List, Tuple, Set
+from typing import Dict, List, Tuple, Set, TYPE_CHECKING
 import json
 
 import trueskill
@@ -8,6 +8,23 @@ from trueskill import Rating, TrueSkill
 from bots import BotID, defmt_bot_name
 from match import MatchDetails, MatchResult
 from paths import LeagueDir
+from storage import atomic_write
+
+if TYPE_CHECKING:
+    import numpy as np
+    from bot_registry import BotRegistry
+
+# Parameters of the TrueSkill environment. `stats ratinggrid` compares alternatives on the history of the league.
+TRUESKILL_PARAMETERS = {
+    "mu": 50.,
+    "sigma": 50. / 3.,
+    "beta": 50. / 6.,
+    "tau": 50. / 300.,
+    "draw_probability": .03,
+}
+
+# An extra TrueSkill win is awarded for every this many goals of lead
+GOALS_PER_EXTRA_WIN = 4
 
 
 class RankingSystem:
@@ -63,8 +80,8 @@ class RankingSystem:
 
         new_blue_ratings = blue_ratings
         new_orange_ratings = orange_ratings
-        # Award a TrueSkull win for every 3 goal lead (at least 1)
-        for _ in range(1 + abs(result.blue_goals - result.orange_goals) // 4):
+        # Award a TrueSkull win for every GOALS_PER_EXTRA_WIN goal lead (at least 1)
+        for _ in range(1 + abs(result.blue_goals - result.orange_goals) // GOALS_PER_EXTRA_WIN):
             # Rank each team for TrueSkill calculations. 0 is best (winner)
             ranks = [0, 1] if result.blue_goals > result.orange_goals else [1, 0]
             new_blue_ratings, new_orange_ratings = trueskill.rate([new_blue_ratings, new_orange_ratings], ranks=ranks)
@@ -75,6 +92,20 @@ class RankingSystem:
         for i, bot_id in enumerate(match.orange):
             self.ratings[bot_id] = new_orange_ratings[i]
 
+    def arrays(self, registry: 'BotRegistry') -> Tuple['np.ndarray', 'np.ndarray']:
+        """
+        Returns the mu and sigma of all bots as arrays indexed by the ids of the registry. Bots without a rating
+        are NaN. Rated bots which are not registered are left out, see `BotRegistry.ensure`.
+        """
+        import numpy as np
+        bots = [bot for bot in self.ratings if bot in registry]
+        ids = registry.ids(bots)
+        mu = np.full(len(registry), np.nan)
+        sigma = np.full(len(registry), np.nan)
+        mu[ids] = [self.ratings[bot].mu for bot in bots]
+        sigma[ids] = [self.ratings[bot].sigma for bot in bots]
+        return mu, sigma
+
     def print_ranks_and_mmr(self, exclude: Set[BotID] = {}):
         """
         Print bot rankings and mmr
@@ -94,7 +125,7 @@ class RankingSystem:
         return ranks
 
     def save(self, ld: LeagueDir, time_stamp: str):
-        with open(ld.rankings / f"{time_stamp}_rankings.json", 'w') as f:
+        with atomic_write(ld.rankings / f"{time_stamp}_rankings.json", 'w') as f:
             json.dump(self, f, cls=RankEncoder, sort_keys=True)
 
     @staticmethod
@@ -102,9 +133,9 @@ class RankingSystem:
         """
         Loads the latest ranking system file (or create a new ranking system if no file exists)
         """
-        if any(ld.rankings.iterdir()):
+        if any(ld.rankings.glob("*.json")):
             # Assume last rankings file is the newest, since they are prefixed with a time stamp
-            with open(list(ld.rankings.iterdir())[-1]) as f:
+            with open(sorted(ld.rankings.glob("*.json"))[-1]) as f:
                 return json.load(f, object_hook=as_rankings)
         # New rankings
         return RankingSystem()
@@ -122,7 +153,7 @@ class RankingSystem:
         """
         Returns the latest N states of the ranking system
         """
-        rankings = [RankingSystem.read(path) for path in list(ld.rankings.iterdir())[-count:]]
+        rankings = [RankingSystem.read(path) for path in sorted(ld.rankings.glob("*.json"))[-count:]]
         if len(rankings) < count:
             # Prepend empty rankings if more were requested
             return [RankingSystem()] + rankings
@@ -134,28 +165,22 @@ class RankingSystem:
         """
         Returns all previous states of the ranking system in chronological order
         """
-        return [RankingSystem()] + [RankingSystem.read(path) for path in list(ld.rankings.iterdir())]
+        return [RankingSystem()] + [RankingSystem.read(path) for path in sorted(ld.rankings.glob("*.json"))]
 
     @staticmethod
     def undo(ld: LeagueDir):
         """
         Remove latest rankings file
         """
-        if any(ld.rankings.iterdir()):
+        if any(ld.rankings.glob("*.json")):
             # Assume last rankings file is the newest, since they are prefixed with a time stamp
-            list(ld.rankings.iterdir())[-1].unlink()   # Remove file
+            sorted(ld.rankings.glob("*.json"))[-1].unlink()   # Remove file
         else:
             print("No rankings to undo.")
 
     @staticmethod
     def setup():
-        trueskill.setup(
-            mu=50.,
-            sigma=50./3.,
-            beta=50./6.,
-            tau=50./300.,
-            draw_probability=.03,
-        )
+        trueskill.setup(**TRUESKILL_PARAMETERS)
 
 
 # ====== RankingSystem -> JSON ======
@@ -0,0 +1,157 @@
+import csv
+import itertools
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+from trueskill import TrueSkill
+
+from bot_registry import BotRegistry
+from match_index import MatchIndex
+from paths import LeagueDir
+from ranking_system import TRUESKILL_PARAMETERS, GOALS_PER_EXTRA_WIN
+from storage import atomic_write
+
+# The values tried for each rating parameter. All bots start with the same mu, so mu does not change predictions.
+# A large GOALS_PER_EXTRA_WIN means no extra wins.
+RATING_GRID = {
+    "mu": [50.],
+    "sigma": [25. / 3., 50. / 3., 25.],
+    "beta": [25. / 6., 50. / 6., 100. / 6.],
+    "tau": [0., 50. / 600., 50. / 300., 50. / 100.],
+    "draw_probability": [0., .03, .1],
+    "goals_per_extra_win": [2, 3, 4, 6, 100],
+}
+
+# Number of configurations shown by `stats ratinggrid`
+TOP_N = 15
+
+# The match history replayed by the worker processes: registry ids of blue and orange, and goals
+_history: Dict[str, np.ndarray] = {}
+
+
+def cdf(x: np.ndarray) -> np.ndarray:
+    """
+    The cumulative distribution function of the standard normal distribution, computed like trueskill does.
+    """
+    z = np.abs(x) / math.sqrt(2)
+    t = 1. / (1. + z / 2.)
+    r = t * np.exp(-z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (
+        -0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (
+            -0.82215223 + t * 0.17087277)))))))))
+    return 0.5 * np.where(x > 0, 2. - r, r)
+
+
+def pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-x * x / 2) / math.sqrt(2 * math.pi)
+
+
+def _set_history(blue: np.ndarray, orange: np.ndarray, blue_goals: np.ndarray, orange_goals: np.ndarray,
+                 bot_count: int):
+    _history.update(blue=blue, orange=orange, blue_goals=blue_goals, orange_goals=orange_goals,
+                    bot_count=bot_count)
+
+
+def replay(configs: List[dict]) -> np.ndarray:
+    """
+    Replay the match history with each of the given configurations at once and return the log-loss and the accuracy
+    of the predicted winner before each match, with shape (configs, 2). The ratings are updated like
+    `RankingSystem.update` does, using the closed form of TrueSkill for two teams. Matches without a winner are
+    not scored.
+    """
+    blue, orange = _history["blue"], _history["orange"]
+    blue_goals, orange_goals = _history["blue_goals"], _history["orange_goals"]
+    column = {key: np.array([config[key] for config in configs], dtype=float)[:, None] for key in configs[0]}
+    beta_sq, tau_sq = column["beta"] ** 2, column["tau"] ** 2
+    draw_margin = np.array([[TrueSkill(beta=config["beta"]).ppf((config["draw_probability"] + 1) / 2.)
+                             * math.sqrt(6) * config["beta"]] for config in configs])
+
+    mu = np.repeat(column["mu"], _history["bot_count"], axis=1)
+    var = np.repeat(column["sigma"] ** 2, _history["bot_count"], axis=1)
+    log_loss = np.zeros((len(configs), 1))
+    correct = np.zeros((len(configs), 1))
+    scored = 0
+
+    for m in range(len(blue)):
+        bots = np.concatenate([blue[m], orange[m]])
+        match_mu, match_var = mu[:, bots], var[:, bots]
+        blue_won = blue_goals[m] > orange_goals[m]
+
+        # Predict the winner
+        if blue_goals[m] != orange_goals[m]:
+            diff = match_mu[:, :3].sum(axis=1, keepdims=True) - match_mu[:, 3:].sum(axis=1, keepdims=True)
+            p_blue = cdf(diff / np.sqrt(6 * beta_sq + match_var.sum(axis=1, keepdims=True)))
+            p_winner = np.clip(p_blue if blue_won else 1 - p_blue, 1e-12, 1.)
+            log_loss -= np.log(p_winner)
+            correct += p_winner > 0.5
+            scored += 1
+
+        # Update, once for the win and once for every GOALS_PER_EXTRA_WIN goals of lead
+        sign = np.array([1.] * 3 + [-1.] * 3) * (1 if blue_won else -1)
+        repetitions = 1 + abs(int(blue_goals[m]) - int(orange_goals[m])) // column["goals_per_extra_win"].astype(int)
+        for r in range(int(repetitions.max())):
+            match_var_tau = match_var + tau_sq
+            c_sq = match_var_tau.sum(axis=1, keepdims=True) + 6 * beta_sq
+            c = np.sqrt(c_sq)
+            x = (match_mu * sign).sum(axis=1, keepdims=True) / c - draw_margin / c
+            denom = cdf(x)
+            v = np.where(denom > 0, pdf(x) / np.maximum(denom, 1e-300), -x)
+            w = np.clip(v * (v + x), 0., 1.)
+            active = repetitions > r
+            match_mu = np.where(active, match_mu + sign * match_var_tau / c * v, match_mu)
+            match_var = np.where(active, match_var_tau * (1 - match_var_tau / c_sq * w), match_var)
+
+        mu[:, bots], var[:, bots] = match_mu, match_var
+
+    return np.hstack([log_loss, correct]) / max(scored, 1)
+
+
+def search_rating_parameters(ld: LeagueDir, processes: int = os.cpu_count()) -> List[dict]:
+    """
+    Score all configurations of the rating grid on the history of the league, using a process pool. The results are
+    written to `stats/rating_grid.csv` and returned sorted by log-loss.
+    """
+    index = MatchIndex.current(ld)
+    registry = BotRegistry.ensure(ld, index.bots)
+    configs = [dict(zip(RATING_GRID.keys(), values)) for values in itertools.product(*RATING_GRID.values())]
+    current = dict(TRUESKILL_PARAMETERS, goals_per_extra_win=GOALS_PER_EXTRA_WIN)
+    if current not in configs:
+        configs.append(current)
+
+    # Every process replays the history once for a chunk of the configurations
+    chunk_size = math.ceil(len(configs) / processes)
+    chunks = [configs[i:i + chunk_size] for i in range(0, len(configs), chunk_size)]
+    print(f"Replaying {len(index)} matches with {len(configs)} configurations on {processes} processes ...")
+    start = time.perf_counter()
+    slots = index.slots(registry)
+    history = (slots[:, :3], slots[:, 3:], index.blue_goals, index.orange_goals, len(registry))
+    with ProcessPoolExecutor(processes, initializer=_set_history, initargs=history) as pool:
+        scores = np.vstack(list(pool.map(replay, chunks)))
+    print(f"Done in {time.perf_counter() - start:.1f} s\n")
+
+    results = [dict(config, log_loss=float(loss), accuracy=float(accuracy), current=config == current)
+               for config, (loss, accuracy) in zip(configs, scores)]
+    results.sort(key=lambda result: result["log_loss"])
+
+    ld.stats.mkdir(exist_ok=True)
+    with atomic_write(ld.stats_rating_grid, 'w', newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
+    return results
+
+
+def print_rating_grid(ld: LeagueDir, processes: int = os.cpu_count()):
+    results = search_rating_parameters(ld, processes)
+    print(f"{'':2}{'mu': >6} {'sigma': >6} {'beta': >6} {'tau': >6} {'draw': >5} {'goals': >5} "
+          f"{'log-loss': >9} {'accuracy': >9}")
+    for rank, result in enumerate(results):
+        if rank < TOP_N or result["current"]:
+            marker = "* " if result["current"] else "  "
+            print(f"{marker}{result['mu']: >6.2f} {result['sigma']: >6.2f} {result['beta']: >6.2f} "
+                  f"{result['tau']: >6.3f} {result['draw_probability']: >5.2f} {result['goals_per_extra_win']: >5} "
+                  f"{result['log_loss']: >9.4f} {result['accuracy']: >9.3f}")
+    print(f"\n* current configuration. All {len(results)} configurations were written to '{ld.stats_rating_grid}'")
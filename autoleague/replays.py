@@ -1,11 +1,13 @@
-from dataclasses import dataclass
+import threading
+import time
+from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 import requests
 from rlbottraining.history.metric import Metric
-from watchdog.events import LoggingEventHandler
+from watchdog.events import PatternMatchingEventHandler
 from watchdog.observers import Observer
 
 
@@ -28,9 +30,12 @@ class ReplayData:
 
 
 def parse_replay_id(replay_path: Path) -> str:
-    replay_id, extension = replay_path.name.split('.')
-    assert extension == 'replay'
-    return replay_id
+    assert replay_path.suffix == '.replay'
+    return replay_path.stem
+
+
+# A replay is complete when its size has not changed for this many seconds, unless it was closed or moved before
+REPLAY_SETTLE_SECONDS = 1.0
 
 
 @dataclass
@@ -40,7 +45,13 @@ class ReplayMonitor(Metric):
 
     replay_path: Path = None
     replay_id: str = None
-    observer: Observer = None
+    start_time: float = None
+
+    # The replay that is being written, its last seen size, and when that size was seen
+    pending_path: Path = None
+    pending_size: int = -1
+    pending_since: float = 0.
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
 
     def to_json(self) -> Dict[str, Any]:
         return {
@@ -55,35 +66,122 @@ class ReplayMonitor(Metric):
         )
 
     def ensure_monitoring(self):
-        if self.observer is not None:
+        if self.start_time is not None:
             return
-        replay_monitor = self
-        class SetReplayId(LoggingEventHandler):
-            def on_modified(set_replay_id_self, event):
-                if event.is_directory: return
-                assert event.src_path.endswith('.replay')
-                nonlocal replay_monitor
-                replay_path = Path(event.src_path)
-                if replay_monitor.replay_preference == ReplayPreference.CALCULATED_GG:
-                    upload_to_calculated_gg(replay_path)
-                replay_monitor.replay_id = parse_replay_id(replay_path)
-                replay_monitor.replay_path = replay_path
-
-            def on_created(self, event):
-                pass
-            def on_deleted(self, event):
-                pass
-            def on_moved(self, event):
-                pass
+        self.start_time = time.time()
+        ReplayDirObserver.shared().add(self)
 
+    def stop_monitoring(self):
+        ReplayDirObserver.shared().remove(self)
+
+    def on_replay_written(self, replay_path: Path):
+        """
+        Called when a replay is created or modified while this monitor is active. Rocket League may still be writing
+        it, so it is only used once `check_pending` finds that it stopped changing, or once it is closed.
+        """
+        with self.lock:
+            if self.replay_path == replay_path:
+                return
+            self.pending_path = replay_path
+            self.pending_size = -1
+            self.pending_since = time.time()
+
+    def check_pending(self):
+        """
+        Complete the pending replay if its size has not changed for REPLAY_SETTLE_SECONDS.
+        """
+        with self.lock:
+            replay_path = self.pending_path
+            if replay_path is None:
+                return
+            try:
+                size = replay_path.stat().st_size
+            except OSError:
+                return
+            now = time.time()
+            if size != self.pending_size:
+                self.pending_size = size
+                self.pending_since = now
+                return
+            if size == 0 or now - self.pending_since < REPLAY_SETTLE_SECONDS:
+                return
+        self.on_replay_complete(replay_path)
+
+    def on_replay_complete(self, replay_path: Path):
+        """
+        Called when a replay is completely written. The replay is uploaded, if preferred, before its id is set.
+        """
+        with self.lock:
+            if self.replay_path == replay_path:
+                return
+            self.replay_path = replay_path
+            if self.pending_path == replay_path:
+                self.pending_path = None
+        if self.replay_preference == ReplayPreference.CALCULATED_GG:
+            upload_to_calculated_gg(replay_path)
+        self.replay_id = parse_replay_id(replay_path)
+
+
+class ReplayDirObserver(PatternMatchingEventHandler):
+    """
+    Watches the replay directory for new replays and routes them to the active ReplayMonitor.
+    A single observer is started the first time it is needed and then shared by all matches for the rest
+    of the session, so matches do not pay for starting and stopping a watchdog observer.
+    """
+
+    _shared: Optional['ReplayDirObserver'] = None
+
+    def __init__(self):
+        super().__init__(patterns=['*.replay'], ignore_directories=True)
+        self.monitors: List[ReplayMonitor] = []
+        self.lock = threading.Lock()
         self.observer = Observer()
         self.observer.daemon = True
-        self.observer.schedule(SetReplayId(), str(get_replay_dir()), recursive=True)
+        # Rocket League writes replays directly into the replay directory, so we don't watch sub directories
+        self.observer.schedule(self, str(get_replay_dir()), recursive=False)
         self.observer.start()
 
-    def stop_monitoring(self):
-        self.observer.stop()
-        self.observer.join(1)
+    @staticmethod
+    def shared() -> 'ReplayDirObserver':
+        if ReplayDirObserver._shared is None:
+            ReplayDirObserver._shared = ReplayDirObserver()
+        return ReplayDirObserver._shared
+
+    def add(self, monitor: ReplayMonitor):
+        with self.lock:
+            self.monitors.append(monitor)
+
+    def remove(self, monitor: ReplayMonitor):
+        with self.lock:
+            if monitor in self.monitors:
+                self.monitors.remove(monitor)
+
+    def current(self) -> Optional[ReplayMonitor]:
+        """
+        The monitor of the match that is currently running, i.e. the most recently started active monitor.
+        Monitors are only active while their match is running.
+        """
+        with self.lock:
+            return max(self.monitors, key=lambda m: m.start_time) if self.monitors else None
+
+    def on_modified(self, event):
+        monitor = self.current()
+        if monitor is not None:
+            monitor.on_replay_written(Path(event.src_path))
+
+    def on_created(self, event):
+        self.on_modified(event)
+
+    def on_closed(self, event):
+        monitor = self.current()
+        if monitor is not None:
+            monitor.on_replay_complete(Path(event.src_path))
+
+    def on_moved(self, event):
+        # Some programs write to a temporary file and rename it afterwards
+        monitor = self.current()
+        if monitor is not None and event.dest_path.endswith('.replay'):
+            monitor.on_replay_complete(Path(event.dest_path))
 
 
 def get_replay_dir() -> Path:
@@ -0,0 +1,47 @@
+// Calls `callback` with the parsed content of the given overlay data file (e.g. "summary.json") when it changes.
+// When the overlay is served by the overlay server (`autoleague overlay serve`), updates are pushed to the
+// page using Server-Sent Events. Otherwise, e.g. when the page is opened as a local file, the file is polled.
+
+const liveSubscribers = {};
+let liveEvents = null;
+
+function subscribeJson(name, callback, pollInterval = 2000) {
+    let previous = null;
+
+    function update(data) {
+        const comparisonString = JSON.stringify(data);
+        if (comparisonString !== previous) {
+            previous = comparisonString;
+            callback(data);
+        }
+    }
+
+    function fetchFile() {
+        $.get(name, function (json) {
+            if (typeof json === 'string') {
+                update(JSON.parse(json));
+            } else {
+                // In normal browsers (not OBS), json is already an object and not a string.
+                update(json);
+            }
+        });
+    }
+
+    fetchFile();
+
+    if (window.location.protocol.startsWith("http") && window.EventSource) {
+        liveSubscribers[name] = liveSubscribers[name] || [];
+        liveSubscribers[name].push(update);
+        if (liveEvents == null) {
+            liveEvents = new EventSource("/events");
+            liveEvents.onmessage = function (event) {
+                const message = JSON.parse(event.data);
+                for (let subscriber of liveSubscribers[message.name] || []) {
+                    subscriber(message.data);
+                }
+            };
+        }
+    } else {
+        setInterval(fetchFile, pollInterval);
+    }
+}
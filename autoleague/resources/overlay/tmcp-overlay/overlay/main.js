@@ -1,5 +1,7 @@
 const POLL_INTERVAL = 200;
 const JSON_PATH = 'data.json';
+// The name of the data file when published to the overlay server
+const PUBLISHED_NAME = 'tmcp-overlay/overlay/data.json';
 const ICONS = {
     "BALL": "⚽",
     "BOOST": "⛽",
@@ -17,8 +19,8 @@ const app = new Vue({
     methods: {
         async loadData() {
             try {
-                const res = await $.get("data.json");
-                this.info = JSON.parse(res);
+                const res = await $.get(JSON_PATH);
+                this.info = typeof res === 'string' ? JSON.parse(res) : res;
             } catch (err) {
                 console.error(err);
                 this.info = {
@@ -40,6 +42,17 @@ const app = new Vue({
     },
     created: function() {
         this.loadData();
-        setInterval(this.loadData, POLL_INTERVAL);
+        if (window.location.protocol.startsWith("http") && window.EventSource) {
+            // Served by the overlay server, which pushes updates
+            const events = new EventSource("/events");
+            events.onmessage = event => {
+                const message = JSON.parse(event.data);
+                if (message.name === PUBLISHED_NAME) {
+                    this.info = message.data;
+                }
+            };
+        } else {
+            setInterval(this.loadData, POLL_INTERVAL);
+        }
     }
 });
\ No newline at end of file
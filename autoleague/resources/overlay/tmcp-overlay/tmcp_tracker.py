@@ -1,4 +1,5 @@
-import json
+import sys
+import time
 from typing import List, Optional
 from pathlib import Path
 
@@ -9,6 +10,16 @@ from rlbot.matchcomms.client import MatchcommsClient
 from rlbot.agents.base_script import BaseScript
 from rlbot.utils.structures.game_data_struct import GameTickPacket
 
+# RLBot runs this script on its own, so we make AutoLeague's modules importable
+sys.path.insert(0, str(Path(__file__).absolute().parents[3]))
+from overlay_server import CoalescingWriter
+
+# The name of the data file when published to the overlay server
+PUBLISHED_NAME = "tmcp-overlay/overlay/data.json"
+
+# Seconds between log messages about the time spent per tick
+TICK_REPORT_INTERVAL = 60
+
 
 class TMCPHandler(TMCPHandlerForBots):
     def __init__(self, matchcomms: MatchcommsClient):
@@ -31,11 +42,18 @@ class TMCPOverlay(BaseScript):
         self.tmcp_handler = TMCPHandler(self.matchcomms)
         self.action_cache: List[dict] = {}
         self.data_path = Path(__file__).parent / "overlay" / "data.json"
+        self.writer = CoalescingWriter(self.data_path, PUBLISHED_NAME)
         self.__last_active = False
 
     def run(self):
+        tick_count = 0
+        tick_time_total = 0.0
+        tick_time_max = 0.0
+        last_report = time.monotonic()
+
         while True:
             packet: GameTickPacket = self.wait_game_tick_packet()
+            tick_start = time.perf_counter()
             new_messages: List[dict] = self.tmcp_handler.recv()
 
             for message in new_messages:
@@ -57,18 +75,32 @@ class TMCPOverlay(BaseScript):
                 self.__last_active = packet.game_info.is_round_active
 
                 data = {
-                    "actions": self.action_cache,
+                    # The action cache is copied, since it is modified while the writer may be writing it
+                    "actions": dict(self.action_cache),
                     "active": packet.game_info.is_round_active,
                     "names": [car.name for car in packet.game_cars[:packet.num_cars]],
                 }
+                self.writer.submit(data)
 
-                try:
-                    with open(self.data_path, "w") as file:
-                        json.dump(data, file, indent=4)
-                except Exception:
-                    pass
+            # Measure the time spent handling the tick
+            tick_time = time.perf_counter() - tick_start
+            tick_count += 1
+            tick_time_total += tick_time
+            tick_time_max = max(tick_time_max, tick_time)
+            if time.monotonic() - last_report >= TICK_REPORT_INTERVAL:
+                self.logger.info(f"Tick handling: avg {1000 * tick_time_total / tick_count:.3f} ms, "
+                                 f"max {1000 * tick_time_max:.3f} ms over {tick_count} ticks. "
+                                 f"Wrote {self.writer.written_count} of {self.writer.submitted_count} updates.")
+                tick_count = 0
+                tick_time_total = 0.0
+                tick_time_max = 0.0
+                last_report = time.monotonic()
 
 
 if __name__ == "__main__":
     script = TMCPOverlay()
-    script.run()
+    try:
+        script.run()
+    finally:
+        # The latest data is written, even if it arrived just before the script was stopped
+        script.writer.stop()
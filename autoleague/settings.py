@@ -1,7 +1,12 @@
 import json
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from rlbot.setup_manager import RocketLeagueLauncherPreference
+from storage import atomic_write
+
+# rlbot is slow to import, so it is only imported when launching Rocket League
+if TYPE_CHECKING:
+    from rlbot.setup_manager import RocketLeagueLauncherPreference
 
 
 class PersistentSettings:
@@ -15,7 +20,8 @@ class PersistentSettings:
         self.league_dir_raw = None
         self.platform_preference = "steam"
 
-    def launcher(self) -> RocketLeagueLauncherPreference:
+    def launcher(self) -> 'RocketLeagueLauncherPreference':
+        from rlbot.setup_manager import RocketLeagueLauncherPreference
         if self.platform_preference == "steam":
             return RocketLeagueLauncherPreference(RocketLeagueLauncherPreference.STEAM, False)
         else:
@@ -23,7 +29,7 @@ class PersistentSettings:
 
     def save(self):
         path = Path(__file__).absolute().parent / 'settings.json'
-        with open(path, 'w') as f:
+        with atomic_write(path, 'w') as f:
             json.dump(self.__dict__, f, indent=4)
 
     @classmethod
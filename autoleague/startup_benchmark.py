@@ -0,0 +1,137 @@
+"""
+Measures the import time of autoleague commands using `python -X importtime` and compares it to a budget per
+command. Commands are run against a temporary, empty league, and overlay data is written to a temporary directory
+instead of being published, so the benchmark never touches the real league or overlay. The bot index of the league
+is built before measuring, so no command pays for building it. Exits with status 1 if any command exceeds its budget.
+
+Usage:
+    python startup_benchmark.py [repetitions]
+"""
+
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+# Import time budgets in milliseconds. Commands which are scripted by e.g. a stream controller must start quickly.
+# Commands that need rlbot, numpy, or matplotlib are not listed, since their import time is dominated by those.
+BUDGETS_MS = {
+    "help": 80,
+    "ticket get skybot": 80,
+    "ticket list": 80,
+    "retirement list": 80,
+    "rank list": 80,
+    "bot list": 80,
+    "summary": 150,
+    "csvs generate": 150,
+    "match list": 150,
+    "stats timing": 150,
+}
+
+AUTOLEAGUE_DIR = Path(__file__).absolute().parent
+
+# Runs a command against the league directory given as the first argument, writing overlay data to the directory
+# given as the second argument. `publish` is replaced when overlay_server is imported, so its import is still measured.
+RUNNER = """
+import sys
+from pathlib import Path
+sys.path.insert(0, {autoleague_dir!r})
+
+
+class StubPublish:
+    def find_spec(self, name, path=None, target=None):
+        if name != "overlay_server":
+            return None
+        sys.meta_path.remove(self)
+        for finder in sys.meta_path:
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                exec_module = spec.loader.exec_module
+
+                def exec_and_stub(module):
+                    exec_module(module)
+                    module.publish = lambda *args, **kwargs: False
+                spec.loader.exec_module = exec_and_stub
+                return spec
+
+
+sys.meta_path.insert(0, StubPublish())
+import autoleague
+from paths import LeagueDir, PackageFiles
+overlay_dir = Path(sys.argv[2])
+PackageFiles.overlay_current_match = overlay_dir / "current_match.json"
+PackageFiles.overlay_summary = overlay_dir / "summary.json"
+PackageFiles.overlay_logos = overlay_dir / "logos"
+PackageFiles.overlay_logo_index = overlay_dir / "logos" / "index.json"
+autoleague.require_league_dir = lambda: LeagueDir(Path(sys.argv[1]))
+autoleague.RankingSystem.setup()
+autoleague.parse_args(sys.argv[3:])
+"""
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """
+    Returns the cumulative import time in microseconds of each top level import in the output of -X importtime.
+    """
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            imports[name.strip()] = int(cumulative)
+    return imports
+
+
+def interpreter_imports() -> Set[str]:
+    """
+    Returns the modules imported by the interpreter itself, e.g. by `site`.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"], capture_output=True, text=True)
+    return set(parse_importtime(result.stderr).keys())
+
+
+def measure(command: List[str], league_dir: Path, overlay_dir: Path,
+            baseline: Set[str]) -> Tuple[float, float, List[Tuple[str, int]]]:
+    """
+    Runs the command and returns the import time in ms, the wall time in ms, and the slowest top level imports.
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", RUNNER.format(autoleague_dir=str(AUTOLEAGUE_DIR)),
+         str(league_dir), str(overlay_dir)] + command,
+        capture_output=True, text=True, stdin=subprocess.DEVNULL, cwd=str(AUTOLEAGUE_DIR))
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"'{' '.join(command)}' failed:\n{result.stderr[-2000:]}")
+    imports = {name: us for name, us in parse_importtime(result.stderr).items() if name not in baseline}
+    slowest = sorted(imports.items(), key=lambda item: -item[1])[:3]
+    return sum(imports.values()) / 1000, wall_ms, slowest
+
+
+def run_benchmark(repetitions: int = 3) -> bool:
+    """
+    Measure all commands with a budget and print a table. Returns true if all commands are within budget.
+    The minimum of the repetitions is used, since it is the least affected by noise.
+    """
+    baseline = interpreter_imports()
+    all_within_budget = True
+    with tempfile.TemporaryDirectory() as league_dir, tempfile.TemporaryDirectory() as overlay_dir:
+        measure(["bot", "list"], Path(league_dir), Path(overlay_dir), baseline)
+        print(f"{'command': <22} {'import ms': >10} {'wall ms': >8} {'budget': >7}  slowest imports")
+        for command, budget in BUDGETS_MS.items():
+            runs = [measure(command.split(), Path(league_dir), Path(overlay_dir), baseline) for _ in range(repetitions)]
+            import_ms = min(run[0] for run in runs)
+            wall_ms = min(run[1] for run in runs)
+            slowest = ", ".join(f"{name} {us / 1000:.0f}" for name, us in runs[-1][2])
+            status = "" if import_ms <= budget else "  OVER BUDGET"
+            all_within_budget &= import_ms <= budget
+            print(f"{command: <22} {import_ms: >10.1f} {wall_ms: >8.0f} {budget: >7}  {slowest}{status}")
+    return all_within_budget
+
+
+if __name__ == '__main__':
+    ok = run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,536 @@
+import csv
+import json
+import os
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from bots import BotID
+from leaguesettings import LeagueSettings
+from match import MatchDetails
+from match_cache import MatchCache
+from paths import LeagueDir
+from ranking_system import RankingSystem
+from storage import atomic_write
+
+
+def match_arrays(matches: List[MatchDetails], bots: List[BotID]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns the participants of the given matches as arrays of bot indices with shape (matches, 3) for blue and
+    orange, and a boolean array telling whether blue won each match. Bots not in `bots` get the index -1.
+    """
+    index = {bot: i for i, bot in enumerate(bots)}
+    blue = np.array([[index.get(bot, -1) for bot in match.blue] for match in matches], dtype=np.int64).reshape(-1, 3)
+    orange = np.array([[index.get(bot, -1) for bot in match.orange] for match in matches], dtype=np.int64).reshape(-1, 3)
+    blue_won = np.array([match.result.blue_goals > match.result.orange_goals for match in matches], dtype=bool)
+    return blue, orange, blue_won
+
+
+def match_goals(matches: List[MatchDetails]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the goals scored by blue and orange in the given matches as arrays.
+    """
+    blue_goals = np.array([match.result.blue_goals for match in matches], dtype=np.int64)
+    orange_goals = np.array([match.result.orange_goals for match in matches], dtype=np.int64)
+    return blue_goals, orange_goals
+
+
+def pair_sums(rows: np.ndarray, cols: np.ndarray, weights: np.ndarray, bot_count: int) -> np.ndarray:
+    """
+    Returns a matrix where entry (i, j) is the sum of the weights of the pairs (i, j) given by `rows` and `cols`.
+    """
+    pairs = rows.ravel() * bot_count + cols.ravel()
+    sums = np.bincount(pairs, weights=weights.ravel(), minlength=bot_count * bot_count)
+    return np.rint(sums).astype(np.int64).reshape(bot_count, bot_count)
+
+
+def win_matrix(blue: np.ndarray, orange: np.ndarray, blue_won: np.ndarray, bot_count: int) -> np.ndarray:
+    """
+    Returns a matrix where entry (i, j) is the number of times bot i won a match with bot j as an opponent.
+    Each match contributes its 9 winner-loser pairs in a single vectorized pass.
+    """
+    winners = np.where(blue_won[:, None], blue, orange)
+    losers = np.where(blue_won[:, None], orange, blue)
+    rows = np.repeat(winners, 3, axis=1).ravel()
+    cols = np.tile(losers, (1, 3)).ravel()
+    valid = (rows >= 0) & (cols >= 0)
+    pairs = rows[valid] * bot_count + cols[valid]
+    return np.bincount(pairs, minlength=bot_count * bot_count).reshape(bot_count, bot_count)
+
+
+def win_rate_matrix(wins: np.ndarray) -> np.ndarray:
+    """
+    Returns a matrix where entry (i, j) is the fraction of the matches against bot j that bot i won.
+    Pairs of bots that have never played against each other are NaN.
+    """
+    games = wins + wins.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(games > 0, wins / games, np.nan)
+
+
+def sigmoid_win_matrix(wins: np.ndarray) -> np.ndarray:
+    """
+    Returns a matrix where entry (i, j) is 2 * sigmoid(wins of i over j - wins of j over i) - 1.
+    """
+    return 2.0 / (1.0 + np.exp(-(wins - wins.T))) - 1.0
+
+
+def write_matrix_csv(path, matrix: np.ndarray, bots: List[BotID]):
+    with atomic_write(path, 'w', newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["bot"] + bots)
+        for bot, row in zip(bots, matrix):
+            writer.writerow([bot] + ["" if np.isnan(value) else value for value in row.tolist()])
+
+
+def write_win_matrices(ld: LeagueDir, png: bool = False):
+    """
+    Compute the head-to-head win matrix and win rate matrix of all bots and write them to the stats directory
+    as csv and npy files. Bots are ordered by MMR. Optionally also render the matrices as png images.
+    """
+    from bot_registry import BotRegistry
+    from match_index import MatchIndex
+
+    ranks = RankingSystem.load(ld)
+    bots = sorted(ranks.ratings.keys(), key=lambda bot: -ranks.get_mmr(bot))
+    index = MatchIndex.current(ld)
+    registry = BotRegistry.ensure(ld, index.bots + bots)
+
+    # Count the wins of all registered bots, then pick the rows and columns of the rated bots in order of MMR
+    slots = index.slots(registry)
+    all_wins = win_matrix(slots[:, :3], slots[:, 3:], index.blue_goals > index.orange_goals, len(registry))
+    order = registry.ids(bots)
+    wins = all_wins[np.ix_(order, order)]
+    win_rate = win_rate_matrix(wins)
+
+    ld.stats.mkdir(exist_ok=True)
+    write_matrix_csv(ld.stats_win_matrix.with_suffix(".csv"), wins, bots)
+    write_matrix_csv(ld.stats_win_rate_matrix.with_suffix(".csv"), win_rate, bots)
+    with atomic_write(ld.stats_win_matrix.with_suffix(".npy"), 'wb') as f:
+        np.save(f, wins)
+    with atomic_write(ld.stats_win_rate_matrix.with_suffix(".npy"), 'wb') as f:
+        np.save(f, win_rate)
+
+    if png:
+        plot_matrices(ld, bots, wins, win_rate)
+
+
+def plot_matrices(ld: LeagueDir, bots: List[BotID], wins: np.ndarray, win_rate: np.ndarray):
+    """
+    Render the sigmoid win matrix and the win rate matrix as png images. Requires matplotlib, which is
+    used without a display, so it works on headless machines too.
+    """
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        from matplotlib.colors import ListedColormap
+    except ImportError:
+        print("Install matplotlib to render the matrices as images.")
+        return
+
+    n = len(bots)
+
+    # Red for losses, green for wins
+    sigmoid_cmap = ListedColormap([[max(1.0 - i / 128, 0) ** 1.5, max(-1.0 + i / 128, 0) ** 1.5, 0, 1] for i in range(256)])
+    # Pairs that have never met are black
+    rate_cmap = plt.get_cmap("RdYlGn", 256).copy()
+    rate_cmap.set_bad("black")
+
+    for matrix, cmap, title, path in [
+        (sigmoid_win_matrix(wins), sigmoid_cmap, "Sigmoid wins matrix", ld.stats_win_matrix.with_suffix(".png")),
+        (np.ma.masked_invalid(win_rate), rate_cmap, "Win rate matrix", ld.stats_win_rate_matrix.with_suffix(".png")),
+    ]:
+        fig = plt.figure(figsize=(10.0, 10.0))
+        plt.imshow(matrix, cmap=cmap)
+        plt.xticks(ticks=range(n), labels=bots, rotation=90)
+        plt.yticks(ticks=range(n), labels=bots)
+        plt.colorbar()
+        plt.title(title)
+        plt.tight_layout()
+        with atomic_write(path, 'wb') as f:
+            fig.savefig(f, format="png")
+        plt.close(fig)
+
+
+# The ordered pairs of team slots (teammates) and the pairs of blue and orange slots (opponents)
+TEAMMATE_SLOTS = [(a, b) for a in range(3) for b in range(3) if a != b]
+OPPONENT_SLOTS = [(a, b) for a in range(3) for b in range(3)]
+
+
+@dataclass
+class PairStats:
+    """
+    How bot A did with bot B as a teammate and against bot B as an opponent. Goal differentials are from A's view.
+    """
+    with_games: int = 0
+    with_wins: int = 0
+    with_goal_diff: int = 0
+    vs_games: int = 0
+    vs_wins: int = 0
+    vs_goal_diff: int = 0
+
+
+class PairIndex(MatchCache):
+    """
+    Pairwise statistics of all bots. For each ordered pair of bots (a, b) we count the matches, wins, and goal
+    differential of a with b as teammate and of a against b as opponent. The matrices are saved compactly as
+    `pair_index.npz` in the league directory, so lookups only read the matches saved since.
+    """
+    FIELDS = ["with_games", "with_wins", "with_goal_diff", "vs_games", "vs_wins", "vs_goal_diff"]
+
+    def __init__(self, bots: List[BotID] = None):
+        super().__init__()
+        self.bots: List[BotID] = list(bots or [])
+        self.index: Dict[BotID, int] = {bot: i for i, bot in enumerate(self.bots)}
+        n = len(self.bots)
+        self.matrices: Dict[str, np.ndarray] = {name: np.zeros((n, n), dtype=np.int64) for name in PairIndex.FIELDS}
+
+    def get(self, a: BotID, b: BotID) -> PairStats:
+        """
+        Returns the statistics of bot a with and against bot b.
+        """
+        if a not in self.index or b not in self.index:
+            return PairStats()
+        i, j = self.index[a], self.index[b]
+        return PairStats(**{name: int(matrix[i, j]) for name, matrix in self.matrices.items()})
+
+    def _ensure(self, bot: BotID) -> int:
+        if bot not in self.index:
+            self.index[bot] = len(self.bots)
+            self.bots.append(bot)
+            for name, matrix in self.matrices.items():
+                self.matrices[name] = np.pad(matrix, ((0, 1), (0, 1)))
+        return self.index[bot]
+
+    def add_match(self, match: MatchDetails):
+        blue = [self._ensure(bot) for bot in match.blue]
+        orange = [self._ensure(bot) for bot in match.orange]
+        blue_diff = match.result.blue_goals - match.result.orange_goals
+        for team, diff in [(blue, blue_diff), (orange, -blue_diff)]:
+            for a, b in TEAMMATE_SLOTS:
+                self.matrices["with_games"][team[a], team[b]] += 1
+                self.matrices["with_wins"][team[a], team[b]] += diff > 0
+                self.matrices["with_goal_diff"][team[a], team[b]] += diff
+        for team, opponents, diff in [(blue, orange, blue_diff), (orange, blue, -blue_diff)]:
+            for a, b in OPPONENT_SLOTS:
+                self.matrices["vs_games"][team[a], opponents[b]] += 1
+                self.matrices["vs_wins"][team[a], opponents[b]] += diff > 0
+                self.matrices["vs_goal_diff"][team[a], opponents[b]] += diff
+
+    @staticmethod
+    def build(matches: List[MatchDetails]) -> 'PairIndex':
+        """
+        Build the index from the given matches in a single vectorized pass.
+        """
+        pair_index = PairIndex(sorted({bot for match in matches for bot in match.blue + match.orange}))
+        n = len(pair_index.bots)
+        blue, orange, _ = match_arrays(matches, pair_index.bots)
+        blue_goals, orange_goals = match_goals(matches)
+
+        # Stack both teams, so each row is a team, its opponents, and its goal differential
+        teams = np.concatenate([blue, orange])
+        opponents = np.concatenate([orange, blue])
+        diff = np.concatenate([blue_goals - orange_goals, orange_goals - blue_goals])[:, None]
+
+        for prefix, others, slots in [("with", teams, TEAMMATE_SLOTS), ("vs", opponents, OPPONENT_SLOTS)]:
+            rows = teams[:, [a for a, _ in slots]]
+            cols = others[:, [b for _, b in slots]]
+            weights = np.ones_like(rows)
+            pair_index.matrices[f"{prefix}_games"] = pair_sums(rows, cols, weights, n)
+            pair_index.matrices[f"{prefix}_wins"] = pair_sums(rows, cols, weights * (diff > 0), n)
+            pair_index.matrices[f"{prefix}_goal_diff"] = pair_sums(rows, cols, weights * diff, n)
+        return pair_index
+
+    @staticmethod
+    def path(ld: LeagueDir) -> Path:
+        return ld.pair_index
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return dict(bots=np.array(self.bots, dtype=str), **self.matrices)
+
+    @staticmethod
+    def from_arrays(data) -> 'PairIndex':
+        pair_index = PairIndex(data["bots"].tolist())
+        pair_index.matrices = {name: data[name] for name in PairIndex.FIELDS}
+        return pair_index
+
+
+def print_pair_stats(ld: LeagueDir, a: BotID, b: BotID):
+    stats = PairIndex.current(ld).get(a, b)
+    print(f"{a} with {b} as teammate: {stats.with_games} matches, {stats.with_wins} wins, "
+          f"goal differential {stats.with_goal_diff:+}")
+    print(f"{a} against {b}: {stats.vs_games} matches, {stats.vs_wins} wins, "
+          f"goal differential {stats.vs_goal_diff:+}")
+
+
+class RatingHistory:
+    """
+    A compact history of all ratings. Instead of full snapshots, only the changes are stored: for each time a
+    bot's rating changed, the index of the rankings file, the bot, and the new mu and sigma. The history is
+    saved as `rating_history.npz` in the league directory and extended with new rankings files when loaded.
+    """
+    def __init__(self):
+        # Time stamps of the rankings files
+        self.times: List[str] = []
+        self.bots: List[BotID] = []
+        self.snapshot = np.zeros(0, dtype=np.int64)
+        self.bot = np.zeros(0, dtype=np.int64)
+        self.mu = np.zeros(0)
+        self.sigma = np.zeros(0)
+
+    def mmr(self) -> np.ndarray:
+        return np.round(self.mu - self.sigma)
+
+    def extend(self, paths: List[Path]):
+        """
+        Append the changes of the given rankings files, which must be newer than the ones already included.
+        """
+        index = {bot: i for i, bot in enumerate(self.bots)}
+        last = {}
+        for bot, mu, sigma in zip(self.bot.tolist(), self.mu.tolist(), self.sigma.tolist()):
+            last[bot] = (mu, sigma)
+
+        snapshots, bots, mus, sigmas = [], [], [], []
+        for path in paths:
+            ranking = RankingSystem.read(path)
+            for bot_id, rating in ranking.ratings.items():
+                if bot_id not in index:
+                    index[bot_id] = len(self.bots)
+                    self.bots.append(bot_id)
+                bot = index[bot_id]
+                if last.get(bot) != (rating.mu, rating.sigma):
+                    last[bot] = (rating.mu, rating.sigma)
+                    snapshots.append(len(self.times))
+                    bots.append(bot)
+                    mus.append(rating.mu)
+                    sigmas.append(rating.sigma)
+            self.times.append(path.name[:14])
+
+        self.snapshot = np.concatenate([self.snapshot, np.array(snapshots, dtype=np.int64)])
+        self.bot = np.concatenate([self.bot, np.array(bots, dtype=np.int64)])
+        self.mu = np.concatenate([self.mu, np.array(mus, dtype=float)])
+        self.sigma = np.concatenate([self.sigma, np.array(sigmas, dtype=float)])
+
+    def save(self, ld: LeagueDir):
+        with atomic_write(ld.rating_history, 'wb') as f:
+            np.savez_compressed(f, times=np.array(self.times, dtype=str), bots=np.array(self.bots, dtype=str),
+                                snapshot=self.snapshot, bot=self.bot, mu=self.mu, sigma=self.sigma)
+
+    @staticmethod
+    def load(ld: LeagueDir) -> 'RatingHistory':
+        """
+        Loads the rating history and adds the rankings files newer than the saved history. The history is
+        rebuilt from all rankings files, if the saved history includes rankings which have been undone.
+        """
+        paths = sorted(ld.rankings.glob("*.json"))
+        times = [path.name[:14] for path in paths]
+
+        history = RatingHistory()
+        if ld.rating_history.exists():
+            with np.load(ld.rating_history) as data:
+                history.times = data["times"].tolist()
+                history.bots = data["bots"].tolist()
+                history.snapshot = data["snapshot"]
+                history.bot = data["bot"]
+                history.mu = data["mu"]
+                history.sigma = data["sigma"]
+            if history.times != times[:len(history.times)]:
+                history = RatingHistory()
+
+        if len(history.times) < len(paths):
+            RankingSystem.setup()
+            history.extend(paths[len(history.times):])
+            history.save(ld)
+        return history
+
+
+# Granularities of MMR series
+GRANULARITIES = ["match", "day", "week", "season"]
+
+# Number of periods of the MMR series processed at a time, which bounds the memory used
+MMR_SERIES_CHUNK_SIZE = 1024
+
+
+def period_labels(times: List[str], granularity: str, season_starts: List[str]) -> List[str]:
+    """
+    Returns the label of the period of each time stamp. Seasons are labeled by the time stamp they start at.
+    """
+    if granularity == "match":
+        return list(times)
+    elif granularity == "day":
+        return [time[:8] for time in times]
+    elif granularity == "week":
+        weeks = {day: "{}-W{:02}".format(*datetime.strptime(day, "%Y%m%d").isocalendar()[:2])
+                 for day in {time[:8] for time in times}}
+        return [weeks[time[:8]] for time in times]
+    elif granularity == "season":
+        starts = sorted(season_starts)
+        return [starts[bisect_right(starts, time) - 1] if bisect_right(starts, time) > 0 else "00000000000000"
+                for time in times]
+    raise ValueError(f"Unknown granularity '{granularity}'")
+
+
+def mmr_series(history: RatingHistory, granularity: str, season_starts: List[str] = ()) \
+        -> Iterator[Tuple[List[str], np.ndarray]]:
+    """
+    Yields the MMR of each bot at the end of each period in chunks of periods. Each chunk is a list of
+    period labels and a matrix with a row for each of those periods and a column for each bot of the history.
+    A bot's MMR is NaN in periods before it got its first rating.
+    """
+    labels = period_labels(history.times, granularity, season_starts)
+    # Map snapshots to the index of their period. Time stamps are sorted, so periods are consecutive.
+    starts_new_period = np.array([i == 0 or labels[i] != labels[i - 1] for i in range(len(labels))], dtype=bool)
+    snapshot_period = np.cumsum(starts_new_period) - 1
+    unique_labels = [label for label, new in zip(labels, starts_new_period) if new]
+
+    periods = snapshot_period[history.snapshot] if len(history.snapshot) > 0 else np.zeros(0, dtype=np.int64)
+    mmr = history.mmr()
+    bot_count = len(history.bots)
+    current = np.full(bot_count, np.nan)
+
+    for first in range(0, len(unique_labels), MMR_SERIES_CHUNK_SIZE):
+        last = min(first + MMR_SERIES_CHUNK_SIZE, len(unique_labels))
+        lo, hi = np.searchsorted(periods, [first, last])
+        # Changes are in chronological order, so assigning them in order keeps the last change in each period
+        chunk = np.full((last - first, bot_count), np.nan)
+        rows = periods[lo:hi] - first
+        keys = rows * bot_count + history.bot[lo:hi]
+        _, last_of_key = np.unique(keys[::-1], return_index=True)
+        last_of_key = hi - lo - 1 - last_of_key
+        chunk[rows[last_of_key], history.bot[lo:hi][last_of_key]] = mmr[lo:hi][last_of_key]
+
+        # Carry MMRs forward into periods where they did not change
+        chunk = np.vstack([current, chunk])
+        filled = np.where(np.isnan(chunk), 0, np.arange(len(chunk))[:, None])
+        np.maximum.accumulate(filled, axis=0, out=filled)
+        chunk = chunk[filled, np.arange(bot_count)][1:]
+        current = chunk[-1] if len(chunk) > 0 else current
+
+        yield unique_labels[first:last], chunk
+
+
+def write_mmr_series(ld: LeagueDir, granularity: str, file_format: str = "csv") -> Path:
+    """
+    Write the MMR series of all bots at the given granularity ("match", "day", "week", or "season") to the
+    stats directory as a csv file or a npy file. Returns the path of the written file. For npy files, the period
+    labels and bots are written to a json file next to it.
+    """
+    history = RatingHistory.load(ld)
+    season_starts = LeagueSettings.load(ld).season_starts
+    path = (ld.stats / f"mmr_{granularity}").with_suffix(f".{file_format}")
+    ld.stats.mkdir(exist_ok=True)
+
+    if file_format == "csv":
+        with atomic_write(path, 'w', newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["period"] + history.bots)
+            for labels, chunk in mmr_series(history, granularity, season_starts):
+                for label, row in zip(labels, chunk.tolist()):
+                    writer.writerow([label] + ["" if value != value else int(value) for value in row])
+    else:
+        # The matrix is written to a memory mapped file chunk by chunk
+        period_count = len(set(period_labels(history.times, granularity, season_starts)))
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        matrix = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=float, shape=(period_count, len(history.bots)))
+        all_labels = []
+        for labels, chunk in mmr_series(history, granularity, season_starts):
+            matrix[len(all_labels):len(all_labels) + len(labels)] = chunk
+            all_labels += labels
+        matrix.flush()
+        del matrix
+        os.replace(tmp_path, path)
+        with atomic_write(path.with_name(f"{path.stem}_labels.json"), 'w') as f:
+            json.dump({"periods": all_labels, "bots": history.bots}, f)
+    return path
+
+
+class CareerStats(MatchCache):
+    """
+    The career totals of each bot: matches, wins, and the sums of their player scores. The table is saved
+    as `career_stats.npz` in the league directory, so lookups only read the matches saved since.
+    """
+    COLUMNS = ["games", "wins", "points", "goals", "shots", "saves", "assists", "demolitions", "own_goals"]
+    SCORE_COLUMNS = COLUMNS[2:]
+
+    def __init__(self, bots: List[BotID] = None):
+        super().__init__()
+        self.bots: List[BotID] = list(bots or [])
+        self.index: Dict[BotID, int] = {bot: i for i, bot in enumerate(self.bots)}
+        self.table = np.zeros((len(self.bots), len(CareerStats.COLUMNS)), dtype=np.int64)
+
+    def get(self, bot: BotID) -> Dict[str, float]:
+        """
+        Returns the totals of the given bot and the per game averages of its scores.
+        """
+        row = self.table[self.index[bot]] if bot in self.index else np.zeros(len(CareerStats.COLUMNS), dtype=np.int64)
+        stats = {column: int(value) for column, value in zip(CareerStats.COLUMNS, row)}
+        games = max(stats["games"], 1)
+        stats["win_rate"] = stats["wins"] / games
+        for column in CareerStats.SCORE_COLUMNS:
+            stats[f"{column}_per_game"] = stats[column] / games
+        return stats
+
+    @staticmethod
+    def match_rows(match: MatchDetails) -> List[Tuple[BotID, List[int]]]:
+        """
+        Returns the contribution of the given match to the table for each participant.
+        """
+        rows = []
+        for team, won in [(match.blue, match.result.blue_goals > match.result.orange_goals),
+                          (match.orange, match.result.orange_goals > match.result.blue_goals)]:
+            for bot in team:
+                score = match.result.player_scores.get(bot)
+                scores = [getattr(score, column) for column in CareerStats.SCORE_COLUMNS] if score else \
+                    [0] * len(CareerStats.SCORE_COLUMNS)
+                rows.append((bot, [1, int(won)] + scores))
+        return rows
+
+    def add_match(self, match: MatchDetails):
+        for bot, row in CareerStats.match_rows(match):
+            if bot not in self.index:
+                self.index[bot] = len(self.bots)
+                self.bots.append(bot)
+                self.table = np.vstack([self.table, np.zeros((1, len(CareerStats.COLUMNS)), dtype=np.int64)])
+            self.table[self.index[bot]] += row
+
+    @staticmethod
+    def build(matches: List[MatchDetails]) -> 'CareerStats':
+        """
+        Build the table from the given matches. The rows of all participants are summed per bot at once.
+        """
+        rows = [row for match in matches for row in CareerStats.match_rows(match)]
+        career = CareerStats(sorted({bot for bot, _ in rows}))
+        if rows:
+            bot_indices = np.array([career.index[bot] for bot, _ in rows], dtype=np.int64)
+            values = np.array([row for _, row in rows], dtype=np.int64)
+            np.add.at(career.table, bot_indices, values)
+        return career
+
+    @staticmethod
+    def path(ld: LeagueDir) -> Path:
+        return ld.career_stats
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return dict(bots=np.array(self.bots, dtype=str), table=self.table)
+
+    @staticmethod
+    def from_arrays(data) -> 'CareerStats':
+        career = CareerStats(data["bots"].tolist())
+        career.table = data["table"]
+        return career
+
+
+def print_career_stats(ld: LeagueDir, bot: BotID):
+    stats = CareerStats.current(ld).get(bot)
+    if stats["games"] == 0:
+        print(f"'{bot}' has not played any matches")
+        return
+    print(f"{bot}: {stats['games']} matches, {stats['wins']} wins ({100 * stats['win_rate']:.1f}%)")
+    print(f"{'': <12} {'total': >8} {'per game': >9}")
+    for column in CareerStats.SCORE_COLUMNS:
+        print(f"{column: <12} {stats[column]: >8} {stats[column + '_per_game']: >9.2f}")
@@ -0,0 +1,98 @@
+import os
+import stat
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from paths import LeagueDir
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+# Whether atomic writes are flushed to disk before they replace the target file. Only tools writing lots of
+# disposable files, like synthetic_league.py, turn this off.
+FSYNC = True
+
+
+@contextmanager
+def atomic_write(path: Path, mode: str = 'w', **kwargs):
+    """
+    Open a file for writing such that readers never see a partially written file. The content is written
+    to a temporary file in the same directory, which replaces the target file when the `with` block ends.
+    If the block raises, the target file is left untouched. The temporary file ends with `.tmp`, so it is
+    never mistaken for a json file of the league.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with open(fd, mode, **kwargs) as f:
+            yield f
+            if FSYNC:
+                f.flush()
+                os.fsync(f.fileno())
+        # Temporary files are only readable by the owner, so we use the permissions of the file being replaced
+        try:
+            permissions = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            permissions = 0o644
+        os.chmod(tmp_path, permissions)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class LeagueLocked(Exception):
+    """
+    Raised when another autoleague command holds the lock of the league for longer than we are willing to wait.
+    """
+
+
+# Seconds to wait for the lock of the league. Commands only hold it while they change files, which is quick.
+LOCK_TIMEOUT = 10
+
+
+@contextmanager
+def league_lock(ld: LeagueDir, timeout: float = LOCK_TIMEOUT):
+    """
+    Hold the lock of the league directory while the `with` block runs. Commands that change the state of the
+    league take the lock, so concurrent commands can't interleave e.g. saving a match with undoing one.
+    Reading the league never takes the lock, since files are replaced atomically. If the lock isn't released
+    within `timeout` seconds, e.g. because `match coordinate` is running, LeagueLocked is raised.
+    """
+    with open(ld.lock, 'a+') as lock_file:
+        if not _try_lock(lock_file):
+            print("Waiting for another autoleague command to finish ...")
+            deadline = time.monotonic() + timeout
+            while not _try_lock(lock_file):
+                if time.monotonic() > deadline:
+                    raise LeagueLocked(f"Another autoleague command is changing the league (it holds '{ld.lock}'). "
+                                       f"Try again when it has finished.")
+                time.sleep(0.2)
+        try:
+            yield
+        finally:
+            _unlock(lock_file)
+
+
+def _try_lock(lock_file) -> bool:
+    try:
+        if sys.platform == "win32":
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(lock_file):
+    if sys.platform == "win32":
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,190 @@
+"""
+Generates a synthetic league for testing autoleague at scale. The league has fake bot folders with bot configs,
+and matches, rankings, tickets, and retirement written with the same writers as `match run`, so all commands
+work on it. Bots have a hidden strength which decides the results, join the league over time, and some of them
+retire. Matches are played in daily sessions, like a real league.
+
+Usage:
+    python synthetic_league.py <league_dir> [bots] [matches] [seed]
+"""
+
+import math
+import random
+import shutil
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+import storage
+from bots import BotID, fmt_bot_name, save_retired_bots
+from leaguesettings import LeagueSettings
+from match import MatchDetails, MatchResult, PlayerScore
+from match_maker import TicketSystem, MAPS
+from paths import LeagueDir, PackageFiles
+from ranking_system import RankingSystem
+
+# Number of matches played per daily session
+MATCHES_PER_SESSION = 40
+# Time between the start of two matches in a session
+MATCH_INTERVAL = timedelta(minutes=7)
+# Time of the first match
+FIRST_MATCH = datetime(2021, 1, 2, 18, 0, 0)
+# Fraction of the bots which retire at some point
+RETIRE_FRACTION = 0.2
+
+BOT_CONFIG = """[Locations]
+looks_config = ./appearance.cfg
+python_file = ./bot.py
+name = {name}
+
+[Details]
+developer = {developer}
+description = A synthetic bot with strength {strength:.2f}
+fun_fact = This bot has never touched a ball.
+github =
+language = Python
+"""
+
+BOT_PYTHON = """# Synthetic bot generated by synthetic_league.py. It does not play."""
+
+
+@dataclass
+class SyntheticBot:
+    bot_id: BotID
+    # Hidden strength deciding match results. The win chance of a team is logistic in the difference of strength.
+    strength: float
+    # Indices of the first match the bot can play in and the match it retires before (None if never)
+    joins: int
+    retires: Optional[int]
+
+
+def make_bots(ld: LeagueDir, count: int, matches: int, rng: random.Random) -> List[SyntheticBot]:
+    """
+    Create the bot folders and return the bots. Half of the bots (and at least the 6 needed for a match) play from
+    the first match, the rest join over time.
+    """
+    bots = []
+    founders = max(6, count // 2)
+    for i in range(count):
+        name = f"Synth Bot {i:04d}"
+        strength = rng.gauss(0, 1)
+        joins = 0 if i < founders else rng.randrange(matches)
+        retires = None
+        if i >= 6 and rng.random() < RETIRE_FRACTION:
+            retires = rng.randrange(joins, matches) + 1
+        bots.append(SyntheticBot(fmt_bot_name(name), strength, joins, retires))
+
+        folder = ld.bots / fmt_bot_name(name).lower()
+        folder.mkdir(exist_ok=True)
+        with open(folder / "bot.cfg", "w") as f:
+            f.write(BOT_CONFIG.format(name=name, developer=f"Developer {i % 17}", strength=strength))
+        with open(folder / "bot.py", "w") as f:
+            f.write(BOT_PYTHON)
+        shutil.copyfile(PackageFiles.psyonix_appearance, folder / "appearance.cfg")
+    return bots
+
+
+def play_match(blue: List[SyntheticBot], orange: List[SyntheticBot], rng: random.Random) -> MatchResult:
+    """
+    Returns a random result of a match between the two teams. Stronger teams win more often and by more goals.
+    """
+    advantage = sum(bot.strength for bot in blue) - sum(bot.strength for bot in orange)
+    blue_wins = rng.random() < 1 / (1 + math.exp(-advantage))
+    loser_goals = min(rng.randrange(4), rng.randrange(4))
+    winner_goals = loser_goals + 1 + int(rng.expovariate(1 / (1 + abs(advantage))))
+    blue_goals, orange_goals = (winner_goals, loser_goals) if blue_wins else (loser_goals, winner_goals)
+
+    result = MatchResult(blue_goals=blue_goals, orange_goals=orange_goals)
+    for team, goals, conceded in [(blue, blue_goals, orange_goals), (orange, orange_goals, blue_goals)]:
+        scores = {bot.bot_id: PlayerScore() for bot in team}
+        for _ in range(goals):
+            scorer, assister = rng.sample(team, 2)
+            scores[scorer.bot_id].goals += 1
+            if rng.random() < 0.6:
+                scores[assister.bot_id].assists += 1
+        for bot in team:
+            score = scores[bot.bot_id]
+            score.shots = score.goals + rng.randrange(4)
+            score.saves = rng.randrange(conceded + 3)
+            score.demolitions = rng.randrange(3)
+            score.own_goals = 1 if rng.random() < 0.01 else 0
+            score.points = (100 * score.goals + 50 * score.assists + 20 * score.shots + 50 * score.saves
+                            + 10 * score.demolitions + rng.randrange(200))
+        result.player_scores.update(scores)
+    return result
+
+
+def generate_league(ld: LeagueDir, bot_count: int = 60, match_count: int = 10000, seed: int = 0):
+    """
+    Generate a league with the given number of bots and matches in the (empty) league directory.
+    """
+    if any(ld.matches.glob("*.json")) or any(ld.bots.iterdir()):
+        raise ValueError(f"'{ld.matches.parent}' is not an empty league")
+
+    rng = random.Random(seed)
+    import numpy
+    numpy.random.seed(seed)  # TicketSystem.pick_bots uses numpy
+
+    RankingSystem.setup()
+    bots = make_bots(ld, bot_count, match_count, rng)
+    by_id = {bot.bot_id: bot for bot in bots}
+
+    settings = LeagueSettings()
+    rank_sys = RankingSystem()
+    ticket_sys = TicketSystem()
+    ticket_sys.new_bot_ticket_count = settings.new_bot_ticket_count
+    ticket_sys.ticket_increase_rate = settings.ticket_increase_rate
+    ticket_sys.game_catchup_boost = settings.game_catchup_boost
+
+    # Durability doesn't matter for a synthetic league, and flushing every file to disk dominates the run time
+    storage.FSYNC = False
+    try:
+        session_start = FIRST_MATCH
+        for i in range(match_count):
+            if i > 0 and i % MATCHES_PER_SESSION == 0:
+                # Next session, next day
+                session_start += timedelta(days=1)
+                ticket_sys.session_game_counts = {}
+            if i % MATCHES_PER_SESSION == 0 and not any(s.startswith(str(session_start.year))
+                                                        for s in settings.season_starts):
+                # A season per year
+                settings.season_starts.append(session_start.strftime("%Y%m%d%H%M%S"))
+
+            active = [bot.bot_id for bot in bots if bot.joins <= i and (bot.retires is None or bot.retires > i)]
+            picked = [str(bot) for bot in ticket_sys.pick_bots(active)]
+            ticket_sys.choose(picked, active)
+            rng.shuffle(picked)
+            blue, orange = picked[:3], picked[3:]
+
+            time_stamp = (session_start + (i % MATCHES_PER_SESSION) * MATCH_INTERVAL).strftime("%Y%m%d%H%M%S")
+            match = MatchDetails(time_stamp, "_".join([time_stamp] + blue + ["vs"] + orange), blue, orange,
+                                 rng.choice(MAPS))
+            result = play_match([by_id[bot] for bot in blue], [by_id[bot] for bot in orange], rng)
+            rank_sys.update(match, result)
+            match.result = result
+            match.replay_id = "".join(rng.choice("0123456789ABCDEF") for _ in range(32))
+
+            match.save(ld)
+            rank_sys.save(ld, time_stamp)
+            ticket_sys.save(ld, time_stamp)
+
+        save_retired_bots(ld, {bot.bot_id for bot in bots if bot.retires is not None and bot.retires <= match_count})
+        # The current session is the summary, like after `match run`
+        settings.last_summary = (match_count - 1) % MATCHES_PER_SESSION + 1 if match_count > 0 else 0
+        settings.save(ld)
+    finally:
+        storage.FSYNC = True
+
+
+if __name__ == '__main__':
+    if not 2 <= len(sys.argv) <= 5:
+        print(__doc__)
+        sys.exit(1)
+    Path(sys.argv[1]).mkdir(parents=True, exist_ok=True)
+    league_dir = LeagueDir(Path(sys.argv[1]))
+    start = time.perf_counter()
+    generate_league(league_dir, *[int(arg) for arg in sys.argv[2:]])
+    print(f"Generated league in '{sys.argv[1]}' in {time.perf_counter() - start:.1f} s")
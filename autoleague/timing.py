@@ -0,0 +1,102 @@
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy
+
+from paths import LeagueDir
+
+# The phases of running a match in the order they happen
+PHASES = [
+    "matchmaking",
+    "overlay",
+    "launch",
+    "bot_load",
+    "kickoff_to_end",
+    "replay_wait",
+    "replay_copy",
+    "persistence",
+    "summary",
+]
+
+
+class MatchTimer:
+    """
+    Measures the wall-clock time spent in each phase of running a match. At most one phase is running
+    at a time, so beginning a new phase ends the current one. Time spent in a phase multiple times is
+    accumulated. A monotonic clock is used, so the timings are unaffected by changes to the system clock.
+    """
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+        self.current_phase: Optional[str] = None
+        self._phase_start = 0.0
+
+    def begin(self, phase: str):
+        """
+        End the current phase (if any) and begin the given phase.
+        """
+        self.end()
+        self.current_phase = phase
+        self._phase_start = time.monotonic()
+
+    def end(self):
+        """
+        End the current phase (if any).
+        """
+        if self.current_phase is not None:
+            elapsed = time.monotonic() - self._phase_start
+            self.durations[self.current_phase] = self.durations.get(self.current_phase, 0.0) + elapsed
+            self.current_phase = None
+
+    @contextmanager
+    def phase(self, phase: str):
+        """
+        Time the body of a `with` statement as the given phase.
+        """
+        self.begin(phase)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def save(self, ld: LeagueDir, match_name: str):
+        """
+        Ends the current phase and appends the timings to the match timings file in the league directory.
+        """
+        self.end()
+        with open(ld.match_timings, 'a') as f:
+            f.write(json.dumps({"match": match_name, "durations": self.durations}, sort_keys=True) + "\n")
+
+    @staticmethod
+    def latest(ld: LeagueDir, count: int) -> List[Dict[str, float]]:
+        """
+        Returns the phase durations of the n latest timed matches. All timed matches are returned if n is 0.
+        """
+        if not ld.match_timings.exists():
+            return []
+        with open(ld.match_timings) as f:
+            entries = [json.loads(line)["durations"] for line in f if line.strip()]
+        return entries[-count:] if count > 0 else entries
+
+
+def print_timing_stats(ld: LeagueDir, count: int = 0):
+    """
+    Print percentiles of the time spent in each phase of the n latest timed matches.
+    """
+    timings = MatchTimer.latest(ld, count)
+    if len(timings) == 0:
+        print("No match timings have been recorded yet.")
+        return
+
+    # Unknown phases (e.g. from newer versions) are listed after the known ones
+    phases = PHASES + sorted({phase for durations in timings for phase in durations} - set(PHASES))
+
+    print(f"Phase timings in seconds (latest {len(timings)} matches):")
+    print(f"{'phase': <16} {'count': >6} {'p50': >8} {'p90': >8} {'p99': >8} {'max': >8} {'total': >10}")
+    for phase in phases:
+        values = [durations[phase] for durations in timings if phase in durations]
+        if len(values) == 0:
+            continue
+        p50, p90, p99 = numpy.percentile(values, [50, 90, 99])
+        print(f"{phase: <16} {len(values): >6} {p50: >8.2f} {p90: >8.2f} {p99: >8.2f} {max(values): >8.2f} {sum(values): >10.1f}")
@@ -0,0 +1,64 @@
+import math
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'autoleague'))
+
+from bot_registry import BotRegistry
+from match import MatchDetails
+from match_index import MatchIndex
+from match_maker import TicketSystem
+from paths import LeagueDir
+from ranking_system import RankingSystem
+from synthetic_league import generate_league
+
+
+class TestBotRegistry(unittest.TestCase):
+
+    def test_ids_and_arrays(self):
+        with tempfile.TemporaryDirectory() as temp:
+            ld = LeagueDir(Path(temp))
+            generate_league(ld, 20, 100)
+            rank_sys = RankingSystem.load(ld)
+            ticket_sys = TicketSystem.load(ld, [])
+
+            registry = BotRegistry.ensure(ld)
+            self.assertEqual(sorted(registry.bots), sorted(rank_sys.ratings.keys()))
+            self.assertEqual([registry.id(bot) for bot in registry.bots], list(range(len(registry))))
+
+            # Only `ensure` registers bots. New bots get the next id, and ids survive saving and loading.
+            new_bot = "new_bot"
+            with self.assertRaises(KeyError):
+                registry.id(new_bot)
+            registry = BotRegistry.ensure(ld, [new_bot, registry.bot(0)])
+            self.assertEqual(registry.id(new_bot), len(registry) - 1)
+            loaded = BotRegistry.load(ld)
+            self.assertEqual(loaded.bots, registry.bots)
+
+            # Unregistered bots are left out of the arrays
+            ticket_sys.tickets["unregistered_bot"] = 3.0
+            self.assertNotIn("unregistered_bot", loaded)
+            self.assertEqual(len(ticket_sys.arrays(loaded)[0]), len(loaded))
+
+            mu, sigma = rank_sys.arrays(loaded)
+            for bot, rating in rank_sys.ratings.items():
+                self.assertEqual(mu[loaded.id(bot)], rating.mu)
+                self.assertEqual(sigma[loaded.id(bot)], rating.sigma)
+            self.assertTrue(math.isnan(mu[loaded.id(new_bot)]))
+
+            tickets, game_counts = ticket_sys.arrays(loaded)
+            for bot, count in ticket_sys.tickets.items():
+                if bot in loaded:
+                    self.assertEqual(tickets[loaded.id(bot)], count)
+
+            matches = MatchDetails.all(ld)
+            slots = MatchIndex.ensure(ld).slots(loaded)
+            self.assertEqual(slots.shape, (100, 6))
+            for match, row in zip(matches, slots):
+                self.assertEqual(list(match.slots(loaded)), list(row))
+
+
+if __name__ == '__main__':
+    unittest.main()
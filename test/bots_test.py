@@ -0,0 +1,134 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from zipfile import ZipFile
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'autoleague'))
+
+from bots import BotIndex, BotConfigs, unzip_all_bots
+from paths import LeagueDir
+
+BOT_CONFIG = """[Locations]
+looks_config = ./looks.cfg
+python_file = bot.py
+name = Test Bot
+
+[Details]
+developer = Tester
+"""
+
+
+class TestBotIndex(unittest.TestCase):
+
+    def test_logo_is_looked_up_when_needed(self):
+        with tempfile.TemporaryDirectory() as temp:
+            config_path = Path(temp) / "bot.cfg"
+            config_path.write_text(BOT_CONFIG)
+            (Path(temp) / "looks.cfg").write_text("")
+            index = BotIndex()
+            self.assertTrue(index.refresh([config_path]))
+            bots = BotConfigs(index)
+            bot_id = bots.add(config_path)
+            self.assertEqual(bots.name(bot_id), "Test Bot")
+            self.assertEqual(bots.details(bot_id)["developer"], "Tester")
+            self.assertIsNone(bots.logo_path(bot_id))
+
+            # Adding and removing the logo doesn't change the config, so it isn't parsed again
+            logo_path = Path(temp) / "logo.png"
+            logo_path.write_bytes(b"logo")
+            self.assertFalse(index.refresh([config_path]))
+            self.assertEqual(bots.logo_path(bot_id), os.path.realpath(logo_path))
+            logo_path.unlink()
+            self.assertIsNone(bots.logo_path(bot_id))
+
+
+def write_zip(path: Path, files: dict):
+    """
+    Write a zip file with the given file names and contents, which are bytes or nested dicts of zip files.
+    """
+    with ZipFile(path, "w") as zip_file:
+        for name, content in files.items():
+            if isinstance(content, dict):
+                inner = path.parent / f".{name}"
+                write_zip(inner, content)
+                zip_file.write(inner, name)
+                inner.unlink()
+            else:
+                zip_file.writestr(name, content)
+
+
+class TestUnzipAllBots(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.ld = LeagueDir(Path(self.temp_dir.name))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def unzip(self) -> str:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            unzip_all_bots(self.ld)
+        return output.getvalue().splitlines()[-1]
+
+    def test_unchanged_zips_are_skipped(self):
+        bot_zip = self.ld.bots / "bot.zip"
+        write_zip(bot_zip, {"bot.cfg": b"config"})
+        self.assertEqual(self.unzip(), "Extracted 1 archives, skipped 0 unchanged archives")
+        extracted = self.ld.bots / "bot" / "bot.cfg"
+        self.assertEqual(extracted.read_bytes(), b"config")
+
+        # The index remembers the modification time, size, and hash of the archive
+        with open(self.ld.unzip_index) as f:
+            entry = json.load(f)[str(bot_zip)]
+        self.assertEqual(set(entry.keys()), {"mtime", "size", "sha1"})
+
+        # Unchanged archives are not extracted again, so local edits stay
+        extracted.write_bytes(b"edited")
+        self.assertEqual(self.unzip(), "Extracted 0 archives, skipped 1 unchanged archives")
+        self.assertEqual(extracted.read_bytes(), b"edited")
+
+        # An archive with a new modification time but the same content is recognized by its hash
+        os.utime(bot_zip, (0, 0))
+        self.assertEqual(self.unzip(), "Extracted 0 archives, skipped 1 unchanged archives")
+        with open(self.ld.unzip_index) as f:
+            self.assertEqual(json.load(f)[str(bot_zip)]["mtime"], 0)
+
+        # Missing folders are extracted again
+        extracted.unlink()
+        (self.ld.bots / "bot").rmdir()
+        self.assertEqual(self.unzip(), "Extracted 1 archives, skipped 0 unchanged archives")
+        self.assertEqual(extracted.read_bytes(), b"config")
+
+    def test_changed_zips_are_extracted_again(self):
+        bot_zip = self.ld.bots / "bot.zip"
+        write_zip(bot_zip, {"bot.cfg": b"config"})
+        os.utime(bot_zip, (0, 0))
+        self.unzip()
+
+        write_zip(bot_zip, {"bot.cfg": b"new config"})
+        self.assertEqual(self.unzip(), "Extracted 1 archives, skipped 0 unchanged archives")
+        self.assertEqual((self.ld.bots / "bot" / "bot.cfg").read_bytes(), b"new config")
+
+    def test_nested_zips_are_extracted_after_their_archive(self):
+        outer_zip = self.ld.bots / "outer.zip"
+        write_zip(outer_zip, {"inner.zip": {"bot.cfg": b"config"}})
+        self.assertEqual(self.unzip(), "Extracted 2 archives, skipped 0 unchanged archives")
+        inner_cfg = self.ld.bots / "outer" / "inner" / "bot.cfg"
+        self.assertEqual(inner_cfg.read_bytes(), b"config")
+        self.assertEqual(self.unzip(), "Extracted 0 archives, skipped 2 unchanged archives")
+
+        # The nested zip is only looked at after the outer zip has replaced it
+        write_zip(outer_zip, {"inner.zip": {"bot.cfg": b"new config"}})
+        self.assertEqual(self.unzip(), "Extracted 2 archives, skipped 0 unchanged archives")
+        self.assertEqual(inner_cfg.read_bytes(), b"new config")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'autoleague'))
+
+from csv_conversion import convert_to_csvs
+from paths import LeagueDir
+from synthetic_league import generate_league
+
+
+class TestCsvConversion(unittest.TestCase):
+
+    def test_incremental_export_equals_full_export(self):
+        with tempfile.TemporaryDirectory() as temp:
+            temp = Path(temp)
+            (temp / "league").mkdir()
+            ld = LeagueDir(temp / "league")
+            generate_league(ld, 20, 120)
+            convert_to_csvs(ld, full=True)
+            full = {path.name: path.read_text() for path in ld.csvs.glob("*.csv")}
+
+            # Hide the newer half of the league, as if those matches were not played yet
+            hidden = temp / "hidden"
+            newer = [path for folder in [ld.matches, ld.rankings, ld.tickets]
+                     for path in sorted(folder.glob("*.json"))[60:]]
+            for path in newer:
+                (hidden / path.parent.name).mkdir(parents=True, exist_ok=True)
+                shutil.move(str(path), str(hidden / path.parent.name / path.name))
+
+            def restore(paths):
+                for path in paths:
+                    shutil.move(str(hidden / path.parent.name / path.name), str(path))
+
+            convert_to_csvs(ld, full=True)
+
+            # Export while the next match is saved, but not its rankings and tickets yet
+            next_match = [path for path in newer if path.parent == ld.matches][0]
+            restore([next_match])
+            convert_to_csvs(ld)
+
+            restore([path for path in newer if path != next_match])
+            convert_to_csvs(ld)
+            incremental = {path.name: path.read_text() for path in ld.csvs.glob("*.csv")}
+
+        self.assertEqual(incremental.keys(), full.keys())
+        for name in full:
+            self.assertEqual(incremental[name], full[name], name)
+
+    def test_csvs_without_export_state_are_regenerated(self):
+        with tempfile.TemporaryDirectory() as temp:
+            ld = LeagueDir(Path(temp))
+            generate_league(ld, 20, 50)
+            convert_to_csvs(ld, full=True)
+            full = {path.name: path.read_text() for path in ld.csvs.glob("*.csv")}
+
+            # Csv files made before exports were incremental have no export state
+            ld.csv_export_state.unlink()
+            convert_to_csvs(ld)
+            self.assertEqual({path.name: path.read_text() for path in ld.csvs.glob("*.csv")}, full)
+
+            # The same goes for an unreadable export state
+            ld.csv_export_state.write_text("{")
+            convert_to_csvs(ld)
+            self.assertEqual({path.name: path.read_text() for path in ld.csvs.glob("*.csv")}, full)
+
+
+if __name__ == '__main__':
+    unittest.main()
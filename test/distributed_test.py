@@ -0,0 +1,177 @@
+import random
+import sys
+import urllib.error
+import urllib.request
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'autoleague'))
+
+import distributed
+import overlay
+from distributed import Coordinator, Worker, TOKEN_HEADER
+from match import MatchDetails, MatchResult, PlayerScore
+from paths import LeagueDir, PackageFiles
+from ranking_system import RankingSystem
+from synthetic_league import generate_league
+
+
+class TestDistributed(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        temp = Path(self.temp_dir.name)
+        (temp / "league").mkdir()
+        self.ld = LeagueDir(temp / "league")
+        generate_league(self.ld, 30, 20)
+
+        # Keep the overlay of the package untouched
+        self.overlay_paths = PackageFiles.overlay_current_match, PackageFiles.overlay_summary
+        PackageFiles.overlay_current_match = temp / "current_match.json"
+        PackageFiles.overlay_summary = temp / "summary.json"
+        self.publish = overlay.publish
+        overlay.publish = lambda *args, **kwargs: False
+
+    def tearDown(self):
+        PackageFiles.overlay_current_match, PackageFiles.overlay_summary = self.overlay_paths
+        overlay.publish = self.publish
+        self.temp_dir.cleanup()
+
+    def test_stub_workers(self):
+        playing = set()
+        playing_lock = threading.Lock()
+        conflicts = []
+
+        def stub_run(match: MatchDetails, timer):
+            bots = set(match.blue + match.orange)
+            with playing_lock:
+                # No bot may be in two matches at once
+                conflicts.extend(playing & bots)
+                playing.update(bots)
+            time.sleep(random.random() * 0.05)
+            with playing_lock:
+                playing.difference_update(bots)
+            blue_goals, orange_goals = random.sample(range(6), 2)
+            return MatchResult(blue_goals, orange_goals, {bot: PlayerScore() for bot in bots}), None
+
+        initial = RankingSystem.load(self.ld)
+        self.play(3, 24, stub_run)
+
+        self.assertEqual(conflicts, [])
+        matches = MatchDetails.all(self.ld)
+        self.assertEqual(len(matches), 44)
+        self.assertEqual(len(RankingSystem.all(self.ld)), 45)
+
+        # Replaying the saved matches in file order must give the saved ratings
+        replayed = initial
+        for match in matches[20:]:
+            replayed.update(match, match.result)
+        final = RankingSystem.load(self.ld)
+        for bot, rating in final.ratings.items():
+            self.assertAlmostEqual(replayed.get(bot).mu, rating.mu)
+            self.assertAlmostEqual(replayed.get(bot).sigma, rating.sigma)
+
+    def play(self, worker_count: int, match_count: int, run):
+        """
+        Play the matches with the given number of stub workers.
+        """
+        coordinator = Coordinator(self.ld, match_count, "secret")
+        port = coordinator.start(0)
+        workers = [Worker(f"http://localhost:{port}", "secret", f"worker{i}", run, poll_interval=0.01)
+                   for i in range(worker_count)]
+        threads = [threading.Thread(target=worker.run_forever) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+        self.assertTrue(coordinator.done.wait(timeout=1))
+        coordinator.stop()
+
+    def test_workers_play_at_the_same_time(self):
+        running = 0
+        most_running = 0
+        condition = threading.Condition()
+
+        def stub_run(match: MatchDetails, timer):
+            nonlocal running, most_running
+            with condition:
+                running += 1
+                most_running = max(most_running, running)
+                condition.notify_all()
+                # Wait until three matches are running at once (or give up, failing the test below)
+                condition.wait_for(lambda: most_running >= 3, timeout=10)
+                running -= 1
+            return MatchResult(1, 0, {bot: PlayerScore() for bot in match.blue + match.orange}), None
+
+        self.play(3, 9, stub_run)
+        self.assertEqual(most_running, 3)
+        self.assertEqual(len(MatchDetails.all(self.ld)), 29)
+
+    def test_wrong_token_is_rejected(self):
+        coordinator = Coordinator(self.ld, 1, "secret")
+        port = coordinator.start(0)
+        try:
+            for headers in [{}, {TOKEN_HEADER: "guess"}]:
+                request = urllib.request.Request(f"http://localhost:{port}/claim", data=b'{"worker": "w"}',
+                                                 headers=headers, method="POST")
+                with self.assertRaises(urllib.error.HTTPError) as context:
+                    urllib.request.urlopen(request)
+                self.assertEqual(context.exception.code, 403)
+            self.assertEqual(coordinator.running, {})
+        finally:
+            coordinator.stop()
+
+    def test_missing_result_is_rejected(self):
+        coordinator = Coordinator(self.ld, 1, "secret")
+        port = coordinator.start(0)
+        try:
+            worker = Worker(f"http://localhost:{port}", "secret", "w", run=None)
+            status, data = worker.post("/claim", {"worker": "w"})
+            self.assertEqual(status, 200)
+            match = distributed.match_to_json(distributed.match_from_json(data["match"]))
+            for payload in [dict(match, result=None), {key: value for key, value in match.items() if key != "result"},
+                            "not a match"]:
+                status, _ = worker.post("/result", {"worker": "w", "match": payload})
+                self.assertEqual(status, 400)
+            self.assertEqual(list(coordinator.running.keys()), [match["name"]])
+            self.assertEqual(len(MatchDetails.all(self.ld)), 20)
+        finally:
+            coordinator.stop()
+
+    def test_result_is_reported_again_if_saving_fails(self):
+        def stub_run(match: MatchDetails, timer):
+            return MatchResult(3, 1, {bot: PlayerScore() for bot in match.blue + match.orange}), None
+
+        # The first attempt to save rankings fails, e.g. because the disk is full
+        failures = [OSError("No space left on device")]
+        save = RankingSystem.save
+
+        def failing_save(rank_sys, ld, time_stamp):
+            if failures:
+                raise failures.pop()
+            save(rank_sys, ld, time_stamp)
+
+        initial = RankingSystem.load(self.ld)
+        retry_delay = distributed.RETRY_DELAY
+        distributed.RETRY_DELAY = 0.01
+        RankingSystem.save = failing_save
+        try:
+            self.play(1, 2, stub_run)
+        finally:
+            RankingSystem.save = save
+            distributed.RETRY_DELAY = retry_delay
+
+        matches = MatchDetails.all(self.ld)
+        self.assertEqual(len(matches), 22)
+        self.assertEqual(len(RankingSystem.all(self.ld)), 23)
+        for match in matches[20:]:
+            initial.update(match, match.result)
+        for bot, rating in RankingSystem.load(self.ld).ratings.items():
+            self.assertAlmostEqual(initial.get(bot).mu, rating.mu)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'autoleague'))
+
+from match import MatchDetails
+from match_index import MatchIndex
+from match_maker import next_timestamp
+from paths import LeagueDir
+from stats import PairIndex, CareerStats
+from synthetic_league import generate_league
+
+
+class TestMatchCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        temp = Path(self.temp_dir.name)
+        (temp / "league").mkdir()
+        self.ld = LeagueDir(temp / "league")
+        generate_league(self.ld, 20, 100)
+        self.hidden = temp / "hidden"
+        self.hidden.mkdir()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def assertSameAsRebuild(self, pair_index: PairIndex, career: CareerStats, index: MatchIndex):
+        matches = MatchDetails.all(self.ld)
+        self.assertEqual(pair_index.match_count, len(matches))
+        self.assertEqual(career.latest_match, matches[-1].name)
+
+        built = PairIndex.build(matches)
+        for a in built.bots:
+            for b in built.bots:
+                self.assertEqual(pair_index.get(a, b), built.get(a, b))
+
+        built = CareerStats.build(matches)
+        self.assertEqual(sorted(career.bots), built.bots)
+        for bot in built.bots:
+            self.assertEqual(career.get(bot), built.get(bot))
+
+        built = MatchIndex.build(matches)
+        self.assertEqual([index.match(i) for i in range(len(index))], [built.match(i) for i in range(len(built))])
+        for bot in built.bots:
+            self.assertEqual(index.query(bot=bot), built.query(bot=bot))
+
+    def ensure_all(self):
+        return PairIndex.ensure(self.ld), CareerStats.ensure(self.ld), MatchIndex.ensure(self.ld)
+
+    def test_new_matches_are_added(self):
+        # Build the caches without the newest matches, then add them incrementally
+        newest = sorted(self.ld.matches.glob("*.json"))[80:]
+        for path in newest:
+            shutil.move(str(path), str(self.hidden / path.name))
+        self.ensure_all()
+        for path in newest:
+            shutil.move(str(self.hidden / path.name), str(path))
+        self.assertSameAsRebuild(*self.ensure_all())
+
+        # Loading again doesn't change anything
+        self.assertSameAsRebuild(*self.ensure_all())
+
+    def test_undone_and_replaced_matches_are_detected(self):
+        self.ensure_all()
+
+        # Undo the latest match
+        MatchDetails.undo(self.ld)
+        self.assertSameAsRebuild(*self.ensure_all())
+
+        # Replace the latest match with a different one, keeping the number of matches
+        latest = MatchDetails.latest(self.ld, 1)[0]
+        (self.ld.matches / f"{latest.name}.json").unlink()
+        latest.blue, latest.orange = latest.orange, latest.blue
+        latest.name = "_".join([latest.time_stamp] + latest.blue + ["vs"] + latest.orange)
+        latest.save(self.ld)
+        self.assertSameAsRebuild(*self.ensure_all())
+
+    def test_saved_matches_are_added_without_reading_match_files(self):
+        self.ensure_all()
+
+        # Save a new match like `match run` does
+        match = MatchDetails.latest(self.ld, 1)[0]
+        match.time_stamp = next_timestamp(match.time_stamp)
+        match.name = "_".join([match.time_stamp] + match.blue + ["vs"] + match.orange)
+        match.save(self.ld)
+        with mock.patch.object(MatchDetails, "read", side_effect=AssertionError("A match file was read")):
+            for cache in [PairIndex, CareerStats, MatchIndex]:
+                cache.add_saved_match(self.ld, match)
+
+            # Lookups don't read the match files either
+            caches = PairIndex.current(self.ld), CareerStats.current(self.ld), MatchIndex.current(self.ld)
+        self.assertSameAsRebuild(*caches)
+
+        # If the matches changed otherwise, lookups bring the caches up to date
+        MatchDetails.undo(self.ld)
+        self.assertSameAsRebuild(PairIndex.current(self.ld), CareerStats.current(self.ld), MatchIndex.current(self.ld))
+
+
+if __name__ == '__main__':
+    unittest.main()
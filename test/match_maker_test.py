@@ -91,6 +91,19 @@ class TestMatchMaker(unittest.TestCase):
             print(f'Num with {i}: {game_counts.count(i)}')
         # Before the equity changes, there are ~12 bots who have only played once. Now it's usually 1 or 2.
 
+    def test_make_batch(self):
+        rank_sys = RankingSystem.read(RESOURCES_FOLDER / '20210925212802_rankings.json')
+        ticket_sys = TicketSystem.read(RESOURCES_FOLDER / '20210925212802_tickets.json', LeagueSettings())
+        bots = {bot_id: None for bot_id in rank_sys.ratings.keys()}
+        matches = MatchMaker.make_batch(bots, rank_sys, ticket_sys, 4)
+        self.assertEqual(len(matches), 4)
+        players = [bot_id for match in matches for bot_id in match.blue + match.orange]
+        # No bot is in two matches
+        self.assertEqual(len(players), 24)
+        self.assertEqual(len(set(players)), 24)
+        with self.assertRaises(ValueError):
+            MatchMaker.make_batch(bots, rank_sys, ticket_sys, len(bots) // 6 + 1)
+
 
 if __name__ == '__main__':
     unittest.main()
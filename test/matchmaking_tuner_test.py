@@ -0,0 +1,38 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'autoleague'))
+
+import matchmaking_tuner
+from match_maker import TicketSystem
+from paths import LeagueDir
+from ranking_system import RankingSystem
+from synthetic_league import generate_league
+
+
+class TestMatchmakingTuner(unittest.TestCase):
+
+    def test_simulate_is_deterministic(self):
+        with tempfile.TemporaryDirectory() as temp:
+            ld = LeagueDir(Path(temp))
+            generate_league(ld, 20, 100)
+            rank_sys = RankingSystem.load(ld)
+            ticket_sys = TicketSystem.load(ld, [])
+        ratings = {bot: (rating.mu, rating.sigma) for bot, rating in rank_sys.ratings.items()}
+        params = {name: values[0] for name, values in matchmaking_tuner.GRID.items()}
+
+        variance, quality, gap = matchmaking_tuner.simulate(params, ratings, ticket_sys.tickets, 2)
+        for value in [variance, quality, gap]:
+            self.assertIsInstance(value, float)
+        self.assertGreaterEqual(variance, 0)
+        self.assertTrue(0 < quality <= 1)
+        self.assertGreaterEqual(gap, 0)
+
+        # The same seed gives the same sessions
+        self.assertEqual(matchmaking_tuner.simulate(params, ratings, ticket_sys.tickets, 2), (variance, quality, gap))
+
+
+if __name__ == '__main__':
+    unittest.main()
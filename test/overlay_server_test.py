@@ -0,0 +1,68 @@
+import json
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'autoleague'))
+
+import overlay_server
+from overlay_server import CoalescingWriter
+
+
+class TestCoalescingWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / "data.json"
+        self.published = []
+        self.publish = overlay_server.publish
+        overlay_server.publish = lambda name, data: self.published.append((name, data))
+
+    def tearDown(self):
+        overlay_server.publish = self.publish
+        self.temp_dir.cleanup()
+
+    def test_updates_are_coalesced_and_flushed_on_stop(self):
+        # One write every 60 seconds, so the updates below all arrive within one interval
+        writer = CoalescingWriter(self.path, "data.json", max_writes_per_second=1 / 60)
+        written = []
+        write = writer._write
+        writer._write = lambda data: (written.append(data), write(data))
+
+        writer.submit({"update": 0})
+        deadline = time.monotonic() + 10
+        while writer.written_count < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(written, [{"update": 0}])
+
+        for i in range(1, 101):
+            writer.submit({"update": i})
+        time.sleep(0.1)
+        self.assertEqual(len(written), 1)
+
+        # Stopping writes the latest update once, without waiting for the interval to pass
+        start = time.monotonic()
+        writer.stop()
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertFalse(writer.thread.is_alive())
+        self.assertEqual(written, [{"update": 0}, {"update": 100}])
+        self.assertEqual(writer.submitted_count, 101)
+        self.assertEqual(writer.written_count, 2)
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {"update": 100})
+        self.assertEqual(self.published, [("data.json", {"update": 0}), ("data.json", {"update": 100})])
+
+        # The data was written atomically, so no temporary files are left
+        self.assertEqual([path.name for path in Path(self.temp_dir.name).iterdir()], ["data.json"])
+
+    def test_stop_without_updates(self):
+        writer = CoalescingWriter(self.path, "data.json")
+        writer.stop()
+        self.assertFalse(writer.thread.is_alive())
+        self.assertFalse(self.path.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
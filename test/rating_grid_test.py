@@ -0,0 +1,61 @@
+import math
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import trueskill
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'autoleague'))
+
+import ranking_system
+import rating_grid
+from bot_registry import BotRegistry
+from match import MatchDetails
+from match_index import MatchIndex
+from paths import LeagueDir
+from ranking_system import RankingSystem
+from synthetic_league import generate_league
+
+
+class TestRatingGrid(unittest.TestCase):
+
+    def test_replay_matches_ranking_system(self):
+        with tempfile.TemporaryDirectory() as temp:
+            ld = LeagueDir(Path(temp))
+            generate_league(ld, 20, 200)
+            index = MatchIndex.ensure(ld)
+            registry = BotRegistry.ensure(ld, index.bots)
+            matches = MatchDetails.all(ld)
+        slots = index.slots(registry)
+        rating_grid._set_history(slots[:, :3], slots[:, 3:], index.blue_goals, index.orange_goals, len(registry))
+
+        configs = [
+            dict(mu=50., sigma=50. / 3., beta=50. / 6., tau=50. / 300., draw_probability=.03, goals_per_extra_win=4),
+            dict(mu=25., sigma=25., beta=100. / 6., tau=.5, draw_probability=.1, goals_per_extra_win=2),
+        ]
+        scores = rating_grid.replay(configs)
+
+        goals_per_extra_win = ranking_system.GOALS_PER_EXTRA_WIN
+        try:
+            for config, (log_loss, accuracy) in zip(configs, scores):
+                ranking_system.GOALS_PER_EXTRA_WIN = config["goals_per_extra_win"]
+                trueskill.setup(**{key: value for key, value in config.items() if key != "goals_per_extra_win"})
+                beta = trueskill.global_env().beta
+                rank_sys = RankingSystem()
+                losses = []
+                for match in matches:
+                    ratings = [rank_sys.get(bot) for bot in match.blue + match.orange]
+                    diff = sum(r.mu for r in ratings[:3]) - sum(r.mu for r in ratings[3:])
+                    p_blue = trueskill.global_env().cdf(diff / math.sqrt(6 * beta ** 2 + sum(r.sigma ** 2 for r in ratings)))
+                    blue_won = match.result.blue_goals > match.result.orange_goals
+                    losses.append(-math.log(p_blue if blue_won else 1 - p_blue))
+                    rank_sys.update(match, match.result)
+                self.assertAlmostEqual(log_loss, sum(losses) / len(losses))
+        finally:
+            ranking_system.GOALS_PER_EXTRA_WIN = goals_per_extra_win
+            RankingSystem.setup()
+
+
+if __name__ == '__main__':
+    unittest.main()